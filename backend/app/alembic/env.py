@@ -18,10 +18,15 @@ fileConfig(config.config_file_name)
 # target_metadata = mymodel.Base.metadata
 # target_metadata = None
 
-from app.models import SQLModel  # noqa
-from app.core.config import settings # noqa
+from sqlmodel import SQLModel  # noqa
 
-target_metadata = SQLModel.metadata
+import app.models.users  # noqa: registers the User/Item tables in SQLModel.metadata
+from app.core.db import Base  # noqa
+from app.config import settings  # noqa
+
+# The revision chain starts with the User/Item tables (SQLModel.metadata); the app's own tables are in
+# Base.metadata. Both are compared, so autogenerate never proposes dropping the other half of the schema.
+target_metadata = [SQLModel.metadata, Base.metadata]
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -30,7 +35,20 @@ target_metadata = SQLModel.metadata
 
 
 def get_url():
-    return str(settings.SQLALCHEMY_DATABASE_URI)
+    # Alembic runs synchronously, so the async drivers are swapped for their sync counterparts
+    if settings.is_sqlite:
+        return f"sqlite:///{settings.sqlite_path}"
+    return settings.database_url.replace(f"mysql+{settings.db_driver}://", "mysql+pymysql://", 1)
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Indexes that are only created on another dialect (the MySQL FULLTEXT index) are not missing here
+    ddl_if = getattr(obj, "_ddl_if", None)
+    if type_ == "index" and not reflected and ddl_if is not None and ddl_if.dialect:
+        return ("sqlite" if settings.is_sqlite else "mysql") in (
+            (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else ddl_if.dialect
+        )
+    return True
 
 
 def run_migrations_offline():
@@ -47,7 +65,8 @@ def run_migrations_offline():
     """
     url = get_url()
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True, compare_type=True
+        url=url, target_metadata=target_metadata, literal_binds=True, compare_type=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -71,7 +90,8 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata, compare_type=True
+            connection=connection, target_metadata=target_metadata, compare_type=True,
+            include_object=include_object
         )
 
         with context.begin_transaction():
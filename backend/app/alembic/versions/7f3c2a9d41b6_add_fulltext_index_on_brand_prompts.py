@@ -0,0 +1,43 @@
+"""Add FULLTEXT index on brand_prompts.prompt
+
+Revision ID: 7f3c2a9d41b6
+Revises: 1a31ce608336
+Create Date: 2026-10-19 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3c2a9d41b6'
+down_revision = '1a31ce608336'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ft_brand_prompts_prompt'
+
+
+def _has_index() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return any(index['name'] == INDEX_NAME for index in inspector.get_indexes(settings.db_brand_prompts_table_name))
+
+
+def upgrade():
+    # FULLTEXT is MySQL-only; SQLite development databases search with LIKE instead.
+    # init_db creates the index on new databases, so only existing ones need it here.
+    if op.get_bind().dialect.name != 'mysql' or _has_index():
+        return
+    # InnoDB builds a FULLTEXT index in place; reads continue, writes wait until it is built
+    op.execute(
+        f"ALTER TABLE {settings.db_brand_prompts_table_name} "
+        f"ADD FULLTEXT INDEX {INDEX_NAME} (prompt), ALGORITHM=INPLACE, LOCK=SHARED"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql' or not _has_index():
+        return
+    op.drop_index(INDEX_NAME, table_name=settings.db_brand_prompts_table_name)
@@ -0,0 +1,84 @@
+import asyncio
+import hmac
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request, Security
+from fastapi.security import APIKeyHeader
+
+from app.config import settings
+from app.core.api_keys import ApiKeyPrincipal, authenticate_api_key
+
+api_key_header = APIKeyHeader(name=settings.api_key_header, auto_error=False)
+metrics_token_header = APIKeyHeader(name=settings.metrics_token_header, auto_error=False)
+
+T = TypeVar("T")
+
+
+async def require_api_key(api_key: Optional[str] = Security(api_key_header)) -> Optional[ApiKeyPrincipal]:
+    """
+    Authenticate the request by API key.
+    Returns None when api_key_auth_enabled is off, so routes keep working unauthenticated in development.
+    """
+    if not settings.api_key_auth_enabled:
+        return None
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing API key")
+
+    principal = await authenticate_api_key(api_key)
+    if principal is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return principal
+
+
+async def require_operator(token: Optional[str] = Security(metrics_token_header)) -> None:
+    """
+    Restrict operator endpoints (per-worker metrics naming other tenants) to holders of settings.metrics_token.
+    Open in development, like the private debug routes; closed when no token is configured.
+    """
+    if settings.environment == "development":
+        return
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing metrics token")
+    if not settings.metrics_token or not hmac.compare_digest(token.encode(), settings.metrics_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+
+
+def ensure_company_access(principal: Optional[ApiKeyPrincipal], company_id: str) -> None:
+    """Reject access to another company's data when the request is key-authenticated"""
+    if principal is not None and principal.company_id != str(company_id):
+        raise HTTPException(status_code=403, detail="API key is not valid for this company")
+
+
+class ClientDisconnected(HTTPException):
+    """The client went away before the response was ready (nginx-style 499)"""
+
+    def __init__(self):
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+async def run_until_disconnected(request: Request, coro: Awaitable[T], poll_interval: float = 0.25) -> T:
+    """
+    Await `coro`, cancelling it if the client disconnects in the meantime.
+
+    The work runs as a task while the request's receive channel is polled for
+    http.disconnect; on disconnect the task is cancelled, so the cancellation
+    reaches whatever the work is waiting on (model calls abort their upstream
+    request) instead of finishing an answer nobody will read.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        # Our own task was cancelled (server shutdown): take the work down with us
+        task.cancel()
+        raise
@@ -1,11 +1,14 @@
 from fastapi import APIRouter
 import logging
-from app.api.routes import user_prompts
+from app.api.routes import user_prompts, metrics, competitors, analytics
 from app.config import settings
 
 
 api_router = APIRouter()
 api_router.include_router(user_prompts.router, tags=["prompts"])
+api_router.include_router(metrics.router, tags=["metrics"])
+api_router.include_router(competitors.router, tags=["competitors"])
+api_router.include_router(analytics.router, tags=["analytics"])
 
 
 # Private routes router (e.g., for debugging)
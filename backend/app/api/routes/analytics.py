@@ -0,0 +1,57 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta, timezone
+import logging
+from typing import Optional
+
+from app.models.prompts_schemas import PromptStatsResponse, VisibilityResponse
+from app.core.db import get_lazy_db
+from app.core.api_keys import ApiKeyPrincipal
+from app.api.deps import require_api_key, ensure_company_access
+from app.services.prompt_stats import get_prompt_stats
+from app.services.visibility import get_visibility
+
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+MAX_RANGE_DAYS = 366
+
+
+@router.get("/visibility/{company_id}", response_model=VisibilityResponse)
+async def get_brand_visibility(
+        company_id: str,
+        start: Optional[date] = Query(None, description="First day, defaults to 30 days before end"),
+        end: Optional[date] = Query(None, description="Last day, defaults to today (UTC)"),
+        brand_name: Optional[str] = Query(None, max_length=100),
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """Mention rate, average rank and share of voice per brand, per day and over the range"""
+    ensure_company_access(principal, company_id)
+    start, end = _date_range(start, end)
+    return await get_visibility(database, company_id, start, end, brand_name)
+
+
+@router.get("/prompts/{company_id}", response_model=PromptStatsResponse)
+async def get_prompt_counts(
+        company_id: str,
+        start: Optional[date] = Query(None, description="First day, defaults to 30 days before end"),
+        end: Optional[date] = Query(None, description="Last day, defaults to today (UTC)"),
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """Prompts created per day, per user and per brand, read from the prompt_daily rollup only"""
+    ensure_company_access(principal, company_id)
+    start, end = _date_range(start, end)
+    return await get_prompt_stats(database, company_id, start, end)
+
+
+def _date_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=422, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+    return start, end
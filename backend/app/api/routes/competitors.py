@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+import logging
+from typing import List, Optional
+
+from app.models.prompts_schemas import CompetitorRequest, CompetitorResponse
+from app.core.db import CompetitorRecord, get_lazy_db
+from app.core.api_keys import ApiKeyPrincipal
+from app.api.deps import require_api_key, ensure_company_access
+
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/competitors", tags=["competitors"])
+
+
+def _to_response(record: CompetitorRecord) -> CompetitorResponse:
+    return CompetitorResponse(
+        id=record.id,
+        company_id=record.company_id,
+        name=record.name,
+        created_at=record.created_at,
+        is_active=record.is_active
+    )
+
+
+@router.post("/", response_model=CompetitorResponse, status_code=201)
+async def create_competitor(
+        request: CompetitorRequest,
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """
+    Track a competitor brand in the company's model answers.
+    The prompt runner picks the change up within mentions_matcher_ttl seconds.
+    """
+    ensure_company_access(principal, request.company_id)
+    name = request.name.strip()
+    competitor = (await database.execute(
+        select(CompetitorRecord).where(CompetitorRecord.company_id == request.company_id, CompetitorRecord.name == name)
+    )).scalar_one_or_none()
+    if competitor is not None and competitor.is_active:
+        raise HTTPException(status_code=409, detail="Competitor already exists")
+    if competitor is not None:
+        # Deleting only deactivates, so re-adding a removed competitor brings its row back
+        competitor.is_active = True
+        competitor.name = name
+    else:
+        competitor = CompetitorRecord(company_id=request.company_id, name=name)
+        database.add(competitor)
+    try:
+        await database.commit()
+    except IntegrityError:
+        await database.rollback()
+        raise HTTPException(status_code=409, detail="Competitor already exists")
+    await database.refresh(competitor)
+    return _to_response(competitor)
+
+
+@router.get("/company_id/{company_id}", response_model=List[CompetitorResponse])
+async def get_competitors_by_company_id(
+        company_id: str,
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """List a company's tracked competitors"""
+    ensure_company_access(principal, company_id)
+    result = await database.execute(
+        select(CompetitorRecord)
+        .where(CompetitorRecord.company_id == company_id, CompetitorRecord.is_active.is_(True))
+        .order_by(CompetitorRecord.name)
+    )
+    return [_to_response(record) for record in result.scalars().all()]
+
+
+@router.delete("/{competitor_id}", status_code=204)
+async def delete_competitor(
+        competitor_id: int,
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """Stop tracking a competitor; mentions already recorded are kept"""
+    competitor = await database.get(CompetitorRecord, competitor_id)
+    if not competitor or (principal is not None and principal.company_id != competitor.company_id):
+        raise HTTPException(status_code=404, detail="Competitor not found")
+    competitor.is_active = False
+    await database.commit()
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import require_operator
+from app.core.db import get_lazy_db
+
+from app.services.autocomplete import autocomplete_cache
+from app.services.local_ai_services import local_model_service
+from app.services.providers import model_router
+from app.services.response_store import response_store, storage_stats
+from app.services.scheduling import model_scheduler
+
+
+# Stats name other tenants (queued company ids, usage), so every route is operator-only
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(require_operator)])
+
+
+@router.get("/model")
+async def get_model_metrics():
+    """Per-worker model call counters, hedging and routing state, and scheduler queue state"""
+    return {
+        "generations": local_model_service.stats(),
+        "prompt_eval": local_model_service.prompt_eval_stats(),
+        "hedging": local_model_service.hedge_policy.stats(),
+        "routing": model_router.stats(),
+        "scheduler": model_scheduler.stats(),
+    }
+
+
+@router.get("/response_store")
+async def get_response_store_metrics(database: AsyncSession = Depends(get_lazy_db)):
+    """Stored answers and compression ratio per model, and this worker's read/write throughput"""
+    return {
+        "models": await storage_stats(database),
+        "throughput": response_store.stats(),
+    }
+
+
+@router.get("/autocomplete")
+async def get_autocomplete_metrics():
+    """This worker's autocomplete indexes: hits, builds, evictions and memory use"""
+    return autocomplete_cache.stats()
@@ -1,14 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 import logging
-from typing import List
+from typing import List, Optional
 import json
+import numpy as np
 
+from app.services.autocomplete import autocomplete_cache
+from app.services.clustering import get_clusters
+from app.services.prompt_stats import record_prompts
+from app.services.embeddings import prompt_embeddings
 from app.services.local_ai_services import local_model_service
-from app.models.prompts_schemas import PromptRequest, PromptResponse, AlternativePromptsResponse, ReferencePromptRequest
-from app.core.db import BrandPromptRecord, get_db
+from app.services.near_duplicates import near_duplicate_index
+from app.services.prompt_search import search_prompts
+from app.services.providers import model_router
+from app.services.scheduling import Priority
+from app.services.usage import QuotaExceededError
+from app.models.prompts_schemas import (
+    PromptRequest, PromptResponse, AlternativePromptsResponse, ReferencePromptRequest, SimilarPromptResponse,
+    NearDuplicateReportResponse, PromptSearchResponse, PromptSearchResult, AutocompleteResponse,
+    PromptCluster, PromptClustersResponse, ClusterPrompt
+)
+from app.core.db import BrandPromptRecord, get_lazy_db
+from app.core.api_keys import ApiKeyPrincipal
+from app.core.deadline import DeadlineExceeded
+from app.api.deps import require_api_key, ensure_company_access, run_until_disconnected
+from app.config import settings
 from app.config.prompts import system_prompts
 
 
@@ -19,12 +37,14 @@ router = APIRouter(prefix="/prompts", tags=["prompts"])
 @router.post("/", response_model=PromptResponse, status_code=201)
 async def create_prompt(
         request: PromptRequest,
-        database: AsyncSession = Depends(get_db)
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
 ):
     """
     Create a new prompt and process it with AI model.
     Uses idempotency_key to prevent duplicate submissions.
     """
+    ensure_company_access(principal, request.company_id)
     try:
         # Check for existing prompt with same idempotency key
         stmt = select(BrandPromptRecord).where(
@@ -38,7 +58,8 @@ async def create_prompt(
             return PromptResponse(
                 id=existing_prompt.id,
                 prompt=existing_prompt.prompt,
-                project_name=existing_prompt.project_name,
+                brand_id=existing_prompt.brand_id,
+                brand_name=existing_prompt.brand_name,
                 user_id=existing_prompt.user_id,
                 idempotency_key=existing_prompt.idempotency_key,
                 created_at=existing_prompt.created_at,
@@ -50,26 +71,38 @@ async def create_prompt(
         # Create new prompt record with pending status
         new_prompt = BrandPromptRecord(
             prompt=request.prompt,
-            project_name=request.project_name,
+            brand_id=request.brand_id,
+            brand_name=request.brand_name,
             user_id=request.user_id,
             idempotency_key=request.idempotency_key,
             company_id=request.company_id
         )
 
         database.add(new_prompt)
-        # await database.flush()  # Get the ID without committing
+        await database.flush()  # Get the ID without committing
+
+        # Indexed in the same transaction, so the LSH index never misses a committed prompt
+        matches = await near_duplicate_index.add_many(
+            database, request.company_id, [(new_prompt.id, new_prompt.prompt)]
+        )
+        if matches[new_prompt.id]:
+            logger.info(f"Prompt {new_prompt.id} nearly duplicates prompts {matches[new_prompt.id]}")
+        await record_prompts(database, [new_prompt])
 
         await database.commit()
         await database.refresh(new_prompt)
+        autocomplete_cache.add_prompt(new_prompt.company_id, new_prompt.prompt, new_prompt.brand_name)
 
         return PromptResponse(
             id=new_prompt.id,
             prompt=new_prompt.prompt,
-            project_name=new_prompt.project_name,
+            brand_id=new_prompt.brand_id,
+            brand_name=new_prompt.brand_name,
             user_id=new_prompt.user_id,
             idempotency_key=new_prompt.idempotency_key,
             created_at=new_prompt.created_at,
             is_duplicate=False,
+            near_duplicates=matches[new_prompt.id],
             company_id=new_prompt.company_id,
             is_active=new_prompt.is_active
         )
@@ -81,6 +114,9 @@ async def create_prompt(
             status_code=409,
             detail="Prompt with this idempotency key already exists"
         )
+    except DeadlineExceeded:
+        await database.rollback()
+        raise
     except Exception as e:
         await database.rollback()
         logger.error(f"Unexpected error creating prompt: {str(e)}")
@@ -93,20 +129,23 @@ async def create_prompt(
 @router.get("/prompt_id/{prompt_id}", response_model=PromptResponse)
 async def get_prompt_by_id(
         prompt_id: int,
-        database: AsyncSession = Depends(get_db)
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
 ):
     """Retrieve a specific prompt by ID"""
     stmt = select(BrandPromptRecord).where(BrandPromptRecord.id == prompt_id)
     result = await database.execute(stmt)
     prompt = result.scalar_one_or_none()
 
-    if not prompt:
+    # Another company's prompt is reported as missing rather than leaking that it exists
+    if not prompt or (principal is not None and principal.company_id != prompt.company_id):
         raise HTTPException(status_code=404, detail="Prompt not found")
 
     return PromptResponse(
         id=prompt.id,
         prompt=prompt.prompt,
-        project_name=prompt.project_name,
+        brand_id=prompt.brand_id,
+        brand_name=prompt.brand_name,
         user_id=prompt.user_id,
         idempotency_key=prompt.idempotency_key,
         created_at=prompt.created_at,
@@ -119,11 +158,13 @@ async def get_prompt_by_id(
 @router.get("/company_id/{company_id}", response_model=List[PromptResponse])
 async def get_prompts_by_company_id(
         company_id: int,
-        database: AsyncSession = Depends(get_db)):
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """
     Retrieve a list of prompts belongs to a company ID
     Todo: consider pagination
     """
+    ensure_company_access(principal, str(company_id))
     stmt = select(BrandPromptRecord).where(BrandPromptRecord.company_id == company_id)
     result = await database.execute(stmt)
 
@@ -137,7 +178,8 @@ async def get_prompts_by_company_id(
         response_array.append(PromptResponse(
             id=record.id,
             prompt=record.prompt,
-            project_name=record.project_name,
+            brand_id=record.brand_id,
+            brand_name=record.brand_name,
             user_id=record.user_id,
             idempotency_key=record.idempotency_key,
             created_at=record.created_at,
@@ -148,9 +190,194 @@ async def get_prompts_by_company_id(
     return response_array
 
 
+@router.get("/company_id/{company_id}/similar", response_model=List[SimilarPromptResponse])
+async def get_similar_prompts(
+        company_id: str,
+        q: Optional[str] = Query(None, min_length=1, max_length=10000, description="Text to find similar prompts to"),
+        prompt_id: Optional[int] = Query(None, description="Existing prompt to find similar prompts to"),
+        limit: int = Query(10, ge=1, le=100),
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """
+    Semantic search over a company's prompts, by text or by an existing prompt.
+    Prompts are searchable once scripts/index_prompts.py has embedded them.
+    """
+    ensure_company_access(principal, company_id)
+    if (q is None) == (prompt_id is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of q or prompt_id")
+
+    if prompt_id is not None:
+        query = prompt_embeddings.vector(company_id, prompt_id)
+        if query is None:
+            raise HTTPException(status_code=404, detail="Prompt not found or not indexed yet")
+    else:
+        matrix = prompt_embeddings.load(company_id)
+        if matrix is None:
+            return []
+        # A query embedded with another model is not comparable with the stored vectors
+        if matrix.model != settings.ai_embedding_model:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Prompts are indexed with {matrix.model}, not {settings.ai_embedding_model}; "
+                       f"rebuild them with scripts/index_prompts.py --rebuild"
+            )
+        try:
+            vectors = await local_model_service.embed(
+                [q], company_id=company_id, priority=Priority.INTERACTIVE, model=matrix.model
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Embedding the similar prompts query failed: {str(e)}")
+            raise HTTPException(status_code=503, detail="Embedding model is not available")
+        if not vectors:
+            logger.error(f"Embedding model {matrix.model} returned no vector for the similar prompts query")
+            raise HTTPException(status_code=503, detail="Embedding model is not available")
+        query = np.array(vectors[0], dtype=np.float32)
+        if query.shape != matrix.vectors.shape[1:]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"{matrix.model} returned {query.size}-dimensional vectors but prompts are indexed with "
+                       f"{matrix.vectors.shape[1]}; rebuild them with scripts/index_prompts.py --rebuild"
+            )
+
+    # Over-fetch a little, since deactivated prompts are still in the matrix
+    matches = prompt_embeddings.search(company_id, query, limit * 2, exclude_id=prompt_id)
+    if not matches:
+        return []
+    result = await database.execute(
+        select(BrandPromptRecord).where(
+            BrandPromptRecord.id.in_([match_id for match_id, _ in matches]),
+            BrandPromptRecord.company_id == company_id,
+            BrandPromptRecord.is_active.is_(True)
+        )
+    )
+    records = {record.id: record for record in result.scalars().all()}
+
+    return [
+        SimilarPromptResponse(
+            id=record.id,
+            prompt=record.prompt,
+            brand_id=record.brand_id,
+            brand_name=record.brand_name,
+            user_id=record.user_id,
+            company_id=record.company_id,
+            created_at=record.created_at,
+            score=round(score, 4)
+        )
+        for record, score in ((records.get(match_id), score) for match_id, score in matches)
+        if record is not None
+    ][:limit]
+
+
+@router.get("/company_id/{company_id}/search", response_model=PromptSearchResponse)
+async def search_company_prompts(
+        company_id: str,
+        q: str = Query(..., min_length=1, max_length=200, description="Keywords to search prompts for"),
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0, le=settings.search_max_offset),
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """Keyword search over a company's active prompts, most relevant first"""
+    ensure_company_access(principal, company_id)
+    matches, has_more = await search_prompts(database, company_id, q, limit, offset)
+    return PromptSearchResponse(
+        company_id=company_id,
+        query=q,
+        results=[
+            PromptSearchResult(
+                id=record.id,
+                prompt=record.prompt,
+                brand_id=record.brand_id,
+                brand_name=record.brand_name,
+                user_id=record.user_id,
+                created_at=record.created_at,
+                relevance=round(relevance, 4)
+            )
+            for record, relevance in matches
+        ],
+        offset=offset,
+        limit=limit,
+        has_more=has_more
+    )
+
+
+@router.get("/company_id/{company_id}/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete_prompt(
+        company_id: str,
+        prefix: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(10, ge=1, le=50),
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """
+    Type-ahead suggestions from the company's prompts and brand names.
+    Served from an in-memory index; the database is only read to build or refresh it.
+    """
+    ensure_company_access(principal, company_id)
+    suggestions = await autocomplete_cache.suggest(database, company_id, prefix, limit)
+    return AutocompleteResponse(prefix=prefix, **suggestions)
+
+
+@router.get("/company_id/{company_id}/clusters", response_model=PromptClustersResponse)
+async def get_prompt_clusters(
+        company_id: str,
+        examples: int = Query(5, ge=0, le=50, description="Prompts closest to each centroid to include"),
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """
+    Topic clusters of a company's prompts, largest first.
+    Clusters are computed from prompt embeddings by scripts/cluster_prompts.py.
+    """
+    ensure_company_access(principal, company_id)
+    clusters = await get_clusters(database, company_id, examples)
+    return PromptClustersResponse(
+        company_id=company_id,
+        clusters=[
+            PromptCluster(
+                cluster=cluster.cluster,
+                label=cluster.label,
+                size=cluster.size,
+                updated_at=cluster.updated_at,
+                prompts=[
+                    ClusterPrompt(id=prompt_id, prompt=prompt, similarity=similarity)
+                    for prompt_id, prompt, similarity in prompts
+                ]
+            )
+            for cluster, prompts in clusters
+        ]
+    )
+
+
+@router.get("/company_id/{company_id}/near_duplicates", response_model=NearDuplicateReportResponse)
+async def get_near_duplicate_report(
+        company_id: str,
+        database: AsyncSession = Depends(get_lazy_db),
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """Groups of a company's active prompts that differ only in casing, punctuation or word order"""
+    ensure_company_access(principal, company_id)
+    groups = await near_duplicate_index.report(database, company_id)
+    return NearDuplicateReportResponse(
+        company_id=company_id,
+        groups=[[{"id": prompt_id, "prompt": prompt} for prompt_id, prompt in group] for group in groups],
+        redundant_prompts=sum(len(group) - 1 for group in groups)
+    )
+
+
 @router.post("/alternative_prompts", response_model=AlternativePromptsResponse)
-async def create_alternative_prompts(request: ReferencePromptRequest):
-    """Process using local Ollama"""
+async def create_alternative_prompts(
+        request: ReferencePromptRequest,
+        http_request: Request,
+        principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)
+):
+    """
+    Process using local Ollama, overflowing to the hosted provider when the local backend is saturated.
+    The generation is cancelled, and the upstream Ollama request aborted, if the client disconnects.
+    """
     logger.info(f"Calling local model: {local_model_service.model}")
 
     # Check if Ollama is running
@@ -158,11 +385,28 @@ async def create_alternative_prompts(request: ReferencePromptRequest):
     if not is_healthy:
         raise Exception("local model service is not running or not accessible")
 
-    # Use chat endpoint for better results
-    content = (system_prompts.alternative_prompts_system_input +
-               f"\n Now provide alternative prompts for this reference: {request.origin_prompt}")
-    # messages = [{"role": "user", "content": content}]
-    result = await local_model_service.generate(prompt=content)
+    prompt = f"Now provide alternative prompts for this reference: {request.origin_prompt}"
+    # Schedule under the key's company when authenticated, otherwise the caller's own claim
+    company_id = principal.company_id if principal else (request.company_id or request.user_id)
+    try:
+        result = await run_until_disconnected(
+            http_request,
+            model_router.complete(
+                system=system_prompts.alternative_prompts_system_input,
+                prompt=prompt,
+                company_id=company_id,
+                user_id=request.user_id,
+                # Output from a small model tier that fails this is regenerated on the large model
+                validate=lambda text: AlternativePromptsResponse(**json.loads(text)),
+                subject=request.origin_prompt
+            )
+        )
+    except QuotaExceededError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
 
     logger.info(f"Generated alternative prompts: {result}")
 
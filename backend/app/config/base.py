@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -25,11 +26,31 @@ class BaseConfig(BaseSettings):
     mysql_pool_size: int = 10
     mysql_max_overflow: int = 20
 
+    # Async database driver: aiomysql (pure Python), asyncmy (Cython, faster row decoding)
+    # or aiosqlite for local runs without a MySQL server
+    db_driver: Literal["aiomysql", "asyncmy", "aiosqlite"] = "aiomysql"
+    sqlite_path: str = "kila_intelligence.db"
+
     # Database tables setting
     db_companies_table_name: str = "companies"
     db_users_table_name: str = "users"
     db_brand_prompts_table_name: str = "brand_prompts"
     db_projects_table_name: str = "projects"
+    db_api_keys_table_name: str = "api_keys"
+    db_token_usage_table_name: str = "token_usage"
+    db_run_cycles_table_name: str = "run_cycles"
+    db_prompt_runs_table_name: str = "prompt_runs"
+    db_competitors_table_name: str = "competitors"
+    db_brand_mentions_table_name: str = "brand_mentions"
+    db_watermarks_table_name: str = "watermarks"
+    db_visibility_daily_table_name: str = "visibility_daily"
+    db_run_daily_table_name: str = "run_daily"
+    db_prompt_daily_table_name: str = "prompt_daily"
+    db_response_blobs_table_name: str = "response_blobs"
+    db_compression_dictionaries_table_name: str = "compression_dictionaries"
+    db_prompt_lsh_buckets_table_name: str = "prompt_lsh_buckets"
+    db_prompt_clusters_table_name: str = "prompt_clusters"
+    db_prompt_cluster_assignments_table_name: str = "prompt_cluster_assignments"
 
     # AI Model Settings
     ai_model_url: str = "http://localhost:11434"
@@ -37,6 +58,92 @@ class BaseConfig(BaseSettings):
     ai_model: str = "qwen3-coder:30b"
     max_tokens: int = 1024 * 1024
     ai_timeout: int = 30  # seconds
+    ai_max_concurrency: int = 4  # model calls in flight per worker, shared fairly across companies
+    ai_interactive_reserved_slots: int = 1  # slots batch work may never occupy
+    ai_tenant_weights: dict[str, float] = {}  # company_id -> share weight, default 1.0
+    ai_min_budget: float = 1.0  # seconds; model calls are skipped when less of the request deadline is left
+    # Local models from smallest to largest; short, simple requests go to the smallest tier.
+    # Empty means every call uses ai_model.
+    ai_model_tiers: list[str] = []
+    ai_small_tier_max_words: int = 12  # longest origin prompt still considered simple
+    ai_max_connections: int = 32  # pooled HTTP connections per model backend
+    ai_embedding_model: str = "nomic-embed-text"  # Ollama model behind /api/embed
+    # Hedged requests: if the primary backend has not streamed a first token by the
+    # ai_hedge_percentile of recent first-token latencies, duplicate the call to a secondary
+    ai_hedge_enabled: bool = False
+    ai_hedge_urls: list[str] = []  # secondary Ollama backends, used round-robin
+    ai_hedge_percentile: float = 0.95
+    ai_hedge_min_delay: float = 0.5  # seconds, floor for the hedge threshold
+    ai_hedge_budget: float = 0.05  # hedges allowed per primary request, caps the extra load
+
+    # Hosted overflow provider (Anthropic API), used when the local backend is saturated
+    anthropic_api_key: str = ''
+    anthropic_base_url: Optional[str] = None  # defaults to the public API
+    anthropic_model: str = "claude-sonnet-4-5-20250929"
+    anthropic_max_tokens: int = 4096
+    anthropic_timeout: int = 60  # seconds
+    overflow_enabled: bool = False  # requires anthropic_api_key
+    overflow_queue_depth: int = 8  # queued local model calls before overflowing
+    overflow_latency: float = 20.0  # seconds, recent local latency (incl. queueing) before overflowing
+
+    # Scheduled brand-prompt runs (scripts/run_prompts.py)
+    runner_interval: int = 60 * 60 * 6  # seconds between the starts of two cycles
+    runner_concurrency: int = 8  # prompts in flight per runner process
+    runner_batch_size: int = 200  # prompts loaded, run and committed together
+    runner_backend_urls: list[str] = []  # Ollama backends to spread runs over, default ai_model_url
+    runner_rate_limits: dict[str, float] = {}  # backend url -> requests per second
+    runner_default_rate_limit: float = 0  # requests per second per backend, 0 is unlimited
+    runner_lease_timeout: int = 300  # seconds without a heartbeat before another runner takes over a cycle
+
+    # Brand-mention extraction over prompt run answers
+    mentions_batch_size: int = 500  # runs scanned per transaction
+    mentions_matcher_ttl: int = 300  # seconds a compiled matcher is reused unchecked; bounds how late brand edits apply
+    visibility_batch_size: int = 20000  # prompt runs folded into the daily rollups per transaction
+
+    # Response store
+    response_store_level: int = 9  # zstd compression level
+    response_store_dict_size: int = 64 * 1024  # bytes per trained dictionary
+    response_store_dict_min_samples: int = 200  # answers a model needs before a dictionary is trained for it
+    response_store_dict_samples: int = 2000  # most recent answers a dictionary is trained on
+    response_store_retrain_after: int = 50000  # answers stored with a dictionary before it is retrained
+    response_store_train_backoff: int = 3600  # seconds before training is retried for a model after it failed
+
+    # Prompt embeddings for semantic search, one memory-mapped float32 matrix per company
+    embeddings_dir: str = "embeddings"
+    embedding_batch_size: int = 64  # prompts embedded per Ollama call
+    embedding_poll_interval: float = 2.0  # seconds between checks for new prompts in scripts/index_prompts.py
+    embedding_reindex_overlap: int = 1000  # ids below the watermark re-read each pass for prompts that committed late
+
+    # Topic clustering of prompt embeddings (mini-batch spherical k-means per company)
+    cluster_min_prompts: int = 20  # embedded active prompts a company needs before it is clustered
+    cluster_max_k: int = 50  # k grows with sqrt(prompts / 2) up to this
+    cluster_batch_size: int = 256  # vectors per mini-batch step
+    cluster_iterations: int = 100  # mini-batch steps of a full fit
+    cluster_refit_growth: float = 1.25  # refit from scratch once the k for the current size outgrows the fitted k
+    cluster_label_terms: int = 3  # words per cluster label
+    cluster_poll_interval: float = 60.0  # seconds between runs of scripts/cluster_prompts.py
+
+    # Near-duplicate prompt detection (MinHash + LSH over casefolded words, so case, punctuation and order don't count)
+    dedup_num_perm: int = 64  # MinHash signature length
+    dedup_bands: int = 16  # LSH bands; with 64 permutations, pairs above ~0.5 Jaccard become candidates
+    dedup_threshold: float = 0.8  # word-set Jaccard similarity from which prompts are near-duplicates
+    dedup_max_candidates: int = 100  # newest bucket-sharing prompts a new prompt is checked against
+    dedup_max_matches: int = 20  # near-duplicates reported per new prompt, the most similar ones
+
+    # Keyword search over brand prompts (MySQL FULLTEXT, LIKE on SQLite)
+    search_max_offset: int = 1000  # deepest result offset a search page may start at
+
+    # Prompt autocomplete, per-company in-memory prefix indexes
+    autocomplete_memory_budget: int = 64 * 1024 * 1024  # bytes of index per worker before companies are evicted
+    autocomplete_refresh_interval: float = 30.0  # seconds before prompts created by other workers are loaded
+    autocomplete_refresh_overlap: int = 1000  # ids below the highest loaded one that a refresh reads again
+    autocomplete_rebuild_interval: float = 600.0  # seconds before an index is rebuilt, dropping deactivated prompts
+
+    # Token usage accounting and quotas
+    usage_flush_interval: int = 10  # seconds between batched writes of usage counters
+    usage_quota_tokens: int = 0  # tokens per company per quota window, 0 disables quotas
+    usage_quota_window: int = 60 * 60 * 24  # seconds, a whole number of hours
+    usage_quota_overrides: dict[str, int] = {}  # company_id -> tokens per window
 
     # Logging
     log_level: str = "INFO"
@@ -45,16 +152,51 @@ class BaseConfig(BaseSettings):
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     api_key_header: str = "X-API-Key"
+    metrics_token: str = ""  # operators' token for /metrics, which exposes every tenant; unset keeps it closed
+    metrics_token_header: str = "X-Metrics-Token"
+    api_key_auth_enabled: bool = False
+    api_key_cache_ttl: int = 300  # seconds a verified key is trusted without a DB lookup
+    api_key_negative_cache_ttl: int = 10  # seconds an unknown key is remembered as invalid
+    api_key_cache_max_entries: int = 10000
+    api_key_revocation_poll_interval: int = 15  # seconds
+    password_hash_workers: int = 4  # threads running bcrypt off the event loop
+    password_hash_max_pending: int = 64  # queued hash operations before rejecting
+    jwt_cache_max_entries: int = 10000  # decoded tokens kept per worker
+    jwt_cache_max_ttl: int = 60 * 60 * 24  # seconds, for tokens without an exp claim
+    access_token_expire_minutes: int = 60 * 24 * 8  # longest token lifetime, how long subject revocations are kept
+    first_superuser: str = ""  # created by app/initial_data.py when set
+    first_superuser_password: str = ""
+
+    # Request deadlines
+    request_timeout_header: str = "X-Request-Timeout-Ms"  # client-supplied budget in milliseconds
+    request_timeout_default: float = 30.0  # seconds
+    request_timeout_max: float = 120.0  # cap on client-supplied budgets, seconds
+    request_timeouts: dict[str, float] = {"/api/v1/prompts/alternative_prompts": 90.0}  # path prefix -> seconds
+    db_query_timeout: float = 10.0  # seconds, upper bound for a single statement
 
     # Rate Limiting
     rate_limit_enabled: bool = False
     rate_limit_requests: int = 100
     rate_limit_period: int = 60  # seconds
+    rate_limit_storage_path: str = "/tmp/kila_rate_limit.sqlite3"  # shared by all workers on the host
 
     # Computed Properties
+    @property
+    def database_server_url(self) -> str:
+        """Database URL without a schema selected (used to provision the database)"""
+        if self.db_driver == "aiosqlite":
+            return f"sqlite+aiosqlite:///{self.sqlite_path}"
+        return f"mysql+{self.db_driver}://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}"
+
     @property
     def database_url(self) -> str:
-        return f"mysql+aiomysql://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}"
+        if self.db_driver == "aiosqlite":
+            return self.database_server_url
+        return f"{self.database_server_url}/{self.mysql_database}"
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.db_driver == "aiosqlite"
 
     @property
     def is_production(self) -> bool:
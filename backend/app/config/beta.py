@@ -26,6 +26,9 @@ class BetaConfig(BaseConfig):
     rate_limit_requests: int = 200
     rate_limit_period: int = 60
 
+    # API keys required on the prompt routes
+    api_key_auth_enabled: bool = True
+
     # Security - Use real secrets from env
     # secret_key loaded from .env.beta
 
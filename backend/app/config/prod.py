@@ -28,6 +28,9 @@ class ProductionConfig(BaseConfig):
     rate_limit_requests: int = 100
     rate_limit_period: int = 60
 
+    # API keys required on the prompt routes
+    api_key_auth_enabled: bool = True
+
     # AI Settings - Production model
     ai_model: str = "qwen3-coder:30b"
     ai_timeout: int = 60  # Longer timeout in production
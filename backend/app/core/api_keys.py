@@ -0,0 +1,170 @@
+"""
+API-key authentication for the ingest/prompt routes.
+
+Keys are random tokens handed to a company once; the database only stores their
+HMAC-SHA256 digest (keyed with settings.secret_key), so a leaked table cannot be
+replayed. HMAC instead of bcrypt keeps verification to a few microseconds, which
+is safe because keys carry 256 bits of entropy rather than being user passwords.
+
+Each worker keeps an in-memory cache of verified digests for api_key_cache_ttl
+seconds, so the hot path is a dict lookup. Revocations are picked up by a poller
+that evicts recently revoked keys, bounding staleness to the poll interval.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.db import ApiKeyRecord, AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+API_KEY_PREFIX = "kila_"
+
+
+@dataclass(frozen=True)
+class ApiKeyPrincipal:
+    """The identity a verified API key resolves to"""
+    key_id: int
+    company_id: str
+
+
+def generate_api_key() -> str:
+    return API_KEY_PREFIX + secrets.token_urlsafe(32)
+
+
+def hash_api_key(raw_key: str) -> str:
+    return hmac.new(settings.secret_key.encode(), raw_key.encode(), hashlib.sha256).hexdigest()
+
+
+class ApiKeyCache:
+    """
+    Bounded per-worker cache of digest -> principal.
+    Unknown keys are cached as None for a shorter time so a flood of bad keys
+    cannot turn into a flood of database queries.
+    """
+
+    def __init__(
+            self,
+            ttl: float = settings.api_key_cache_ttl,
+            negative_ttl: float = settings.api_key_negative_cache_ttl,
+            max_entries: int = settings.api_key_cache_max_entries
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Optional[ApiKeyPrincipal]]] = OrderedDict()
+        self._last_poll = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def get(self, digest: str) -> tuple[bool, Optional[ApiKeyPrincipal]]:
+        """Return (hit, principal); principal is None for a cached invalid key"""
+        entry = self._entries.get(digest)
+        if entry is None:
+            return False, None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            del self._entries[digest]
+            return False, None
+        self._entries.move_to_end(digest)
+        return True, principal
+
+    def put(self, digest: str, principal: Optional[ApiKeyPrincipal]) -> None:
+        ttl = self.ttl if principal is not None else self.negative_ttl
+        self._entries[digest] = (time.monotonic() + ttl, principal)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict(self, digest: str) -> None:
+        self._entries.pop(digest, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def poll_revocations(self, session_factory=AsyncSessionLocal) -> int:
+        """Evict keys revoked since the last poll; returns the number of revocations seen"""
+        # Overlap the window slightly so a revocation committed during the previous poll is not missed
+        since = self._last_poll - timedelta(seconds=1)
+        polled_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        async with session_factory() as session:
+            result = await session.execute(
+                select(ApiKeyRecord.key_digest).where(ApiKeyRecord.revoked_at >= since)
+            )
+            digests = result.scalars().all()
+        # Only moved forward once the window has been read; after a failed query the next poll covers it again
+        self._last_poll = polled_at
+
+        for digest in digests:
+            self.evict(digest)
+        return len(digests)
+
+    async def run_revocation_poller(self, interval: float = settings.api_key_revocation_poll_interval) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                revoked = await self.poll_revocations()
+                if revoked:
+                    logger.info(f"Evicted {revoked} revoked API keys from cache")
+            except Exception as e:
+                logger.error(f"API key revocation poll failed: {str(e)}")
+
+
+async def authenticate_api_key(raw_key: str, session_factory=AsyncSessionLocal) -> Optional[ApiKeyPrincipal]:
+    """Resolve a raw API key to its principal, hitting the database only on a cache miss"""
+    digest = hash_api_key(raw_key)
+    hit, principal = api_key_cache.get(digest)
+    if hit:
+        return principal
+
+    async with session_factory() as session:
+        result = await session.execute(
+            select(ApiKeyRecord.id, ApiKeyRecord.company_id).where(
+                ApiKeyRecord.key_digest == digest,
+                ApiKeyRecord.is_active.is_(True),
+                ApiKeyRecord.revoked_at.is_(None)
+            )
+        )
+        row = result.first()
+
+    principal = ApiKeyPrincipal(key_id=row.id, company_id=row.company_id) if row else None
+    api_key_cache.put(digest, principal)
+    return principal
+
+
+async def create_api_key(session: AsyncSession, company_id: str, name: str) -> tuple[str, ApiKeyRecord]:
+    """Create a key for a company. The raw key is returned once and never stored."""
+    raw_key = generate_api_key()
+    record = ApiKeyRecord(
+        company_id=company_id,
+        name=name,
+        key_prefix=raw_key[:12],
+        key_digest=hash_api_key(raw_key)
+    )
+    session.add(record)
+    await session.commit()
+    await session.refresh(record)
+    return raw_key, record
+
+
+async def revoke_api_key(session: AsyncSession, key_id: int) -> None:
+    await session.execute(
+        update(ApiKeyRecord)
+        .where(ApiKeyRecord.id == key_id)
+        .values(is_active=False, revoked_at=datetime.now(timezone.utc).replace(tzinfo=None))
+    )
+    await session.commit()
+
+
+# Create global instance
+api_key_cache = ApiKeyCache()
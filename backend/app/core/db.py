@@ -1,23 +1,98 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Text, DateTime, Index, Boolean
+from sqlalchemy import (
+    Column, Integer, BigInteger, Float, String, Text, Date, DateTime, Index, Boolean, LargeBinary, UniqueConstraint,
+    Select
+)
+from sqlalchemy.dialects.mysql import MEDIUMBLOB, insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime, timezone
 from app.config import settings
+from app.core.deadline import bounded, remaining
 import logging
 
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
-# Database engine
+# Database engine, the driver is selected by settings.db_driver
 engine = create_async_engine(
     settings.database_url,
     echo=settings.environment == "development",
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    pool_size=settings.mysql_pool_size,
+    max_overflow=settings.mysql_max_overflow
 )
 
+
+class LazyAsyncSession(AsyncSession):
+    """
+    AsyncSession that only holds a pooled connection while it is doing work.
+
+    A plain session checks a connection out on its first query and keeps it
+    until the session closes, which for a request-scoped session means until
+    the handler (and everything slow after the last query) has finished.
+    This session still checks out lazily, but ends the implicit transaction
+    as soon as a read outside an explicit unit of work returns, and commit()
+    releases the connection as usual. Results are fully buffered and
+    expire_on_commit is off, so loaded objects stay usable afterwards.
+
+    Use `async with session.begin():` when several statements must share one
+    transaction (e.g. SELECT ... FOR UPDATE followed by an UPDATE).
+
+    Inside a request with a deadline (see app.core.deadline), each statement
+    is also bounded by the remaining budget and fails with DeadlineExceeded
+    instead of running past it.
+    """
+
+    async def _release_if_idle(self, autobegun: bool) -> None:
+        # Only end transactions we started implicitly, and never drop pending changes
+        if autobegun and self.in_transaction() and not (self.new or self.dirty or self.deleted):
+            await self.commit()
+
+    async def execute(self, statement, params=None, **kwargs):
+        autobegun = not self.in_transaction()
+        result = await bounded(super().execute(_with_deadline(statement), params, **kwargs), _query_timeout())
+        await self._release_if_idle(autobegun)
+        return result
+
+    async def scalar(self, statement, params=None, **kwargs):
+        autobegun = not self.in_transaction()
+        result = await bounded(super().scalar(_with_deadline(statement), params, **kwargs), _query_timeout())
+        await self._release_if_idle(autobegun)
+        return result
+
+    async def get(self, entity, ident, **kwargs):
+        autobegun = not self.in_transaction()
+        result = await bounded(super().get(entity, ident, **kwargs), _query_timeout())
+        await self._release_if_idle(autobegun)
+        return result
+
+    async def refresh(self, instance, attribute_names=None, with_for_update=None):
+        autobegun = not self.in_transaction()
+        await bounded(super().refresh(instance, attribute_names, with_for_update), _query_timeout())
+        await self._release_if_idle(autobegun)
+
+
+def _query_timeout():
+    """Statement timeout inside a request: db_query_timeout capped by the remaining deadline"""
+    return None if remaining() is None else settings.db_query_timeout
+
+
+def _with_deadline(statement):
+    """
+    Ask MySQL to abort a SELECT on its own once the request deadline passes,
+    so the server stops working on it even though the client gave up.
+    The hint is rounded up to 100ms to keep the compiled-statement cache small,
+    and renders only on the MySQL dialect.
+    """
+    left = remaining()
+    if left is None or not isinstance(statement, Select):
+        return statement
+    budget_ms = int(min(left, settings.db_query_timeout) * 10 + 1) * 100
+    return statement.prefix_with(f"/*+ MAX_EXECUTION_TIME({max(budget_ms, 100)}) */", dialect="mysql")
+
+
 # Session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -25,6 +100,13 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Session factory for request handlers, see LazyAsyncSession
+LazyAsyncSessionLocal = async_sessionmaker(
+    engine,
+    class_=LazyAsyncSession,
+    expire_on_commit=False
+)
+
 
 # Database Models
 class BrandPromptRecord(Base):
@@ -40,8 +122,13 @@ class BrandPromptRecord(Base):
     user_id = Column(String(100), nullable=False, index=True)
     company_id = Column(String(100), nullable=False, index=True)
     idempotency_key = Column(String(100), nullable=False, unique=True, index=True)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
-    updated_at = Column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
     is_active = Column(Boolean, default=True, nullable=False, index=False)
 
     # Composite indexes for common queries
@@ -50,7 +137,9 @@ class BrandPromptRecord(Base):
         Index('idx_brand_name', 'brand_name', 'brand_name'),
         Index('idx_user_id', 'user_id', 'user_id'),
         Index('idx_idempotency_key', 'idempotency_key', 'idempotency_key'),
-        Index('idx_company_id', 'company_id', 'company_id')
+        Index('idx_company_id', 'company_id', 'company_id'),
+        # Keyword search; MySQL only (see alembic revision 7f3c2a9d41b6 for existing databases)
+        Index('ft_brand_prompts_prompt', 'prompt', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql')
     )
 
 
@@ -71,9 +160,9 @@ class UsersRecord(Base):
 
     # Composite indexes for common queries
     __table_args__ = (
-        Index('idx_user_id', 'user_id', 'user_id'),
-        Index('idx_email', 'email', 'email'),
-        Index('idx_company_id', 'company_id', 'company_id')
+        Index('idx_users_user_id', 'user_id', 'user_id'),
+        Index('idx_users_email', 'email', 'email'),
+        Index('idx_users_company_id', 'company_id', 'company_id')
     )
 
 
@@ -98,11 +187,295 @@ class CompaniesRecord(Base):
     # Composite indexes for common queries
     __table_args__ = (
         Index('idx_company_name', 'company_name', 'company_name'),
-        Index('idx_company_id', 'company_id', 'company_id'),
-        Index('idx_email', 'email', 'email')
+        Index('idx_companies_company_id', 'company_id', 'company_id'),
+        Index('idx_companies_email', 'email', 'email')
+    )
+
+
+class ApiKeyRecord(Base):
+    """
+    The api keys table in the database.
+    Only the HMAC-SHA256 digest of a key is stored; the raw key is shown once at creation.
+    """
+    __tablename__ = settings.db_api_keys_table_name
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    key_prefix = Column(String(16), nullable=False)  # first characters of the raw key, for display
+    key_digest = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    revoked_at = Column(DateTime, nullable=True, index=True)
+    is_active = Column(Boolean, default=True, nullable=False)
+
+
+class TokenUsageRecord(Base):
+    """
+    Model token usage per company, user and model, aggregated into hourly windows
+    """
+    __tablename__ = settings.db_token_usage_table_name
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    user_id = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False)
+    window_start = Column(DateTime, nullable=False)
+    requests = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(BigInteger, default=0, nullable=False)
+    completion_tokens = Column(BigInteger, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'user_id', 'model', 'window_start', name='uq_token_usage_window'),
+        Index('idx_token_usage_company_window', 'company_id', 'window_start'),
+    )
+
+
+
+class RunCycleRecord(Base):
+    """
+    The run cycles table in the database.
+    One row per scheduled pass over the active brand prompts; `cursor` is the
+    highest prompt id whose batch is fully recorded, so a crashed cycle resumes there.
+    """
+    __tablename__ = settings.db_run_cycles_table_name
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, index=True)  # running, completed
+    cursor = Column(Integer, default=0, nullable=False)
+    prompts_run = Column(Integer, default=0, nullable=False)
+    prompts_failed = Column(Integer, default=0, nullable=False)
+    owner = Column(String(100), nullable=True)  # runner process holding the cycle
+    heartbeat_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class PromptRunRecord(Base):
+    """
+    The prompt runs table in the database: one model answer per brand prompt per cycle
+    """
+    __tablename__ = settings.db_prompt_runs_table_name
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    cycle_id = Column(String(36), nullable=False)
+    prompt_id = Column(Integer, nullable=False)
+    company_id = Column(String(100), nullable=False)
+    brand_id = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False)
+    backend = Column(String(200), nullable=False)
+    status = Column(String(20), nullable=False)  # ExecutionStatus value
+    response_hash = Column(String(64), nullable=True)  # ResponseBlobRecord holding the answer
+    error = Column(Text, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('cycle_id', 'prompt_id', name='uq_prompt_runs_cycle_prompt'),
+        Index('idx_prompt_runs_company_created', 'company_id', 'created_at'),
+        Index('idx_prompt_runs_prompt', 'prompt_id'),
+    )
+
+
+class CompetitorRecord(Base):
+    """
+    The competitors table in the database: brands a company wants tracked next to its own
+    """
+    __tablename__ = settings.db_competitors_table_name
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'name', name='uq_competitors_company_name'),
+    )
+
+
+class BrandMentionRecord(Base):
+    """
+    The brand mentions table in the database: one row per brand found in a prompt run's answer.
+    `rank` is the order of the brand's first appearance among the brands mentioned (1 = first).
+    """
+    __tablename__ = settings.db_brand_mentions_table_name
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    run_id = Column(BigInteger, nullable=False)
+    company_id = Column(String(100), nullable=False)
+    brand_name = Column(String(100), nullable=False)
+    is_competitor = Column(Boolean, default=False, nullable=False)
+    mention_count = Column(Integer, nullable=False)
+    rank = Column(Integer, nullable=False)
+    positions = Column(Text, nullable=False)  # JSON list of character offsets
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('run_id', 'brand_name', name='uq_brand_mentions_run_brand'),
+        Index('idx_brand_mentions_company_brand', 'company_id', 'brand_name'),
+    )
+
+
+class WatermarkRecord(Base):
+    """
+    The watermarks table in the database: how far each incremental job has processed its source table
+    """
+    __tablename__ = settings.db_watermarks_table_name
+
+    name = Column(String(100), primary_key=True)
+    position = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+class VisibilityDailyRecord(Base):
+    """
+    The brand visibility daily rollup table in the database: additive per-brand counters per company and day.
+    Mention rate, average rank and share of voice are derived from these and RunDailyRecord at read time.
+    """
+    __tablename__ = settings.db_visibility_daily_table_name
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    brand_name = Column(String(100), nullable=False)
+    day = Column(Date, nullable=False)
+    is_competitor = Column(Boolean, default=False, nullable=False)
+    runs_mentioned = Column(Integer, default=0, nullable=False)
+    mentions = Column(Integer, default=0, nullable=False)
+    rank_sum = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'brand_name', 'day', name='uq_visibility_daily'),
+        Index('idx_visibility_daily_company_day', 'company_id', 'day'),
+    )
+
+
+class RunDailyRecord(Base):
+    """
+    The run daily rollup table in the database: successful prompt runs and brand mentions per company and day
+    """
+    __tablename__ = settings.db_run_daily_table_name
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    day = Column(Date, nullable=False)
+    runs = Column(Integer, default=0, nullable=False)
+    mentions = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'day', name='uq_run_daily'),
+    )
+
+
+class PromptDailyRecord(Base):
+    """
+    The prompt daily rollup table in the database: prompts created per company, user, brand and day.
+    Maintained in the transaction that inserts the prompts, so it always agrees with brand_prompts
+    """
+    __tablename__ = settings.db_prompt_daily_table_name
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    day = Column(Date, nullable=False)
+    user_id = Column(String(100), nullable=False)
+    brand_id = Column(String(100), nullable=False)
+    brand_name = Column(String(100), nullable=False)  # as of the first prompt of the row
+    prompts = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'day', 'user_id', 'brand_id', name='uq_prompt_daily'),
+    )
+
+
+class ResponseBlobRecord(Base):
+    """
+    The response blobs table in the database: each distinct model answer once, keyed by the SHA-256 of its text
+    and zstd-compressed, with the dictionary it was compressed with
+    """
+    __tablename__ = settings.db_response_blobs_table_name
+
+    hash = Column(String(64), primary_key=True)
+    model = Column(String(100), nullable=False)
+    dictionary_id = Column(Integer, nullable=True)  # CompressionDictionaryRecord, None when compressed without one
+    size = Column(Integer, nullable=False)  # bytes of UTF-8 text
+    stored_size = Column(Integer, nullable=False)
+    data = Column(LargeBinary().with_variant(MEDIUMBLOB, "mysql"), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        Index('idx_response_blobs_model_created', 'model', 'created_at'),
+        Index('idx_response_blobs_model_dictionary', 'model', 'dictionary_id'),
+    )
+
+
+class PromptLshBucketRecord(Base):
+    """
+    The prompt LSH buckets table in the database: the MinHash band buckets of each brand prompt, so prompts
+    sharing a bucket with a new one (near-duplicate candidates) are found with an index lookup
+    """
+    __tablename__ = settings.db_prompt_lsh_buckets_table_name
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    bucket = Column(BigInteger, nullable=False)  # hash of one band of the MinHash signature and its band number
+    prompt_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_prompt_lsh_buckets_company_bucket', 'company_id', 'bucket'),
+        Index('idx_prompt_lsh_buckets_prompt', 'prompt_id'),
+    )
+
+
+class PromptClusterRecord(Base):
+    """
+    The prompt clusters table in the database: each company's topic clusters of prompt embeddings, with the
+    centroid they were last updated to and a label made of their most distinctive words
+    """
+    __tablename__ = settings.db_prompt_clusters_table_name
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    company_id = Column(String(100), nullable=False)
+    cluster = Column(Integer, nullable=False)  # 0 .. k-1 within the company
+    label = Column(String(200), nullable=False)
+    size = Column(Integer, nullable=False)  # prompts assigned, also the weight of the centroid in updates
+    model = Column(String(100), nullable=False)  # embedding model the centroid lives in
+    centroid = Column(LargeBinary, nullable=False)  # little-endian float32, L2-normalised
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'cluster', name='uq_prompt_clusters_company_cluster'),
+    )
+
+
+class PromptClusterAssignmentRecord(Base):
+    """
+    The prompt cluster assignments table in the database: the cluster of each clustered brand prompt
+    """
+    __tablename__ = settings.db_prompt_cluster_assignments_table_name
+
+    prompt_id = Column(Integer, primary_key=True)
+    company_id = Column(String(100), nullable=False)
+    cluster = Column(Integer, nullable=False)
+    similarity = Column(Float, nullable=False)  # cosine similarity to the centroid when assigned
+
+    __table_args__ = (
+        Index('idx_prompt_cluster_assignments_company_cluster', 'company_id', 'cluster'),
     )
 
 
+class CompressionDictionaryRecord(Base):
+    """
+    The compression dictionaries table in the database: zstd dictionaries trained on one model's answers.
+    Dictionaries are never changed or deleted, since blobs compressed with them need them to be read
+    """
+    __tablename__ = settings.db_compression_dictionaries_table_name
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    model = Column(String(100), nullable=False, index=True)
+    data = Column(LargeBinary().with_variant(MEDIUMBLOB, "mysql"), nullable=False)
+    samples = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
 """
 # disable project table temporary, since we are not using project structure at this time
 class ProjectsRecord(Base):
@@ -136,6 +509,28 @@ class PromptRunningStatus(Base):
 """
 
 
+def upsert_counters(dialect_name: str, table, rows: list[dict], key_columns: list[str], counter_columns: list[str]):
+    """
+    Build an INSERT that adds `counter_columns` onto existing rows matching the
+    unique `key_columns`, so rollups can be maintained in one statement per batch.
+    """
+    if dialect_name == "sqlite":
+        stmt = sqlite_insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: table.c[c] + stmt.excluded[c] for c in counter_columns}
+        )
+    stmt = mysql_insert(table).values(rows)
+    return stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in counter_columns})
+
+
+def insert_ignore(dialect_name: str, table, rows: list[dict]):
+    """Build an INSERT that skips rows whose key already exists"""
+    if dialect_name == "sqlite":
+        return sqlite_insert(table).values(rows).on_conflict_do_nothing()
+    return mysql_insert(table).values(rows).prefix_with("IGNORE")
+
+
 # Dependency for database sessions
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -145,6 +540,15 @@ async def get_db():
             await session.close()
 
 
+# Dependency for request-scoped sessions that release their connection early
+async def get_lazy_db():
+    async with LazyAsyncSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def init_db():
     """Initialize database - create tables if they don't exist"""
     async with engine.begin() as conn:
@@ -0,0 +1,115 @@
+"""
+End-to-end request deadlines.
+
+DeadlineMiddleware fixes an absolute deadline for each request, from the
+request_timeout_header (milliseconds of budget the client is still willing to
+wait) or else the per-route default in request_timeouts. The deadline lives in
+a context variable, so database queries and model calls made while handling
+the request can size their own timeouts from what is left, and skip work that
+can no longer finish in time, instead of each using a fixed timeout.
+
+Outside a request (scripts, background jobs) there is no deadline and the
+helpers fall back to the caller's default timeout.
+"""
+import asyncio
+import math
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out, or is too small for the next step"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, None when there is no deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(min_remaining: float = 0.0) -> None:
+    """Raise DeadlineExceeded unless at least `min_remaining` seconds are left"""
+    left = remaining()
+    if left is not None and left <= min_remaining:
+        raise DeadlineExceeded(f"Request deadline exceeded ({left:.3f}s left, {min_remaining:.3f}s needed)")
+
+
+def timeout_for(default: float) -> float:
+    """A step's timeout: its own default, capped by the remaining budget"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, left)
+
+
+async def bounded(awaitable: Awaitable[T], default: Optional[float] = None) -> T:
+    """
+    Await `awaitable` for at most `default` seconds capped by the remaining
+    budget, raising DeadlineExceeded (and cancelling it) when that runs out.
+    Without a deadline or a default this is a plain await.
+    """
+    left = remaining()
+    if left is None and default is None:
+        return await awaitable
+    if left is not None and left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+    timeout = left if default is None else (default if left is None else min(default, left))
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Timed out after {timeout:.3f}s")
+
+
+def route_timeout(path: str) -> float:
+    """Default budget for a path: the longest matching prefix in request_timeouts"""
+    best, best_len = settings.request_timeout_default, -1
+    for prefix, timeout in settings.request_timeouts.items():
+        if path.startswith(prefix) and len(prefix) > best_len:
+            best, best_len = timeout, len(prefix)
+    return best
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that sets the request deadline for everything downstream"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.request_timeout_header.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = route_timeout(scope["path"])
+        for name, value in scope.get("headers") or []:
+            if name == self.header:
+                try:
+                    requested = float(value) / 1000
+                except ValueError:
+                    break
+                # NaN, infinite or non-positive budgets are ignored rather than trusted
+                if math.isfinite(requested) and requested > 0:
+                    budget = min(requested, settings.request_timeout_max)
+                break
+
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
@@ -0,0 +1,160 @@
+"""
+Token-bucket rate limiting shared by all workers on a host.
+
+Bucket state lives in a small SQLite file (WAL mode) instead of process memory,
+so the uvicorn workers enforce one limit per client rather than one each. A
+request costs a single UPSERT ... RETURNING statement, which SQLite executes
+atomically, typically in a few tens of microseconds; see
+scripts/bench_rate_limiter.py.
+
+Clients are identified by the company behind an API key this worker has
+already verified, and otherwise by the client address. Nothing the client
+can choose freely (unverified keys, X-Company-Id / X-User-Id headers) picks
+the bucket: a fresh value per request would get a fresh bucket, and a victim's
+company id would drain the victim's bucket.
+
+The statement runs on one dedicated thread per worker, so waiting on the
+database lock (up to 50ms under contention) never blocks the event loop.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.core.api_keys import api_key_cache, hash_api_key
+
+logger = logging.getLogger(__name__)
+
+# Refill, take one token if available, and report whether the request was allowed,
+# all in one statement. SET expressions see the row's old values.
+_ACQUIRE_SQL = """
+INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at, allowed)
+VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT(bucket_key) DO UPDATE SET
+    tokens = MIN(:capacity, tokens + MAX(0, :now - updated_at) * :rate)
+             - (MIN(:capacity, tokens + MAX(0, :now - updated_at) * :rate) >= 1),
+    allowed = MIN(:capacity, tokens + MAX(0, :now - updated_at) * :rate) >= 1,
+    updated_at = :now
+RETURNING tokens, allowed
+"""
+
+
+class SQLiteTokenBucket:
+    """Token buckets of `capacity` requests refilled over `period` seconds, stored in SQLite"""
+
+    def __init__(self, path: str, capacity: int, period: float):
+        self.path = path
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.period = period
+        self._conn: Optional[sqlite3.Connection] = None
+        self._calls = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so each worker process gets its own connection after fork
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=0.05)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # losing buckets on power loss only resets limits
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "bucket_key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated_at REAL NOT NULL, allowed INTEGER NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def acquire(self, key: str) -> tuple[bool, float]:
+        """Take one token for key. Returns (allowed, seconds until a token is available)."""
+        conn = self._connection()
+        now = time.time()
+        tokens, allowed = conn.execute(
+            _ACQUIRE_SQL, {"key": key, "capacity": self.capacity, "rate": self.rate, "now": now}
+        ).fetchone()
+
+        self._calls += 1
+        if self._calls % 10000 == 0:
+            self.prune(now)
+
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / self.rate
+
+    def prune(self, now: Optional[float] = None) -> None:
+        """Drop buckets idle long enough to have refilled completely"""
+        now = now or time.time()
+        self._connection().execute(
+            "DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - self.period,)
+        )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def rate_limit_key(scope: Scope) -> str:
+    """Derive the bucket key for a request without reading its body"""
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(settings.api_key_header.lower().encode())
+    if api_key:
+        digest = hash_api_key(api_key.decode("latin-1"))
+        hit, principal = api_key_cache.get(digest)
+        if hit and principal is not None:
+            return f"company:{principal.company_id}"
+
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 once a client's bucket is empty"""
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            limiter: Optional[SQLiteTokenBucket] = None,
+            exempt_paths: tuple[str, ...] = ("/", "/health", "/docs", "/openapi.json")
+    ):
+        self.app = app
+        self.limiter = limiter or SQLiteTokenBucket(
+            settings.rate_limit_storage_path,
+            settings.rate_limit_requests,
+            settings.rate_limit_period
+        )
+        self.exempt_paths = set(exempt_paths)
+        # One thread, so the limiter's SQLite connection is never used concurrently
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            allowed, retry_after = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.limiter.acquire, rate_limit_key(scope)
+            )
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter store must not take the API down
+            logger.error(f"Rate limiter unavailable: {str(e)}")
+            allowed, retry_after = True, 0.0
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Rate limit exceeded"}'})
@@ -1,21 +1,39 @@
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
 from passlib.context import CryptContext
 
-from app.core.config import settings
+from app.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 ALGORITHM = "HS256"
 
+# bcrypt releases the GIL while hashing, so a small thread pool is enough to keep
+# the ~100ms+ of CPU per call off the event loop without paying process start-up
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash"
+)
+_pending_hashes = 0
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hash operations are already queued"""
+
 
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
-    expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    now = datetime.now(timezone.utc)
+    expire = now + expires_delta
+    # Millisecond issue time (a NumericDate may be fractional), so a token issued right after
+    # TokenVerifier.revoke_subject in the same second is not mistaken for one issued before it
+    to_encode = {"exp": expire, "iat": math.floor(now.timestamp() * 1000) / 1000, "sub": str(subject)}
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 
@@ -25,3 +43,31 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+async def _run_in_hash_pool(func, *args):
+    """
+    Run a bcrypt operation in the bounded hash pool.
+
+    At most password_hash_workers operations run at once; beyond that up to
+    password_hash_max_pending callers queue, and anything past the cap is
+    rejected immediately so a login storm cannot build an unbounded backlog.
+    """
+    global _pending_hashes
+    if _pending_hashes >= settings.password_hash_max_pending:
+        raise PasswordHasherBusy("Too many concurrent password operations, try again later")
+
+    _pending_hashes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _pending_hashes -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password)
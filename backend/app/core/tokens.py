@@ -0,0 +1,109 @@
+"""
+Cached verification of the HS256 tokens issued by app.core.security.
+
+Decoding a JWT means base64-decoding it, recomputing the HMAC and validating the
+claims on every request. Tokens are immutable, so once a token has verified its
+claims can be reused until it expires: the verifier keeps a bounded LRU keyed by
+the token's SHA-256 digest and only re-checks the time-based claims on a hit.
+Revoked tokens (or every token of a revoked subject) are rejected even when cached.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+
+from app.config import settings
+from app.core.security import ALGORITHM
+
+
+class TokenVerifier:
+    """Verify tokens, caching the decoded claims of valid ones"""
+
+    def __init__(
+            self,
+            max_entries: int = settings.jwt_cache_max_entries,
+            max_ttl: float = settings.jwt_cache_max_ttl
+    ):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl  # upper bound for tokens without an exp claim
+        self._cache: OrderedDict[bytes, tuple[dict[str, Any], float, float]] = OrderedDict()
+        self._revoked_tokens: dict[bytes, float] = {}  # digest -> time the revocation can be forgotten
+        self._revoked_subjects: dict[str, float] = {}  # sub -> tokens issued up to this time are invalid
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _is_revoked(self, digest: bytes, claims: dict[str, Any]) -> bool:
+        if digest in self._revoked_tokens:
+            return True
+        revoked_at = self._revoked_subjects.get(str(claims.get("sub")))
+        return revoked_at is not None and claims.get("iat", 0) <= revoked_at
+
+    def verify(self, token: str) -> Optional[dict[str, Any]]:
+        """Return the token's claims, or None if it is invalid, expired or revoked"""
+        digest = self._digest(token)
+        now = time.time()
+
+        entry = self._cache.get(digest)
+        if entry is not None:
+            claims, expires_at, not_before = entry
+            if expires_at <= now:
+                del self._cache[digest]
+                return None
+            if not_before > now or self._is_revoked(digest, claims):
+                return None
+            self._cache.move_to_end(digest)
+            return dict(claims)
+
+        try:
+            claims = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        except InvalidTokenError:
+            return None
+        if self._is_revoked(digest, claims):
+            return None
+
+        expires_at = float(claims.get("exp", now + self.max_ttl))
+        not_before = float(claims.get("nbf", 0))
+        self._cache[digest] = (claims, min(expires_at, now + self.max_ttl), not_before)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return dict(claims)
+
+    def revoke(self, token: str) -> None:
+        """Revocation hook: reject this token from now on, cached or not"""
+        digest = self._digest(token)
+        self._cache.pop(digest, None)
+        # Kept until the token itself expires; the cache entry is capped at max_ttl, which tokens outlive
+        try:
+            expires_at = jwt.decode(token, options={"verify_signature": False, "verify_exp": False}).get("exp")
+        except InvalidTokenError:
+            expires_at = None
+        if not isinstance(expires_at, (int, float)):
+            expires_at = time.time() + settings.access_token_expire_minutes * 60
+        self._revoked_tokens[digest] = float(expires_at)
+        self._prune_revocations()
+
+    def revoke_subject(self, subject: str) -> None:
+        """Revocation hook: reject every token issued to a subject up to now (e.g. on logout or password change)"""
+        self._revoked_subjects[str(subject)] = time.time()
+        self._prune_revocations()
+
+    def _prune_revocations(self) -> None:
+        now = time.time()
+        for digest in [d for d, until in self._revoked_tokens.items() if until <= now]:
+            del self._revoked_tokens[digest]
+        # Every token issued before a subject revocation has expired once its lifetime has passed
+        forget_before = now - settings.access_token_expire_minutes * 60
+        for subject in [s for s, revoked_at in self._revoked_subjects.items() if revoked_at < forget_before]:
+            del self._revoked_subjects[subject]
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# Create global instance
+token_verifier = TokenVerifier()
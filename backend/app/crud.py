@@ -1,54 +1,102 @@
+"""
+Async CRUD helpers for the User/Item models.
+
+All functions take an AsyncSession bound to the shared engine in app.core.db,
+so user/item work uses the same connection pool as the prompt service. Pass a
+session from AsyncSessionLocal (expire_on_commit=False) so returned objects
+stay readable after commit without another round-trip.
+"""
+import asyncio
 import uuid
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.core.security import get_password_hash, verify_password
+from app.config import settings
+from app.core.security import get_password_hash_async, verify_password_async
 from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
 
 
-def create_user(*, session: Session, user_create: UserCreate) -> User:
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
     db_obj = User.model_validate(
-        user_create, update={"hashed_password": get_password_hash(user_create.password)}
+        user_create, update={"hashed_password": await get_password_hash_async(user_create.password)}
     )
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
     return db_obj
 
 
-def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
+async def create_users(*, session: AsyncSession, users_create: list[UserCreate]) -> list[User]:
+    """Create many users in a single transaction"""
+    db_objs = []
+    # Hash in chunks the size of the hash pool so a large import never trips the pending cap
+    chunk = max(1, settings.password_hash_workers)
+    for start in range(0, len(users_create), chunk):
+        batch = users_create[start:start + chunk]
+        hashes = await asyncio.gather(*(get_password_hash_async(u.password) for u in batch))
+        db_objs.extend(
+            User.model_validate(user_create, update={"hashed_password": hashed_password})
+            for user_create, hashed_password in zip(batch, hashes)
+        )
+    session.add_all(db_objs)
+    await session.commit()
+    return db_objs
+
+
+async def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpdate) -> Any:
     user_data = user_in.model_dump(exclude_unset=True)
     extra_data = {}
     if "password" in user_data:
         password = user_data["password"]
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         extra_data["hashed_password"] = hashed_password
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 
-def get_user_by_email(*, session: Session, email: str) -> User | None:
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
     statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
-    return session_user
+    result = await session.execute(statement)
+    return result.scalars().first()
+
 
+async def get_user_with_items(*, session: AsyncSession, user_id: uuid.UUID) -> User | None:
+    """Load a user and all of their items in two queries (no lazy loads under asyncio)"""
+    statement = select(User).where(User.id == user_id).options(selectinload(User.items))
+    result = await session.execute(statement)
+    return result.scalars().first()
 
-def authenticate(*, session: Session, email: str, password: str) -> User | None:
-    db_user = get_user_by_email(session=session, email=email)
+
+async def authenticate(*, session: AsyncSession, email: str, password: str) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    if not await verify_password_async(password, db_user.hashed_password):
         return None
     return db_user
 
 
-def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
+async def create_item(*, session: AsyncSession, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
     db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
     session.add(db_item)
-    session.commit()
-    session.refresh(db_item)
+    await session.commit()
+    await session.refresh(db_item)
     return db_item
+
+
+async def create_items(*, session: AsyncSession, items_in: list[ItemCreate], owner_id: uuid.UUID) -> list[Item]:
+    """
+    Create many items in a single transaction.
+    Ids are generated client side, so the ORM batches the INSERTs instead of
+    issuing one statement (and one refresh) per item.
+    """
+    db_items = [Item.model_validate(item_in, update={"owner_id": owner_id}) for item_in in items_in]
+    session.add_all(db_items)
+    await session.commit()
+    return db_items
@@ -1,21 +1,39 @@
+import asyncio
 import logging
 
-from sqlmodel import Session
+from sqlmodel import SQLModel
 
-from app.core.db import engine, init_db
+from app import crud
+from app.config import settings
+from app.core.db import AsyncSessionLocal, engine
+from app.models import UserCreate
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def init() -> None:
-    with Session(engine) as session:
-        init_db(session)
+async def init() -> None:
+    # User/Item tables live in the SQLModel metadata but share the app's engine and pool
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    if not settings.first_superuser:
+        return
+
+    async with AsyncSessionLocal() as session:
+        user = await crud.get_user_by_email(session=session, email=settings.first_superuser)
+        if not user:
+            user_in = UserCreate(
+                email=settings.first_superuser,
+                password=settings.first_superuser_password,
+                is_superuser=True,
+            )
+            await crud.create_user(session=session, user_create=user_in)
 
 
 def main() -> None:
     logger.info("Creating initial data")
-    init()
+    asyncio.run(init())
     logger.info("Initial data created")
 
 
@@ -1,13 +1,20 @@
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from app.api.main import api_router
 from app.config import settings
 from app.models.prompts_schemas import HealthResponse
 from app.core import db
+from app.core.api_keys import api_key_cache
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.services.providers import model_router
+from app.services.usage import usage_meter
 
 logging.basicConfig(
     level=getattr(logging, settings.log_level.upper()),
@@ -27,8 +34,19 @@ async def lifespan(app: FastAPI):
     await db.init_db()
     logger.info("Database initialized successfully")
 
+    background_tasks = [asyncio.create_task(usage_meter.run_flusher())]
+    if settings.api_key_auth_enabled:
+        background_tasks.append(asyncio.create_task(api_key_cache.run_revocation_poller()))
+
     yield
     logger.info("Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    try:
+        await usage_meter.flush()
+    except Exception as e:
+        logger.error(f"Final token usage flush failed: {str(e)}")
+    await model_router.aclose()
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -50,6 +68,11 @@ app = FastAPI(
 )
 
 
+# Token-bucket rate limiting, state shared across workers. Added before CORS so it runs inside it
+# and browsers can read its 429 responses
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -59,6 +82,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request deadline, from the request_timeout_header or the route's default
+app.add_middleware(DeadlineMiddleware)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    logger.warning(f"Deadline exceeded for {request.method} {request.url.path}: {str(exc)}")
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+
 # include routers
 app.include_router(api_router, prefix=settings.api_prefix)
 
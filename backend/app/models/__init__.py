@@ -0,0 +1,43 @@
+from app.models.users import (
+    Item,
+    ItemBase,
+    ItemCreate,
+    ItemPublic,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+    NewPassword,
+    Token,
+    TokenPayload,
+    UpdatePassword,
+    User,
+    UserBase,
+    UserCreate,
+    UserPublic,
+    UserRegister,
+    UsersPublic,
+    UserUpdate,
+    UserUpdateMe,
+)
+
+__all__ = [
+    "Item",
+    "ItemBase",
+    "ItemCreate",
+    "ItemPublic",
+    "ItemsPublic",
+    "ItemUpdate",
+    "Message",
+    "NewPassword",
+    "Token",
+    "TokenPayload",
+    "UpdatePassword",
+    "User",
+    "UserBase",
+    "UserCreate",
+    "UserPublic",
+    "UserRegister",
+    "UsersPublic",
+    "UserUpdate",
+    "UserUpdateMe",
+]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from enum import Enum
 from app.config import settings
@@ -13,7 +13,8 @@ class ExecutionStatus(str, Enum):
 
 class PromptRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=10000, description="The prompt text")
-    project_name: str = Field(..., min_length=1, max_length=100, description="Project identifier")
+    brand_id: str = Field(..., min_length=1, max_length=100, description="Brand identifier")
+    brand_name: str = Field(..., min_length=1, max_length=100, description="Brand name")
     user_id: str = Field(..., min_length=1, max_length=100, description="User identifier")
     idempotency_key: str = Field(..., min_length=1, max_length=100, description="Unique key to prevent duplicates")
     company_id: str = Field(..., min_length=1, max_length=100, description="company identifier")
@@ -22,18 +23,89 @@ class PromptRequest(BaseModel):
 class PromptResponse(BaseModel):
     id: int
     prompt: str
-    project_name: str
+    brand_id: str
+    brand_name: str
     user_id: str
     idempotency_key: str
     created_at: datetime
     is_duplicate: bool = False
+    near_duplicates: List[int] = Field(
+        default_factory=list, description="Ids of the company's prompts this one nearly duplicates"
+    )
     company_id: str
     is_active: bool
 
 
+class SimilarPromptResponse(BaseModel):
+    id: int
+    prompt: str
+    brand_id: str
+    brand_name: str
+    user_id: str
+    company_id: str
+    created_at: datetime
+    score: float = Field(..., description="Cosine similarity to the query, 1 = same meaning")
+
+
+class PromptSearchResult(BaseModel):
+    id: int
+    prompt: str
+    brand_id: str
+    brand_name: str
+    user_id: str
+    created_at: datetime
+    relevance: float
+
+
+class PromptSearchResponse(BaseModel):
+    company_id: str
+    query: str
+    results: List[PromptSearchResult]
+    offset: int
+    limit: int
+    has_more: bool
+
+
+class AutocompleteResponse(BaseModel):
+    prefix: str
+    brands: List[str]
+    prompts: List[str]
+
+
+class ClusterPrompt(BaseModel):
+    id: int
+    prompt: str
+    similarity: float = Field(..., description="Cosine similarity to the cluster centroid")
+
+
+class PromptCluster(BaseModel):
+    cluster: int
+    label: str
+    size: int
+    updated_at: datetime
+    prompts: List[ClusterPrompt] = Field(..., description="The prompts closest to the centroid")
+
+
+class PromptClustersResponse(BaseModel):
+    company_id: str
+    clusters: List[PromptCluster]
+
+
+class NearDuplicatePrompt(BaseModel):
+    id: int
+    prompt: str
+
+
+class NearDuplicateReportResponse(BaseModel):
+    company_id: str
+    groups: List[List[NearDuplicatePrompt]]
+    redundant_prompts: int = Field(..., description="Prompts that could be dropped, keeping one per group")
+
+
 class ReferencePromptRequest(BaseModel):
     user_id: str
     origin_prompt: str
+    company_id: Optional[str] = None
 
 
 # 1. Nested model (for items in the array)
@@ -49,6 +121,66 @@ class AlternativePromptsResponse(BaseModel):
     total_count: int
 
 
+class CompetitorRequest(BaseModel):
+    company_id: str = Field(..., min_length=1, max_length=100, description="company identifier")
+    name: str = Field(..., min_length=1, max_length=100, description="Competitor brand name as it appears in answers")
+
+
+class CompetitorResponse(BaseModel):
+    id: int
+    company_id: str
+    name: str
+    created_at: datetime
+    is_active: bool
+
+
+class BrandVisibility(BaseModel):
+    day: Optional[date] = None
+    brand_name: str
+    is_competitor: bool
+    runs: int
+    runs_mentioned: int
+    mentions: int
+    mention_rate: float = Field(..., description="Share of the runs that mention the brand")
+    average_rank: float = Field(..., description="Mean position among the brands named in a run, 1 = first")
+    share_of_voice: float = Field(..., description="The brand's share of all brand mentions")
+
+
+class VisibilityResponse(BaseModel):
+    company_id: str
+    start: date
+    end: date
+    summary: List[BrandVisibility]
+    daily: List[BrandVisibility]
+
+
+class DailyPromptCount(BaseModel):
+    day: date
+    prompts: int
+
+
+class UserPromptCount(BaseModel):
+    user_id: str
+    prompts: int
+
+
+class BrandPromptCount(BaseModel):
+    brand_id: str
+    brand_name: str
+    prompts: int
+
+
+class PromptStatsResponse(BaseModel):
+    company_id: str
+    start: date
+    end: date
+    all_time: int = Field(..., description="Prompts the company has created, regardless of the range")
+    total: int = Field(..., description="Prompts created in the range")
+    by_day: List[DailyPromptCount]
+    by_user: List[UserPromptCount]
+    by_brand: List[BrandPromptCount]
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -0,0 +1,205 @@
+"""
+Type-ahead suggestions from a company's prompts and brand names.
+
+Each company gets a PrefixIndex: its distinct prompts and brand names as
+sorted arrays of normalised keys (casefolded, whitespace collapsed). A lookup
+is a binary search for the first key at or after the prefix, then a walk
+while keys still start with it, so serving a keystroke touches neither the
+database nor more than `limit` entries. The original text is kept next to a
+key only when it differs from it.
+
+Indexes are built from brand_prompts the first time a company asks for
+suggestions. Prompts created through this worker are added at once; those
+created through other workers are picked up at most
+autocomplete_refresh_interval seconds later, with one query for ids above
+the highest id already loaded less autocomplete_refresh_overlap, since a lower
+id can commit after a higher one. Every autocomplete_rebuild_interval seconds
+an index is rebuilt instead, which also drops prompts deactivated since, and
+catches any prompt that committed later than the overlap covers. The indexes
+share a per-worker memory budget
+(autocomplete_memory_budget); the least recently used companies are evicted
+to stay within it and rebuilt when they come back.
+"""
+import logging
+import sys
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.core.db import BrandPromptRecord
+
+logger = logging.getLogger(__name__)
+
+_SLOT_BYTES = 2 * 8  # one pointer in each of the two arrays
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class _SortedKeys:
+    """Sorted, de-duplicated normalised keys with their display text"""
+
+    def __init__(self):
+        self.keys: list[str] = []
+        self.texts: list[Optional[str]] = []  # None when the key itself is the display text
+        self.nbytes = 0
+
+    def add(self, text: str) -> None:
+        text = " ".join(text.split())
+        key = normalize(text)
+        if not key:
+            return
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return
+        display = None if text == key else text
+        self.keys.insert(i, key)
+        self.texts.insert(i, display)
+        self.nbytes += sys.getsizeof(key) + (sys.getsizeof(display) if display else 0) + _SLOT_BYTES
+
+    def extend(self, texts: list[str]) -> None:
+        """Add many texts with one sort instead of one insertion each"""
+        entries = dict(zip(self.keys, self.texts))
+        for text in texts:
+            text = " ".join(text.split())
+            key = normalize(text)
+            if key and key not in entries:
+                entries[key] = None if text == key else text
+        self.keys = sorted(entries)
+        self.texts = [entries[key] for key in self.keys]
+        self.nbytes = sum(
+            sys.getsizeof(key) + (sys.getsizeof(display) if display else 0) + _SLOT_BYTES
+            for key, display in zip(self.keys, self.texts)
+        )
+
+    def starting_with(self, prefix: str, limit: int) -> list[str]:
+        found = []
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(found) < limit and self.keys[i].startswith(prefix):
+            found.append(self.texts[i] or self.keys[i])
+            i += 1
+        return found
+
+
+class PrefixIndex:
+    """One company's prompts and brand names"""
+
+    def __init__(self):
+        self.prompts = _SortedKeys()
+        self.brands = _SortedKeys()
+        self.max_id = 0
+        self.built_at = self.refreshed_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.prompts.nbytes + self.brands.nbytes
+
+    def add(self, prompt: str, brand_name: str) -> None:
+        self.prompts.add(prompt)
+        self.brands.add(brand_name)
+
+    def suggest(self, prefix: str, limit: int) -> dict[str, list[str]]:
+        # A trailing space means the last word is complete: "best " should not suggest "bestseller"
+        prefix = normalize(prefix) + (" " if prefix[-1:].isspace() else "")
+        return {
+            "brands": self.brands.starting_with(prefix, limit),
+            "prompts": self.prompts.starting_with(prefix, limit),
+        }
+
+
+class AutocompleteCache:
+    """Per-company prefix indexes, evicted least recently used first under a memory budget"""
+
+    def __init__(
+            self,
+            memory_budget: int = settings.autocomplete_memory_budget,
+            refresh_interval: float = settings.autocomplete_refresh_interval,
+            refresh_overlap: int = settings.autocomplete_refresh_overlap,
+            rebuild_interval: float = settings.autocomplete_rebuild_interval
+    ):
+        self.memory_budget = memory_budget
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = refresh_overlap
+        self.rebuild_interval = rebuild_interval
+        self._indexes: OrderedDict[str, PrefixIndex] = OrderedDict()
+        self.counters = {"hits": 0, "builds": 0, "refreshes": 0, "evictions": 0}
+
+    async def suggest(self, session, company_id: str, prefix: str, limit: int) -> dict[str, list[str]]:
+        index = self._indexes.get(company_id)
+        if index is None or time.monotonic() - index.built_at > self.rebuild_interval:
+            index = await self._build(session, company_id)
+        else:
+            self.counters["hits"] += 1
+            self._indexes.move_to_end(company_id)
+            if time.monotonic() - index.refreshed_at > self.refresh_interval:
+                await self._load(session, company_id, index, since=index.max_id - self.refresh_overlap)
+                self.counters["refreshes"] += 1
+        return index.suggest(prefix, limit)
+
+    async def _build(self, session, company_id: str) -> PrefixIndex:
+        index = PrefixIndex()
+        await self._load(session, company_id, index, since=0)
+        self._indexes[company_id] = index
+        self._indexes.move_to_end(company_id)
+        self.counters["builds"] += 1
+        self._evict()
+        return index
+
+    async def _load(self, session, company_id: str, index: PrefixIndex, since: int) -> None:
+        """Add the company's active prompts with ids above `since`; prompts already in the index are skipped"""
+        started = time.monotonic()
+        rows = (await session.execute(
+            select(BrandPromptRecord.id, BrandPromptRecord.prompt, BrandPromptRecord.brand_name)
+            .where(
+                BrandPromptRecord.company_id == company_id,
+                BrandPromptRecord.id > since,
+                BrandPromptRecord.is_active.is_(True)
+            )
+            .order_by(BrandPromptRecord.id)
+        )).all()
+        if len(rows) > 100:
+            index.prompts.extend([row.prompt for row in rows])
+            index.brands.extend([row.brand_name for row in rows])
+        else:
+            for row in rows:
+                index.add(row.prompt, row.brand_name)
+        if rows:
+            index.max_id = max(index.max_id, rows[-1].id)
+        index.refreshed_at = started
+
+    def add_prompt(self, company_id: str, prompt: str, brand_name: str) -> None:
+        """Make a prompt created through this worker suggestible right away, if its company is loaded"""
+        index = self._indexes.get(company_id)
+        if index is not None:
+            # max_id is left alone: ids below this one may still be committing on other workers
+            index.add(prompt, brand_name)
+            self._evict()
+
+    def invalidate(self, company_id: str) -> None:
+        self._indexes.pop(company_id, None)
+
+    def _evict(self) -> None:
+        # The most recently used index is kept even if it alone exceeds the budget
+        total = sum(index.nbytes for index in self._indexes.values())
+        while total > self.memory_budget and len(self._indexes) > 1:
+            company_id, index = self._indexes.popitem(last=False)
+            total -= index.nbytes
+            self.counters["evictions"] += 1
+            logger.info(f"Evicted autocomplete index of company {company_id} ({index.nbytes} bytes)")
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "companies": len(self._indexes),
+            "bytes": sum(index.nbytes for index in self._indexes.values()),
+            "memory_budget": self.memory_budget,
+        }
+
+
+# Create global instance
+autocomplete_cache = AutocompleteCache()
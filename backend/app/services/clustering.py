@@ -0,0 +1,295 @@
+"""
+Topic clustering of a company's prompts.
+
+Clusters are found with spherical mini-batch k-means over the prompt
+embeddings kept by PromptEmbeddingStore, so no prompt is embedded twice:
+centroids are L2-normalised and prompts are assigned to the centroid with the
+highest cosine similarity. k grows with the square root of the company's
+prompt count, capped at cluster_max_k.
+
+A full fit seeds the centroids with k-means++ and runs cluster_iterations
+mini-batch steps, each moving the centroids hit by a random batch towards it
+with a per-centroid learning rate of 1 / (vectors seen by that centroid).
+Afterwards the weight of each centroid is reset to its cluster size and stored
+with it. When new prompts arrive only they are read: they are streamed through
+the same update once, which moves each centroid to the running mean of its old
+and new members, and are assigned; existing assignments are kept. A company is
+refit from scratch only when it has grown enough for k to grow by
+cluster_refit_growth, or when its embeddings were rebuilt with another model.
+
+Clusters are labelled with the words that best tell their prompts apart from
+the rest of the company's (the share of the cluster's prompts containing a
+word, times its smoothed inverse document frequency in the company).
+"""
+import logging
+import math
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, BrandPromptRecord, PromptClusterAssignmentRecord, PromptClusterRecord
+from app.services.embeddings import PromptEmbeddingStore, normalize, prompt_embeddings
+from app.services.near_duplicates import words
+
+logger = logging.getLogger(__name__)
+
+_ASSIGN_CHUNK = 8192  # rows of a memory-mapped matrix scored at a time
+_STOPWORDS = frozenset(
+    "a about an and any are as at be by can do does for from how i in is it me my of on or should than that the "
+    "their there these this to vs was what when where which who why will with you your".split()
+)
+
+
+def choose_k(count: int, max_k: int = settings.cluster_max_k) -> int:
+    return max(2, min(max_k, int(math.sqrt(count / 2))))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(nearest centroid, cosine similarity to it) of each normalised vector"""
+    clusters = np.empty(len(vectors), dtype=np.int64)
+    similarities = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        scores = np.asarray(vectors[start:start + _ASSIGN_CHUNK], dtype=np.float32) @ centroids.T
+        best = scores.argmax(axis=1)
+        clusters[start:start + len(best)] = best
+        similarities[start:start + len(best)] = scores[np.arange(len(best)), best]
+    return clusters, similarities
+
+
+def _seed(vectors: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding on a sample of the vectors"""
+    sample = vectors[np.sort(rng.choice(len(vectors), size=min(len(vectors), 50 * k), replace=False))]
+    centroids = [sample[rng.integers(len(sample))]]
+    distances = 1 - sample @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(distances, 0, None) ** 2
+        total = weights.sum()
+        chosen = rng.choice(len(sample), p=weights / total) if total > 0 else rng.integers(len(sample))
+        centroids.append(sample[chosen])
+        distances = np.minimum(distances, 1 - sample @ sample[chosen])
+    return np.array(centroids, dtype=np.float32)
+
+
+def _update(centroids: np.ndarray, weights: np.ndarray, batch: np.ndarray) -> None:
+    """One mini-batch step, in place: each centroid moves to the running mean of everything it has been given"""
+    clusters, _ = assign(batch, centroids)
+    hits = np.bincount(clusters, minlength=len(centroids))
+    membership = np.zeros((len(centroids), len(batch)), dtype=np.float32)
+    membership[clusters, np.arange(len(batch))] = 1
+    sums = membership @ batch  # a matrix product is far faster than np.add.at for this
+    weights += hits
+    moved = hits > 0
+    centroids[moved] += ((sums[moved] - hits[moved, None] * centroids[moved]) / weights[moved, None]).astype(
+        np.float32
+    )
+    centroids[moved] = normalize(centroids[moved])
+
+
+def fit(
+        vectors: np.ndarray,
+        k: int,
+        rng: np.random.Generator,
+        batch_size: int = settings.cluster_batch_size,
+        iterations: int = settings.cluster_iterations
+) -> np.ndarray:
+    """Centroids of a fresh mini-batch k-means fit"""
+    centroids = _seed(vectors, k, rng)
+    weights = np.zeros(k, dtype=np.float64)
+    for _ in range(iterations):
+        batch = np.asarray(vectors[np.sort(rng.integers(0, len(vectors), size=min(batch_size, len(vectors))))])
+        _update(centroids, weights, batch)
+    return centroids
+
+
+def partial_fit(
+        centroids: np.ndarray,
+        weights: np.ndarray,
+        vectors: np.ndarray,
+        batch_size: int = settings.cluster_batch_size
+) -> None:
+    """Stream new vectors through the centroids once, in place"""
+    for start in range(0, len(vectors), batch_size):
+        _update(centroids, weights, np.asarray(vectors[start:start + batch_size], dtype=np.float32))
+
+
+def label_clusters(texts: dict[int, str], members: dict[int, int], terms: int = settings.cluster_label_terms) -> dict:
+    """Label of each cluster from the texts of its prompts (prompt id -> cluster)"""
+    tokens = {
+        prompt_id: {word for word in words(text) if word not in _STOPWORDS and not word.isdigit() and len(word) > 1}
+        for prompt_id, text in texts.items() if prompt_id in members
+    }
+    document_frequency = Counter(word for prompt_words in tokens.values() for word in prompt_words)
+    cluster_frequency: dict[int, Counter] = {}
+    sizes = Counter()
+    for prompt_id, prompt_words in tokens.items():
+        cluster = members[prompt_id]
+        cluster_frequency.setdefault(cluster, Counter()).update(prompt_words)
+        sizes[cluster] += 1
+
+    labels = {}
+    for cluster, frequency in cluster_frequency.items():
+        scored = sorted(
+            frequency,
+            key=lambda word: (
+                -frequency[word] / sizes[cluster] * math.log(1 + len(tokens) / document_frequency[word]), word
+            )
+        )
+        labels[cluster] = " ".join(scored[:terms])
+    return labels
+
+
+class PromptClusterer:
+    """Cluster each company's embedded prompts and keep the clusters up to date as prompts are added"""
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            store: Optional[PromptEmbeddingStore] = None,
+            min_prompts: int = settings.cluster_min_prompts,
+            refit_growth: float = settings.cluster_refit_growth,
+            seed: int = 0
+    ):
+        self.session_factory = session_factory
+        self.store = store or prompt_embeddings
+        self.min_prompts = min_prompts
+        self.refit_growth = refit_growth
+        self.seed = seed
+
+    async def process_company(self, company_id: str, refit: bool = False) -> int:
+        """Cluster the company's new prompts, or all of them on a refit; returns the number of prompts assigned"""
+        matrix = self.store.load(company_id)
+        if matrix is None or not len(matrix.ids):
+            return 0
+        async with self.session_factory() as session:
+            clusters = (await session.execute(
+                select(PromptClusterRecord)
+                .where(PromptClusterRecord.company_id == company_id)
+                .order_by(PromptClusterRecord.cluster)
+            )).scalars().all()
+            members = dict((await session.execute(
+                select(PromptClusterAssignmentRecord.prompt_id, PromptClusterAssignmentRecord.cluster)
+                .where(PromptClusterAssignmentRecord.company_id == company_id)
+            )).all())
+            # Prompts are appended out of id order when a lower id commits late, so new rows are the unassigned ones
+            unassigned = ~np.isin(matrix.ids, np.fromiter(members, dtype=np.int64, count=len(members)))
+            if clusters and not refit and not unassigned.any():
+                return 0
+
+            texts = dict((await session.execute(
+                select(BrandPromptRecord.id, BrandPromptRecord.prompt)
+                .where(BrandPromptRecord.company_id == company_id, BrandPromptRecord.is_active.is_(True))
+            )).all())
+            active = np.isin(matrix.ids, np.fromiter(texts, dtype=np.int64, count=len(texts)))
+            rows = np.flatnonzero(active)
+            if len(rows) < self.min_prompts or (clusters and not refit and not (active & unassigned).any()):
+                return 0
+
+            rng = np.random.default_rng(self.seed)
+            refit = (
+                refit or not clusters or clusters[0].model != matrix.model
+                or choose_k(len(rows)) >= len(clusters) * self.refit_growth
+            )
+            if refit:
+                centroids = fit(matrix.vectors[rows], choose_k(len(rows)), rng)
+                assigned_rows = rows
+                members = {}
+                await session.execute(
+                    delete(PromptClusterAssignmentRecord).where(PromptClusterAssignmentRecord.company_id == company_id)
+                )
+            else:
+                centroids = np.array(
+                    [np.frombuffer(cluster.centroid, dtype="<f4") for cluster in clusters], dtype=np.float32
+                )
+                weights = np.array([cluster.size for cluster in clusters], dtype=np.float64)
+                assigned_rows = np.flatnonzero(active & unassigned)
+                partial_fit(centroids, weights, matrix.vectors[assigned_rows])
+
+            assigned, similarities = assign(matrix.vectors[assigned_rows], centroids)
+            prompt_ids = matrix.ids[assigned_rows]
+            members.update(zip(prompt_ids.tolist(), assigned.tolist()))
+            members = {prompt_id: cluster for prompt_id, cluster in members.items() if prompt_id in texts}
+            for offset in range(0, len(prompt_ids), 5000):
+                await session.execute(insert(PromptClusterAssignmentRecord), [
+                    {"prompt_id": prompt_id, "company_id": company_id, "cluster": cluster, "similarity": similarity}
+                    for prompt_id, cluster, similarity in zip(
+                        prompt_ids[offset:offset + 5000].tolist(),
+                        assigned[offset:offset + 5000].tolist(),
+                        similarities[offset:offset + 5000].tolist()
+                    )
+                ])
+
+            sizes = Counter(members.values())
+            labels = label_clusters(texts, members)
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            await session.execute(delete(PromptClusterRecord).where(PromptClusterRecord.company_id == company_id))
+            await session.execute(insert(PromptClusterRecord), [
+                {
+                    "company_id": company_id,
+                    "cluster": cluster,
+                    "label": labels.get(cluster, "")[:200],
+                    "size": sizes[cluster],
+                    "model": matrix.model,
+                    "centroid": centroid.astype("<f4").tobytes(),
+                    "updated_at": now,
+                }
+                for cluster, centroid in enumerate(centroids)
+            ])
+            await session.commit()
+        logger.info(
+            f"{'Fit' if refit else 'Updated'} {len(centroids)} clusters "
+            f"of company {company_id} with {len(assigned_rows)} prompts"
+        )
+        return len(assigned_rows)
+
+    async def process_pending(self, refit: bool = False) -> int:
+        total = 0
+        for company_id in self.store.companies():
+            try:
+                total += await self.process_company(company_id, refit=refit)
+            except Exception as e:
+                logger.error(f"Clustering prompts of company {company_id} failed: {str(e)}")
+        return total
+
+
+async def get_clusters(session, company_id: str, examples: int) -> list[tuple[PromptClusterRecord, list]]:
+    """The company's clusters, largest first, each with up to `examples` (id, prompt, similarity) closest to it"""
+    clusters = (await session.execute(
+        select(PromptClusterRecord)
+        .where(PromptClusterRecord.company_id == company_id, PromptClusterRecord.size > 0)
+        .order_by(PromptClusterRecord.size.desc(), PromptClusterRecord.cluster)
+    )).scalars().all()
+    closest = {cluster.cluster: [] for cluster in clusters}
+    if clusters and examples:
+        rank = func.row_number().over(
+            partition_by=PromptClusterAssignmentRecord.cluster,
+            order_by=(PromptClusterAssignmentRecord.similarity.desc(), PromptClusterAssignmentRecord.prompt_id)
+        ).label("rank")
+        ranked = (
+            select(
+                PromptClusterAssignmentRecord.cluster,
+                BrandPromptRecord.id,
+                BrandPromptRecord.prompt,
+                PromptClusterAssignmentRecord.similarity,
+                rank
+            )
+            .join(BrandPromptRecord, BrandPromptRecord.id == PromptClusterAssignmentRecord.prompt_id)
+            .where(PromptClusterAssignmentRecord.company_id == company_id, BrandPromptRecord.is_active.is_(True))
+            .subquery()
+        )
+        rows = await session.execute(
+            select(ranked.c.cluster, ranked.c.id, ranked.c.prompt, ranked.c.similarity)
+            .where(ranked.c.rank <= examples)
+            .order_by(ranked.c.cluster, ranked.c.rank)
+        )
+        for cluster, prompt_id, prompt, similarity in rows:
+            if cluster in closest:
+                closest[cluster].append((prompt_id, prompt, similarity))
+    return [(cluster, closest[cluster.cluster]) for cluster in clusters]
+
+
+# Create global instance
+prompt_clusterer = PromptClusterer()
@@ -0,0 +1,267 @@
+"""
+Prompt embeddings and semantic search.
+
+Each company's prompt embeddings live in their own directory under
+embeddings_dir as a flat float32 matrix (vectors.f32, one L2-normalised row per
+prompt), the matching prompt ids (ids.i64, in the order they were appended)
+and meta.json. Readers
+memory-map the matrix, so the OS page cache holds only what searches touch and
+all API workers share it; a search is one matrix-vector product (cosine
+similarity of normalised vectors) and an argpartition for the top k.
+
+EmbeddingIndexer is the only writer. It walks brand_prompts in id order from
+a watermark, embeds each company's new prompts with one Ollama /api/embed call
+per batch and appends them. A lower id can commit after a higher one has been
+indexed, so each pass also re-reads embedding_reindex_overlap ids below the
+watermark and embeds whatever is still missing. meta.json is replaced
+atomically after the rows are written and is the only thing readers trust, so
+a reader never sees a half-written row, and ids already in a company's matrix
+are skipped, so a batch replayed after a crash is not appended twice.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, BrandPromptRecord, WatermarkRecord
+from app.services.local_ai_services import LocalModelService, local_model_service
+from app.services.scheduling import Priority
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "prompt_embeddings"
+
+
+@dataclass
+class _Matrix:
+    version: int  # meta.json mtime_ns
+    model: str
+    ids: np.ndarray
+    vectors: np.ndarray
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class PromptEmbeddingStore:
+    """Per-company memory-mapped embedding matrices"""
+
+    def __init__(self, directory: str = settings.embeddings_dir):
+        self.directory = Path(directory)
+        self._matrices: dict[str, _Matrix] = {}
+
+    def _path(self, company_id: str) -> Path:
+        # company ids come from requests, so they are never used as path components directly
+        return self.directory / hashlib.sha256(company_id.encode("utf-8")).hexdigest()[:32]
+
+    def _meta(self, company_id: str) -> Optional[dict]:
+        try:
+            return json.loads((self._path(company_id) / "meta.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def load(self, company_id: str) -> Optional[_Matrix]:
+        """The company's matrix, re-mapped only when the indexer has appended since the last call"""
+        path = self._path(company_id)
+        try:
+            version = (path / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._matrices.get(company_id)
+        if cached is not None and cached.version == version:
+            return cached
+
+        meta = self._meta(company_id)
+        count, dim = meta["count"], meta["dim"]
+        ids = np.fromfile(path / "ids.i64", dtype=np.int64, count=count)
+        vectors = np.memmap(path / "vectors.f32", dtype=np.float32, mode="r", shape=(count, dim))
+        matrix = _Matrix(version=version, model=meta["model"], ids=ids, vectors=vectors)
+        self._matrices[company_id] = matrix
+        return matrix
+
+    def companies(self) -> list[str]:
+        """Companies with an embedding matrix"""
+        return sorted(json.loads(path.read_text())["company_id"] for path in self.directory.glob("*/meta.json"))
+
+    def _ids(self, company_id: str, meta: Optional[dict]) -> np.ndarray:
+        if meta is None:
+            return np.empty(0, dtype=np.int64)
+        return np.fromfile(self._path(company_id) / "ids.i64", dtype=np.int64, count=meta["count"])
+
+    def missing(self, company_id: str, ids: np.ndarray) -> np.ndarray:
+        """Mask of the prompt ids that are not in the company's matrix yet"""
+        matrix = self.load(company_id)
+        indexed = matrix.ids if matrix is not None else np.empty(0, dtype=np.int64)
+        return ~np.isin(np.asarray(ids, dtype=np.int64), indexed)
+
+    def append(self, company_id: str, model: str, ids: np.ndarray, vectors: np.ndarray) -> int:
+        """Append rows for prompt ids not in the company's matrix yet; returns the number appended"""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize(vectors)
+        path = self._path(company_id)
+        path.mkdir(parents=True, exist_ok=True)
+        stored = self._meta(company_id)
+        meta = stored or {
+            "company_id": company_id, "model": model, "dim": int(vectors.shape[1]), "count": 0, "last_id": 0
+        }
+        if meta["model"] != model or meta["dim"] != vectors.shape[1]:
+            raise ValueError(
+                f"Embeddings of company {company_id} were built with {meta['model']} ({meta['dim']} dims); "
+                f"rebuild them with scripts/index_prompts.py --rebuild"
+            )
+        # Read from disk rather than load(), whose cache is keyed by an mtime that may not change between appends
+        fresh = ~np.isin(ids, self._ids(company_id, stored))
+        if not fresh.any():
+            return 0
+        ids, vectors = ids[fresh], vectors[fresh]
+
+        # Rows past meta["count"] are leftovers of an interrupted append and are overwritten
+        for name, data, itemsize in (("vectors.f32", vectors, 4 * meta["dim"]), ("ids.i64", ids, 8)):
+            with open(path / name, "ab") as f:
+                f.truncate(meta["count"] * itemsize)
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta["count"] += len(ids)
+        meta["last_id"] = max(meta["last_id"], int(ids.max()))
+        tmp = path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, path / "meta.json")
+        return len(ids)
+
+    def vector(self, company_id: str, prompt_id: int) -> Optional[np.ndarray]:
+        matrix = self.load(company_id)
+        if matrix is None:
+            return None
+        rows = np.flatnonzero(matrix.ids == prompt_id)
+        if not len(rows):
+            return None
+        return np.array(matrix.vectors[rows[0]])
+
+    def search(
+            self,
+            company_id: str,
+            query: np.ndarray,
+            limit: int,
+            exclude_id: Optional[int] = None
+    ) -> list[tuple[int, float]]:
+        """Top `limit` (prompt id, cosine similarity) pairs, best first"""
+        matrix = self.load(company_id)
+        if matrix is None or not len(matrix.ids):
+            return []
+        scores = matrix.vectors @ normalize(query)
+        if exclude_id is not None:
+            scores[matrix.ids == exclude_id] = -np.inf
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(matrix.ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+class EmbeddingIndexer:
+    """Embed new brand prompts in batches and append them to their company's matrix"""
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            store: Optional[PromptEmbeddingStore] = None,
+            service: Optional[LocalModelService] = None,
+            batch_size: int = settings.embedding_batch_size,
+            model: str = settings.ai_embedding_model,
+            reindex_overlap: int = settings.embedding_reindex_overlap
+    ):
+        self.session_factory = session_factory
+        self.store = store or prompt_embeddings
+        self.service = service or local_model_service
+        self.batch_size = batch_size
+        self.model = model
+        self.reindex_overlap = reindex_overlap
+
+    async def _embed(self, prompts) -> int:
+        """Embed and append the prompts missing from their company's matrix; returns the number appended"""
+        by_company = defaultdict(list)
+        for prompt in prompts:
+            by_company[prompt.company_id].append(prompt)
+        appended = 0
+        for company_id, rows in by_company.items():
+            missing = self.store.missing(company_id, np.array([row.id for row in rows]))
+            rows = [row for row, is_missing in zip(rows, missing) if is_missing]
+            for offset in range(0, len(rows), self.batch_size):
+                chunk = rows[offset:offset + self.batch_size]
+                vectors = await self.service.embed(
+                    [row.prompt for row in chunk], company_id=company_id, priority=Priority.BATCH, model=self.model
+                )
+                appended += self.store.append(
+                    company_id, self.model, np.array([row.id for row in chunk]), np.array(vectors)
+                )
+        return appended
+
+    async def process_late(self) -> int:
+        """Embed prompts below the watermark that committed after it passed them; returns the number embedded"""
+        async with self.session_factory() as session:
+            watermark = await session.get(WatermarkRecord, WATERMARK_NAME)
+            position = watermark.position if watermark else 0
+            prompts = (await session.execute(
+                select(BrandPromptRecord.id, BrandPromptRecord.company_id, BrandPromptRecord.prompt)
+                .where(BrandPromptRecord.id > position - self.reindex_overlap, BrandPromptRecord.id <= position)
+                .order_by(BrandPromptRecord.id)
+            )).all()
+        embedded = await self._embed(prompts)
+        if embedded:
+            logger.info(f"Embedded {embedded} brand prompts that committed after the watermark passed them")
+        return embedded
+
+    async def process_batch(self) -> int:
+        """Embed the next batch of prompts; returns the number of prompts processed"""
+        async with self.session_factory() as session:
+            watermark = await session.get(WatermarkRecord, WATERMARK_NAME)
+            position = watermark.position if watermark else 0
+            prompts = (await session.execute(
+                select(BrandPromptRecord.id, BrandPromptRecord.company_id, BrandPromptRecord.prompt)
+                .where(BrandPromptRecord.id > position)
+                .order_by(BrandPromptRecord.id)
+                .limit(self.batch_size)
+            )).all()
+        if not prompts:
+            return 0
+
+        await self._embed(prompts)
+
+        async with self.session_factory() as session:
+            watermark = await session.get(WatermarkRecord, WATERMARK_NAME)
+            if watermark is None:
+                watermark = WatermarkRecord(name=WATERMARK_NAME)
+                session.add(watermark)
+            watermark.position = prompts[-1].id
+            watermark.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            await session.commit()
+        return len(prompts)
+
+    async def process_pending(self) -> int:
+        await self.process_late()
+        total = 0
+        while True:
+            processed = await self.process_batch()
+            if not processed:
+                break
+            total += processed
+        if total:
+            logger.info(f"Embedded {total} brand prompts")
+        return total
+
+
+# Create global instance
+prompt_embeddings = PromptEmbeddingStore()
@@ -0,0 +1,72 @@
+"""
+Hedged model requests.
+
+A slow generation is usually slow before its first token (a busy backend,
+a cold model load), so LocalModelService streams hedged calls and, when the
+primary backend has not produced a first token within the hedge delay, sends
+the same request to a secondary backend and keeps whichever finishes first.
+
+HedgePolicy decides when to hedge. The delay is a high percentile of recently
+observed first-token latencies, so only the slowest few percent of calls are
+duplicated. Primaries that never produce a token (cancelled after losing to
+their hedge, or failed) are sampled too, as at least the current delay:
+leaving them out would keep only the fast calls and pull the delay down until
+everything is hedged. A token-bucket budget (ai_hedge_budget hedges earned per primary
+request) bounds the extra load if a backend degrades and every call turns slow.
+"""
+import math
+from collections import deque
+from typing import Optional
+
+from app.config import settings
+
+
+class HedgePolicy:
+    """Hedge delay from recent first-token latencies, plus the hedge budget"""
+
+    def __init__(
+            self,
+            percentile: float = settings.ai_hedge_percentile,
+            min_delay: float = settings.ai_hedge_min_delay,
+            budget: float = settings.ai_hedge_budget,
+            window: int = 500,
+            min_samples: int = 20,
+            max_tokens: float = 10.0
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_tokens = max_tokens
+        self._samples: deque[float] = deque(maxlen=window)
+        self._tokens = max_tokens
+
+    def observe(self, first_token_latency: float) -> None:
+        self._samples.append(first_token_latency)
+
+    def observe_censored(self, elapsed: float) -> None:
+        """Sample a call that ended after `elapsed` seconds without a first token; its latency was at least that"""
+        delay = self.delay()
+        self._samples.append(elapsed if delay is None else max(elapsed, delay))
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for a first token before hedging, None until enough latencies are known"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+        return max(self.min_delay, ordered[index])
+
+    def earn(self) -> None:
+        """Credit the budget for one primary request"""
+        self._tokens = min(self.max_tokens, self._tokens + self.budget)
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget, False if it is exhausted"""
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def stats(self) -> dict:
+        return {"delay": self.delay(), "samples": len(self._samples), "budget": round(self._tokens, 3)}
@@ -1,7 +1,14 @@
+import asyncio
 import httpx
+import json
 import logging
+import time
 from typing import Optional, Dict, Any
 from app.config import settings
+from app.core.deadline import DeadlineExceeded, bounded, check_deadline, remaining, timeout_for
+from app.services.hedging import HedgePolicy
+from app.services.scheduling import FairScheduler, Priority, model_scheduler
+from app.services.usage import usage_meter
 
 logger = logging.getLogger(__name__)
 
@@ -9,16 +16,207 @@ logger = logging.getLogger(__name__)
 class LocalModelService:
     """Service for interacting with local models (wrapped in ollama)"""
 
-    def __init__(self):
-        self.base_url = settings.ai_model_url.rstrip('/')
+    def __init__(self, base_url: Optional[str] = None, scheduler: Optional[FairScheduler] = None):
+        self.base_url = (base_url or settings.ai_model_url).rstrip('/')
+        # The API workers' shared scheduler unless the caller brings its own (e.g. the standalone runner)
+        self.scheduler = scheduler or model_scheduler
         self.model = settings.ai_model
         self.timeout = httpx.Timeout(settings.ai_timeout, read=settings.ai_timeout)  # Longer timeout for local models
+        # Generation outcomes; cancelled_in_flight counts generations abandoned after Ollama started on them
+        self.counters = {
+            "completed": 0, "failed": 0, "cancelled_in_queue": 0, "cancelled_in_flight": 0, "deadline_exceeded": 0,
+            "hedged": 0, "hedge_won": 0, "hedge_denied": 0
+        }
+        # Ollama's prompt evaluation per endpoint, to see how much of the prompt the KV cache reuses
+        self.prompt_eval: Dict[str, Dict[str, float]] = {}
+        self.hedge_enabled = settings.ai_hedge_enabled
+        self.hedge_urls = [url.rstrip('/') for url in settings.ai_hedge_urls]
+        self.hedge_policy = HedgePolicy()
+        self._next_hedge = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        """Shared keep-alive client, so calls reuse pooled connections to the backends"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.ai_max_connections,
+                    max_keepalive_connections=settings.ai_max_connections
+                )
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _call_model(
+            self,
+            path: str,
+            payload: Dict[str, Any],
+            company_id: Optional[str],
+            user_id: Optional[str],
+            priority: Priority,
+            hedge: bool = True
+    ) -> Dict[str, Any]:
+        """
+        POST a generation request once a scheduler slot is free and record its usage.
+
+        If the calling task is cancelled (e.g. the client disconnected), the
+        cancellation propagates into the in-flight request: httpx closes the
+        connection, and Ollama stops generating once it sees the socket close.
+
+        The call is bounded by the request deadline: it is not started (or not
+        sent after queueing) when less than ai_min_budget is left, and the
+        upstream request is aborted once the deadline passes.
+        """
+        in_flight = False
+        try:
+            check_deadline(settings.ai_min_budget)
+            async with self.scheduler.slot(company_id or "default", priority):
+                # The budget may have run out while waiting for a slot
+                check_deadline(settings.ai_min_budget)
+                in_flight = True
+                timeout = timeout_for(settings.ai_timeout)
+                if hedge and self.hedge_enabled and self.hedge_urls and not payload.get("stream"):
+                    result = await bounded(self._hedged_call(path, payload, timeout))
+                else:
+                    response = await bounded(self._http().post(
+                        f"{self.base_url}{path}", json=payload, timeout=httpx.Timeout(timeout, read=timeout)
+                    ))
+                    response.raise_for_status()
+                    result = response.json()
+        except asyncio.CancelledError:
+            if in_flight:
+                self.counters["cancelled_in_flight"] += 1
+                logger.info(f"Cancelled in-flight generation for company {company_id}, upstream request aborted")
+            else:
+                self.counters["cancelled_in_queue"] += 1
+            raise
+        except DeadlineExceeded:
+            self.counters["deadline_exceeded"] += 1
+            raise
+        except httpx.TimeoutException:
+            left = remaining()
+            if left is not None and left <= 0:
+                self.counters["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"Model call for company {company_id} ran past the request deadline")
+            self.counters["failed"] += 1
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+
+        self.counters["completed"] += 1
+        self._record_usage(result, company_id, user_id)
+        self._record_prompt_eval(path, result)
+        return result
+
+    async def _hedged_call(self, path: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        Stream the call from the primary backend; if no token has arrived after
+        the hedge delay (and the budget allows), duplicate it to a secondary
+        backend and return whichever response completes first. The other
+        request is cancelled, which closes its connection and stops generation.
+        """
+        self.hedge_policy.earn()
+        first_token = asyncio.Event()
+        primary = asyncio.create_task(self._stream(self.base_url, path, payload, timeout, first_token))
+        delay = self.hedge_policy.delay()
+        if delay is None:
+            return await primary
+
+        waiter = asyncio.create_task(first_token.wait())
+        try:
+            await asyncio.wait({primary, waiter}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        finally:
+            waiter.cancel()
+        if first_token.is_set() or primary.done():
+            return await primary
+        if not self.hedge_policy.try_spend():
+            self.counters["hedge_denied"] += 1
+            return await primary
+
+        self.counters["hedged"] += 1
+        hedge_url = self.hedge_urls[self._next_hedge % len(self.hedge_urls)]
+        self._next_hedge += 1
+        hedge = asyncio.create_task(self._stream(hedge_url, path, payload, timeout, asyncio.Event()))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters["hedge_won"] += 1
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+                logger.warning(f"Hedged model call failed on one backend: {str(done.pop().exception())}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _stream(
+            self,
+            base_url: str,
+            path: str,
+            payload: Dict[str, Any],
+            timeout: float,
+            first_token: asyncio.Event
+    ) -> Dict[str, Any]:
+        """Stream a generation and reassemble it into the non-streamed response shape"""
+        started = time.monotonic()
+        parts = []
+        final: Dict[str, Any] = {}
+        try:
+            async with self._http().stream(
+                "POST", f"{base_url}{path}", json={**payload, "stream": True},
+                timeout=httpx.Timeout(timeout, read=timeout)
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise Exception(chunk["error"])
+                    if not first_token.is_set():
+                        first_token.set()
+                        if base_url == self.base_url:
+                            self.hedge_policy.observe(time.monotonic() - started)
+                    if "message" in chunk:
+                        parts.append(chunk["message"].get("content", ""))
+                    else:
+                        parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        final = chunk
+        finally:
+            # A primary that lost to its hedge or failed is the slow tail the delay is meant to cover
+            if base_url == self.base_url and not first_token.is_set():
+                self.hedge_policy.observe_censored(time.monotonic() - started)
+
+        result = dict(final)
+        if "message" in final:
+            result["message"] = {**final["message"], "content": "".join(parts)}
+        else:
+            result["response"] = "".join(parts)
+        return result
 
     async def generate(
             self,
             prompt: str,
             stream: bool = False,
-            options: Optional[Dict[str, Any]] = None
+            options: Optional[Dict[str, Any]] = None,
+            company_id: Optional[str] = None,
+            user_id: Optional[str] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            model: Optional[str] = None
     ) -> str:
         """
         Generate text using local model.
@@ -27,32 +225,33 @@ class LocalModelService:
             prompt: The input prompt
             stream: Whether to stream the response
             options: Additional model options (temperature, top_p, etc.)
+            company_id: Tenant the call is scheduled, weighted and billed under
+            user_id: User the token usage is attributed to
+            priority: Interactive calls are served before batch work
+            model: Ollama model to run, defaults to settings.ai_model
 
         Returns:
             str: Generated text response
         """
-        url = f"{self.base_url}/api/generate"
-
         payload = {
-            "model": self.model,
+            "model": model or self.model,
             "prompt": prompt,
             # "format": "json",
             "stream": stream
         }
 
-        print(payload)
-
         if options:
             payload["options"] = options
 
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
+        # Reject before queueing for a slot if the company has no quota left
+        usage_meter.check_quota(company_id)
 
-                result = response.json()
-                return result.get("response", "")
+        try:
+            result = await self._call_model("/api/generate", payload, company_id, user_id, priority)
+            return result.get("response", "")
 
+        except DeadlineExceeded:
+            raise
         except httpx.HTTPError as e:
             logger.error(f"Ollama HTTP error: {str(e)}")
             raise Exception(f"Failed to call Ollama: {str(e)}")
@@ -63,7 +262,11 @@ class LocalModelService:
     async def chat(
             self,
             messages: list[Dict[str, str]],
-            stream: bool = False
+            stream: bool = False,
+            company_id: Optional[str] = None,
+            user_id: Optional[str] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            model: Optional[str] = None
     ) -> str:
         """
         Chat completion using local model.
@@ -72,27 +275,29 @@ class LocalModelService:
             messages: List of message dicts with 'role' and 'content'
                      [{"role": "user", "content": "Hello"}]
             stream: Whether to stream the response
+            company_id: Tenant the call is scheduled, weighted and billed under
+            user_id: User the token usage is attributed to
+            priority: Interactive calls are served before batch work
+            model: Ollama model to run, defaults to settings.ai_model
 
         Returns:
             str: Generated response
         """
-        url = f"{self.base_url}/api/chat"
-
         payload = {
-            "model": self.model,
+            "model": model or self.model,
             "messages": messages,
             "stream": stream
         }
 
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
+        usage_meter.check_quota(company_id)
 
-                result = response.json()
-                message = result.get("message", {})
-                return message.get("content", "")
+        try:
+            result = await self._call_model("/api/chat", payload, company_id, user_id, priority)
+            message = result.get("message", {})
+            return message.get("content", "")
 
+        except DeadlineExceeded:
+            raise
         except httpx.HTTPError as e:
             logger.error(f"Ollama chat HTTP error: {str(e)}")
             raise Exception(f"Failed to call Ollama chat: {str(e)}")
@@ -100,18 +305,85 @@ class LocalModelService:
             logger.error(f"Ollama chat error: {str(e)}")
             raise Exception(f"Ollama chat processing error: {str(e)}")
 
+    async def embed(
+            self,
+            texts: list[str],
+            company_id: Optional[str] = None,
+            user_id: Optional[str] = None,
+            priority: Priority = Priority.BATCH,
+            model: Optional[str] = None
+    ) -> list[list[float]]:
+        """
+        Embed a batch of texts with a single Ollama call.
+
+        Args:
+            texts: Texts to embed, sent together as one /api/embed request
+            company_id: Tenant the call is scheduled and billed under
+            user_id: User the token usage is attributed to
+            priority: Batch for ingest-time indexing, interactive for search queries
+            model: Ollama embedding model, defaults to settings.ai_embedding_model
+
+        Returns:
+            list[list[float]]: One vector per text, in order
+        """
+        payload = {
+            "model": model or settings.ai_embedding_model,
+            "input": texts
+        }
+
+        try:
+            # Embeddings are not streamed, so there is no first token to hedge on
+            result = await self._call_model("/api/embed", payload, company_id, user_id, priority, hedge=False)
+            return result.get("embeddings", [])
+
+        except DeadlineExceeded:
+            raise
+        except httpx.HTTPError as e:
+            logger.error(f"Ollama embed HTTP error: {str(e)}")
+            raise Exception(f"Failed to call Ollama embed: {str(e)}")
+
+    def _record_usage(self, result: Dict[str, Any], company_id: Optional[str], user_id: Optional[str]) -> None:
+        """Attribute the token counts Ollama reports for a non-streamed response"""
+        usage_meter.record(
+            company_id=company_id,
+            user_id=user_id,
+            model=result.get("model", self.model),
+            prompt_tokens=result.get("prompt_eval_count", 0),
+            completion_tokens=result.get("eval_count", 0)
+        )
+
+    def _record_prompt_eval(self, path: str, result: Dict[str, Any]) -> None:
+        # prompt_eval_count only covers tokens not served from the cached prefix
+        stats = self.prompt_eval.setdefault(path, {"calls": 0, "tokens": 0, "seconds": 0.0})
+        stats["calls"] += 1
+        stats["tokens"] += result.get("prompt_eval_count", 0)
+        stats["seconds"] += result.get("prompt_eval_duration", 0) / 1e9
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+    def prompt_eval_stats(self) -> Dict[str, Dict[str, float]]:
+        """Mean prompt tokens evaluated and prompt-eval time per call, by endpoint"""
+        return {
+            path: {
+                "calls": stats["calls"],
+                "mean_tokens": stats["tokens"] / stats["calls"],
+                "mean_ms": stats["seconds"] * 1000 / stats["calls"],
+            }
+            for path, stats in self.prompt_eval.items()
+        }
+
     async def list_models(self) -> list[str]:
         """List available Ollama models"""
         url = f"{self.base_url}/api/tags"
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url)
-                response.raise_for_status()
+            response = await self._http().get(url, timeout=httpx.Timeout(timeout_for(settings.ai_timeout)))
+            response.raise_for_status()
 
-                result = response.json()
-                models = result.get("models", [])
-                return [model["name"] for model in models]
+            result = response.json()
+            models = result.get("models", [])
+            return [model["name"] for model in models]
 
         except Exception as e:
             logger.error(f"Failed to list Ollama models: {str(e)}")
@@ -119,10 +391,10 @@ class LocalModelService:
 
     async def check_health(self) -> bool:
         """Check if Ollama service is running"""
+        timeout = timeout_for(5.0)
         try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(5.0)) as client:
-                response = await client.get(self.base_url)
-                return response.status_code == 200
+            response = await self._http().get(self.base_url, timeout=httpx.Timeout(timeout))
+            return response.status_code == 200
         except:
             return False
 
@@ -0,0 +1,239 @@
+"""
+Brand-mention extraction over prompt run answers.
+
+A company's brand set (the brand names of its prompts plus its competitors)
+is compiled once into an Aho-Corasick automaton, so finding every brand in an
+answer is a single pass over the text whatever the number of brands, instead
+of one regex scan per brand. The automaton is completed into a DFA (one dict
+lookup per character) and matches case-insensitively on word boundaries.
+
+Compiled matchers are cached per company. A cached matcher is trusted for
+mentions_matcher_ttl seconds and then rebuilt only if the brand set changed.
+Extraction runs in scripts/run_prompts.py, not in the API workers where
+competitors are edited, so that TTL is how long a new or removed competitor
+(or brand) can take to show up in the mentions of new runs.
+
+MentionExtractor walks prompt_runs in id order from a watermark, in batches,
+and writes one brand_mentions row per (run, brand) with the count, the
+character offsets and the brand's rank by first appearance. The batch and the
+watermark are committed together, so re-running after a crash neither skips nor
+duplicates runs. See scripts/bench_mentions.py for throughput figures.
+"""
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import insert, select
+
+from app.config import settings
+from app.core.db import (
+    AsyncSessionLocal, BrandMentionRecord, BrandPromptRecord, CompetitorRecord, PromptRunRecord, WatermarkRecord
+)
+from app.models.prompts_schemas import ExecutionStatus
+from app.services.response_store import ResponseStore, response_store
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "brand_mentions"
+
+
+@dataclass
+class BrandMentions:
+    """Where one brand occurs in one text"""
+    brand: str
+    is_competitor: bool
+    positions: list[int]
+
+    @property
+    def count(self) -> int:
+        return len(self.positions)
+
+
+def _fold(text: str) -> str:
+    # Case-fold without changing string length, so match offsets index the original text
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+class BrandMatcher:
+    """Aho-Corasick automaton over a fixed set of brand names"""
+
+    def __init__(self, brands: Iterable[str], competitors: Iterable[str] = ()):
+        self.is_competitor: dict[str, bool] = {}
+        for name in brands:
+            if name.strip():
+                self.is_competitor[name.strip()] = False
+        for name in competitors:
+            if name.strip():
+                self.is_competitor.setdefault(name.strip(), True)
+
+        # Trie: per state a char -> state dict; outputs are (pattern length, brand) pairs
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[list[tuple[int, str]]] = [[]]
+        for brand in self.is_competitor:
+            state = 0
+            for ch in _fold(brand):
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(brand), brand))
+        self._build()
+
+    def _build(self) -> None:
+        # Breadth-first failure links, folding each state's failure transitions and outputs
+        # into it so scanning never has to follow a failure link
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                # Shallower states are already complete, so one lookup finds the failure state
+                fail[nxt] = self._goto[fail[state]].get(ch, 0) if state else 0
+                self._out[nxt] = self._out[nxt] + self._out[fail[nxt]]
+            if state:
+                for ch, target in self._goto[fail[state]].items():
+                    self._goto[state].setdefault(ch, target)
+
+    def find(self, text: str) -> list[BrandMentions]:
+        """Brands found in text, ordered by first appearance"""
+        folded = _fold(text)
+        goto, out = self._goto, self._out
+        found: dict[str, list[int]] = {}
+        state = 0
+        length = len(text)
+        for end, ch in enumerate(folded, 1):
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pattern_length, brand in out[state]:
+                    start = end - pattern_length
+                    # Whole words only: "Acme" must not match inside "Acmeville"
+                    if start > 0 and text[start - 1].isalnum():
+                        continue
+                    if end < length and text[end].isalnum():
+                        continue
+                    found.setdefault(brand, []).append(start)
+        return [
+            BrandMentions(brand, self.is_competitor[brand], positions)
+            for brand, positions in sorted(found.items(), key=lambda item: item[1][0])
+        ]
+
+
+class MatcherCache:
+    """Compiled matchers per company, reused until the brand set changes"""
+
+    def __init__(self, ttl: float = settings.mentions_matcher_ttl):
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, frozenset, BrandMatcher]] = {}
+
+    async def get(self, session, company_id: str) -> BrandMatcher:
+        entry = self._entries.get(company_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[2]
+
+        brands = (await session.execute(
+            select(BrandPromptRecord.brand_name)
+            .where(BrandPromptRecord.company_id == company_id, BrandPromptRecord.is_active.is_(True))
+            .distinct()
+        )).scalars().all()
+        competitors = (await session.execute(
+            select(CompetitorRecord.name)
+            .where(CompetitorRecord.company_id == company_id, CompetitorRecord.is_active.is_(True))
+        )).scalars().all()
+        fingerprint = frozenset((name, False) for name in brands) | frozenset((name, True) for name in competitors)
+
+        if entry is not None and entry[1] == fingerprint:
+            matcher = entry[2]
+        else:
+            matcher = BrandMatcher(brands, competitors)
+        self._entries[company_id] = (time.monotonic() + self.ttl, fingerprint, matcher)
+        return matcher
+
+    def invalidate(self, company_id: str) -> None:
+        self._entries.pop(company_id, None)
+
+
+class MentionExtractor:
+    """Incrementally extract brand mentions from new prompt runs"""
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            cache: Optional[MatcherCache] = None,
+            batch_size: int = settings.mentions_batch_size,
+            store: Optional[ResponseStore] = None
+    ):
+        self.session_factory = session_factory
+        self.cache = cache or matcher_cache
+        self.store = store or response_store
+        self.batch_size = batch_size
+
+    async def process_batch(self) -> int:
+        """Extract mentions from the next batch of runs; returns the number of runs processed"""
+        async with self.session_factory() as session:
+            async with session.begin():
+                watermark = await session.get(WatermarkRecord, WATERMARK_NAME, with_for_update=True)
+                if watermark is None:
+                    watermark = WatermarkRecord(name=WATERMARK_NAME, position=0)
+                    session.add(watermark)
+
+                runs = (await session.execute(
+                    select(PromptRunRecord.id, PromptRunRecord.company_id, PromptRunRecord.response_hash)
+                    .where(PromptRunRecord.id > watermark.position)
+                    .where(PromptRunRecord.status == ExecutionStatus.SUCCESS.value)
+                    .order_by(PromptRunRecord.id)
+                    .limit(self.batch_size)
+                )).all()
+                if not runs:
+                    return 0
+
+                responses = await self.store.get_many(session, (run.response_hash for run in runs))
+                now = datetime.now(timezone.utc).replace(tzinfo=None)
+                rows = []
+                for run in runs:
+                    response = responses.get(run.response_hash)
+                    if not response:
+                        continue
+                    matcher = await self.cache.get(session, run.company_id)
+                    for rank, mention in enumerate(matcher.find(response), 1):
+                        rows.append({
+                            "run_id": run.id,
+                            "company_id": run.company_id,
+                            "brand_name": mention.brand,
+                            "is_competitor": mention.is_competitor,
+                            "mention_count": mention.count,
+                            "rank": rank,
+                            "positions": json.dumps(mention.positions),
+                            "created_at": now,
+                        })
+                if rows:
+                    await session.execute(insert(BrandMentionRecord), rows)
+                watermark.position = runs[-1].id
+                watermark.updated_at = now
+        return len(runs)
+
+    async def process_pending(self) -> int:
+        """Process batches until caught up with prompt_runs"""
+        total = 0
+        while True:
+            processed = await self.process_batch()
+            if not processed:
+                break
+            total += processed
+        if total:
+            logger.info(f"Extracted brand mentions from {total} prompt runs")
+        return total
+
+
+# Create global instance
+matcher_cache = MatcherCache()
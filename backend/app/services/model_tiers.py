@@ -0,0 +1,85 @@
+"""
+Complexity-aware choice between local model tiers.
+
+ai_model_tiers lists the local models from smallest to largest. Each request is
+scored from cheap features of its variable part (word count, comparison and
+multi-clause markers, code-like or non-ASCII text) and sent to the smallest
+tier its score allows, so a three-word origin prompt runs on a small model
+instead of the 30B one. When a smaller tier's output fails the caller's schema
+validation the call is retried once on the largest tier.
+
+Latency and fallback counts are kept per tier for /metrics/model.
+"""
+import re
+from collections import deque
+from typing import Optional
+
+from app.config import settings
+
+_COMPARISON = re.compile(r"\b(vs|versus|compare|comparison|difference|between|alternatives? to)\b", re.IGNORECASE)
+_CODE_LIKE = re.compile(r"[{}\[\]<>;=]|```")
+
+
+def complexity_score(text: str, max_words: int = settings.ai_small_tier_max_words) -> float:
+    """0 for a trivially simple request, each whole point moves it one tier up"""
+    words = len(text.split())
+    score = words / max(max_words, 1)
+    if _COMPARISON.search(text):
+        score += 0.5
+    if text.count(",") + text.count("?") + text.lower().count(" and ") >= 2:
+        score += 0.5
+    if _CODE_LIKE.search(text):
+        score += 1.0
+    if any(ord(ch) > 127 for ch in text):
+        score += 0.5
+    return score
+
+
+class _TierStats:
+    def __init__(self, window: int = 500):
+        self.calls = 0
+        self.fallbacks = 0
+        self.latencies: deque[float] = deque(maxlen=window)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def pct(p: float) -> Optional[float]:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else None
+
+        return {
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": self.fallbacks / self.calls if self.calls else 0.0,
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+        }
+
+
+class ModelTierSelector:
+    """Pick a local model per request and record how each tier performs"""
+
+    def __init__(self, tiers: Optional[list[str]] = None, max_words: int = settings.ai_small_tier_max_words):
+        tiers = tiers if tiers is not None else list(settings.ai_model_tiers)
+        self.tiers = tiers or [settings.ai_model]
+        self.max_words = max_words
+        self._stats = {model: _TierStats() for model in self.tiers}
+
+    @property
+    def largest(self) -> str:
+        return self.tiers[-1]
+
+    def select(self, text: str) -> str:
+        index = int(complexity_score(text, self.max_words))
+        return self.tiers[min(index, len(self.tiers) - 1)]
+
+    def observe(self, model: str, latency: float) -> None:
+        stats = self._stats[model]
+        stats.calls += 1
+        stats.latencies.append(latency)
+
+    def observe_fallback(self, model: str) -> None:
+        self._stats[model].fallbacks += 1
+
+    def stats(self) -> dict:
+        return {model: stats.snapshot() for model, stats in self._stats.items()}
@@ -0,0 +1,237 @@
+"""
+Near-duplicate detection for brand prompts.
+
+Two prompts are near-duplicates when the Jaccard similarity of their sets of
+casefolded words reaches dedup_threshold, so differences in casing,
+punctuation and word order do not count. Comparing a new prompt with every
+prompt of its company would be linear in the table, so candidates come from
+locality-sensitive hashing instead: each prompt's MinHash signature
+(dedup_num_perm permutations) is cut into dedup_bands bands, and every band is
+hashed into a bucket stored in prompt_lsh_buckets. Prompts sharing any bucket
+with the new one are found with an index lookup and then checked exactly
+against its words. A popular template can put thousands of prompts in the
+same buckets, so a new prompt is checked against at most dedup_max_candidates
+of them (the newest) and reports at most dedup_max_matches.
+
+Buckets are written in the caller's transaction, so the index is maintained
+incrementally with the prompts themselves and never drifts from them.
+"""
+import hashlib
+import logging
+import re
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from app.config import settings
+from app.core.db import BrandPromptRecord, PromptLshBucketRecord
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 31) - 1  # products of two values below it fit in uint64
+_WORD = re.compile(r"\w+")
+
+
+def words(text: str) -> set[str]:
+    return set(_WORD.findall(text.casefold()))
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") % _PRIME
+
+
+class MinHashLSH:
+    """MinHash signatures and their LSH band buckets"""
+
+    def __init__(self, num_perm: int = settings.dedup_num_perm, bands: int = settings.dedup_bands, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: set[str]) -> np.ndarray:
+        hashes = np.fromiter((_token_hash(token) for token in tokens), dtype=np.uint64, count=len(tokens))
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def buckets(self, tokens: set[str]) -> list[int]:
+        """One signed 64-bit bucket key per band; none for a prompt without words"""
+        if not tokens:
+            return []
+        signature = self.signature(tokens).astype("<u4")
+        return [
+            int.from_bytes(
+                hashlib.blake2b(
+                    band.to_bytes(2, "little") + signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                    digest_size=8
+                ).digest(),
+                "little",
+                signed=True
+            )
+            for band in range(self.bands)
+        ]
+
+
+class NearDuplicateIndex:
+    """Per-company LSH index over brand prompts, stored in prompt_lsh_buckets"""
+
+    def __init__(
+            self,
+            lsh: Optional[MinHashLSH] = None,
+            threshold: float = settings.dedup_threshold,
+            max_candidates: int = settings.dedup_max_candidates,
+            max_matches: int = settings.dedup_max_matches
+    ):
+        self.lsh = lsh or MinHashLSH()
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.max_matches = max_matches
+
+    def _candidates(self, buckets: list[int], members: dict[int, list[int]]) -> list[int]:
+        """The newest prompts sharing a bucket, at most max_candidates"""
+        chosen = {}
+        for bucket in buckets:
+            for candidate in reversed(members[bucket]):
+                if len(chosen) >= self.max_candidates:
+                    return list(chosen)
+                chosen.setdefault(candidate, None)
+        return list(chosen)
+
+    async def add_many(self, session, company_id: str, prompts: list[tuple[int, str]]) -> dict[int, list[int]]:
+        """
+        Index newly inserted (id, text) prompts in the caller's transaction and return, per prompt id,
+        the ids of the company's active prompts it nearly duplicates (including earlier ones in `prompts`).
+        """
+        tokens = {prompt_id: words(text) for prompt_id, text in prompts}
+        buckets = {prompt_id: self.lsh.buckets(tokens[prompt_id]) for prompt_id, _ in prompts}
+        all_buckets = {bucket for keys in buckets.values() for bucket in keys}
+        if not all_buckets:
+            return {prompt_id: [] for prompt_id, _ in prompts}
+
+        members = defaultdict(list)  # bucket -> prompt ids, oldest first
+        for chunk in _chunks(list(all_buckets), 1000):
+            rows = await session.execute(
+                select(PromptLshBucketRecord.bucket, PromptLshBucketRecord.prompt_id)
+                .where(PromptLshBucketRecord.company_id == company_id, PromptLshBucketRecord.bucket.in_(chunk))
+                .order_by(PromptLshBucketRecord.prompt_id)
+            )
+            for bucket, prompt_id in rows:
+                members[bucket].append(prompt_id)
+
+        # Earlier prompts of the same batch are candidates for the later ones too
+        candidates = {}
+        for prompt_id, _ in prompts:
+            candidates[prompt_id] = self._candidates(buckets[prompt_id], members)
+            for bucket in buckets[prompt_id]:
+                members[bucket].append(prompt_id)
+
+        stored = {candidate for ids in candidates.values() for candidate in ids} - set(tokens)
+        known = {
+            prompt_id: words(text)
+            for prompt_id, text in (await self._active_prompts(session, company_id, stored)).items()
+        }
+        known.update(tokens)
+
+        matches = {}
+        for prompt_id, _ in prompts:
+            scored = []
+            for candidate in candidates[prompt_id]:
+                if candidate in known:
+                    score = jaccard(tokens[prompt_id], known[candidate])
+                    if score >= self.threshold:
+                        scored.append((score, candidate))
+            scored.sort(reverse=True)
+            matches[prompt_id] = sorted(candidate for _, candidate in scored[:self.max_matches])
+
+        rows = [
+            {"company_id": company_id, "bucket": bucket, "prompt_id": prompt_id}
+            for prompt_id, keys in buckets.items()
+            for bucket in keys
+        ]
+        if rows:
+            await session.execute(insert(PromptLshBucketRecord), rows)
+        return matches
+
+    async def _active_prompts(self, session, company_id: str, prompt_ids: set[int]) -> dict[int, str]:
+        texts = {}
+        for chunk in _chunks(sorted(prompt_ids), 1000):
+            rows = await session.execute(
+                select(BrandPromptRecord.id, BrandPromptRecord.prompt).where(
+                    BrandPromptRecord.id.in_(chunk),
+                    BrandPromptRecord.company_id == company_id,
+                    BrandPromptRecord.is_active.is_(True)
+                )
+            )
+            texts.update(dict(rows.all()))
+        return texts
+
+    async def report(self, session, company_id: str) -> list[list[tuple[int, str]]]:
+        """Groups of the company's active prompts that are near-duplicates of each other, largest first"""
+        shared = (
+            select(PromptLshBucketRecord.bucket)
+            .where(PromptLshBucketRecord.company_id == company_id)
+            .group_by(PromptLshBucketRecord.bucket)
+            .having(func.count() > 1)
+        )
+        rows = (await session.execute(
+            select(PromptLshBucketRecord.bucket, PromptLshBucketRecord.prompt_id).where(
+                PromptLshBucketRecord.company_id == company_id,
+                PromptLshBucketRecord.bucket.in_(shared)
+            )
+        )).all()
+        members = defaultdict(list)
+        for bucket, prompt_id in rows:
+            members[bucket].append(prompt_id)
+        texts = await self._active_prompts(session, company_id, {prompt_id for _, prompt_id in rows})
+        tokens = {prompt_id: words(text) for prompt_id, text in texts.items()}
+
+        # Union-find; within a bucket each prompt is only checked against one member of every component
+        # seen there so far, so a bucket of m near-duplicates costs m checks rather than m^2 / 2
+        parent = {prompt_id: prompt_id for prompt_id in tokens}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for ids in members.values():
+            representatives = []
+            for prompt_id in sorted(prompt_id for prompt_id in set(ids) if prompt_id in tokens):
+                root = find(prompt_id)
+                if any(find(rep) == root for rep in representatives):
+                    continue
+                joined = False
+                for rep in representatives:
+                    if find(rep) != find(prompt_id) and jaccard(tokens[prompt_id], tokens[rep]) >= self.threshold:
+                        parent[find(prompt_id)] = find(rep)
+                        joined = True
+                if not joined:
+                    representatives.append(prompt_id)
+
+        groups = defaultdict(list)
+        for prompt_id in parent:
+            groups[find(prompt_id)].append(prompt_id)
+        return sorted(
+            ([(prompt_id, texts[prompt_id]) for prompt_id in sorted(ids)] for ids in groups.values() if len(ids) > 1),
+            key=lambda group: (-len(group), group[0][0])
+        )
+
+
+def _chunks(items: list, size: int):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+# Create global instance
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,304 @@
+"""
+Scheduled execution of brand prompts.
+
+Once per runner_interval a cycle runs every active BrandPromptRecord through
+the local model backends and records each run in prompt_runs, with the answer
+itself in the response store. Prompts are
+read in id order with keyset pagination, runner_batch_size at a time, and run
+with at most runner_concurrency calls in flight, spread round-robin over the
+backends, each behind its own request-rate limit. The runner gives the
+backends it creates a fair scheduler of its own with runner_concurrency slots
+and none reserved for interactive calls, since the standalone runner has no
+interactive traffic; the API workers' scheduler (ai_max_concurrency, with a
+reserved interactive slot) would otherwise cap a cycle at a few calls in
+flight whatever runner_concurrency and the number of backends are.
+
+A batch's runs and the cycle's cursor are committed in one transaction, so
+after a crash the cycle resumes right after the last recorded batch without
+duplicating or skipping prompts. The process running a cycle holds a lease
+(owner + heartbeat); another runner only takes the cycle over once the
+heartbeat is older than runner_lease_timeout. Cycle ids are derived from the
+interval slot, so two runners starting together cannot both open a cycle.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Sequence
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, BrandPromptRecord, PromptRunRecord, RunCycleRecord
+from app.models.prompts_schemas import ExecutionStatus
+from app.services.local_ai_services import LocalModelService
+from app.services.response_store import ResponseStore, response_store
+from app.services.scheduling import FairScheduler, Priority
+
+logger = logging.getLogger(__name__)
+
+CYCLE_RUNNING = "running"
+CYCLE_COMPLETED = "completed"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class LeaseLostError(Exception):
+    """Another runner took over the cycle this process was working on"""
+
+
+class AsyncRateLimiter:
+    """Token bucket for one backend; acquire() waits until the next request may start"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PromptRunner:
+    """Run all active brand prompts once per cycle and record the answers"""
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            backends: Optional[Sequence[LocalModelService]] = None,
+            concurrency: int = settings.runner_concurrency,
+            batch_size: int = settings.runner_batch_size,
+            interval: int = settings.runner_interval,
+            owner: Optional[str] = None,
+            store: Optional[ResponseStore] = None
+    ):
+        self.session_factory = session_factory
+        self.store = store or response_store
+        if backends is None:
+            # Prompts are still interleaved fairly across companies within the runner's own slots
+            self.scheduler = FairScheduler(max_concurrency=concurrency, interactive_reserved=0)
+            backends = [
+                LocalModelService(url, scheduler=self.scheduler)
+                for url in settings.runner_backend_urls or [settings.ai_model_url]
+            ]
+            for backend in backends:
+                backend.hedge_enabled = False  # duplicated batch calls would only eat backend capacity
+        self.backends = list(backends)
+        self.limiters = {
+            backend.base_url: AsyncRateLimiter(
+                settings.runner_rate_limits.get(backend.base_url, settings.runner_default_rate_limit)
+            )
+            for backend in self.backends
+        }
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.interval = interval
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._next_backend = 0
+
+    async def claim_cycle(self) -> Optional[RunCycleRecord]:
+        """Resume an abandoned running cycle, or open the current interval's cycle if it has not run yet"""
+        now = _utcnow()
+        async with self.session_factory() as session:
+            running = (await session.execute(
+                select(RunCycleRecord)
+                .where(RunCycleRecord.status == CYCLE_RUNNING)
+                .order_by(RunCycleRecord.started_at)
+                .limit(1)
+            )).scalar_one_or_none()
+
+            if running is not None:
+                stale = now - timedelta(seconds=settings.runner_lease_timeout)
+                result = await session.execute(
+                    update(RunCycleRecord)
+                    .where(
+                        RunCycleRecord.id == running.id,
+                        RunCycleRecord.status == CYCLE_RUNNING,
+                        or_(
+                            RunCycleRecord.owner == self.owner,
+                            RunCycleRecord.owner.is_(None),
+                            RunCycleRecord.heartbeat_at < stale
+                        )
+                    )
+                    .values(owner=self.owner, heartbeat_at=now)
+                )
+                await session.commit()
+                if result.rowcount != 1:
+                    return None
+                await session.refresh(running)
+                logger.info(f"Resuming cycle {running.id} after prompt id {running.cursor}")
+                return running
+
+            slot = int(time.time()) // self.interval * self.interval
+            cycle = RunCycleRecord(
+                id=f"cycle-{slot}", status=CYCLE_RUNNING, cursor=0, prompts_run=0, prompts_failed=0,
+                owner=self.owner, heartbeat_at=now, started_at=now
+            )
+            session.add(cycle)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # This interval's cycle already ran, or another runner just opened it
+                await session.rollback()
+                return None
+            logger.info(f"Started cycle {cycle.id}")
+            return cycle
+
+    async def run_cycle(self, cycle: RunCycleRecord) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(cycle.id))
+        try:
+            cursor = cycle.cursor
+            while True:
+                async with self.session_factory() as session:
+                    prompts = (await session.execute(
+                        select(
+                            BrandPromptRecord.id,
+                            BrandPromptRecord.prompt,
+                            BrandPromptRecord.company_id,
+                            BrandPromptRecord.brand_id,
+                            BrandPromptRecord.user_id
+                        )
+                        .where(BrandPromptRecord.is_active.is_(True), BrandPromptRecord.id > cursor)
+                        .order_by(BrandPromptRecord.id)
+                        .limit(self.batch_size)
+                    )).all()
+                if not prompts:
+                    break
+
+                semaphore = asyncio.Semaphore(self.concurrency)
+                runs = await asyncio.gather(*(self._run_one(cycle.id, prompt, semaphore) for prompt in prompts))
+                cursor = prompts[-1].id
+                await self._commit_batch(cycle.id, runs, cursor)
+                logger.info(f"Cycle {cycle.id}: recorded {len(runs)} runs up to prompt id {cursor}")
+
+            await self._finish(cycle.id)
+        finally:
+            heartbeat.cancel()
+
+    async def _run_one(self, cycle_id: str, prompt, semaphore: asyncio.Semaphore) -> dict:
+        async with semaphore:
+            backend = self.backends[self._next_backend % len(self.backends)]
+            self._next_backend += 1
+            await self.limiters[backend.base_url].acquire()
+
+            started = time.monotonic()
+            response, error = None, None
+            try:
+                response = await backend.chat(
+                    messages=[{"role": "user", "content": prompt.prompt}],
+                    company_id=prompt.company_id,
+                    user_id=prompt.user_id,
+                    priority=Priority.BATCH
+                )
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Run of prompt {prompt.id} on {backend.base_url} failed: {error}")
+
+            return {
+                "cycle_id": cycle_id,
+                "prompt_id": prompt.id,
+                "company_id": prompt.company_id,
+                "brand_id": prompt.brand_id,
+                "model": backend.model,
+                "backend": backend.base_url,
+                "status": (ExecutionStatus.FAILED if error else ExecutionStatus.SUCCESS).value,
+                "response": response,
+                "error": error,
+                "latency_ms": int((time.monotonic() - started) * 1000),
+                "created_at": _utcnow(),
+            }
+
+    async def _commit_batch(self, cycle_id: str, runs: list[dict], cursor: int) -> None:
+        """Store a batch's runs and advance the cursor atomically, as long as this runner still holds the lease"""
+        failed = sum(1 for run in runs if run["status"] == ExecutionStatus.FAILED.value)
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(RunCycleRecord)
+                    .where(RunCycleRecord.id == cycle_id, RunCycleRecord.owner == self.owner)
+                    .values(
+                        cursor=cursor,
+                        heartbeat_at=_utcnow(),
+                        prompts_run=RunCycleRecord.prompts_run + len(runs),
+                        prompts_failed=RunCycleRecord.prompts_failed + failed
+                    )
+                )
+                if result.rowcount != 1:
+                    raise LeaseLostError(f"Cycle {cycle_id} is no longer owned by {self.owner}")
+                hashes = await self.store.put_many(session, [(run["model"], run.pop("response")) for run in runs])
+                for run, response_hash in zip(runs, hashes):
+                    run["response_hash"] = response_hash
+                if runs:
+                    await session.execute(insert(PromptRunRecord), runs)
+
+    async def _finish(self, cycle_id: str) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                update(RunCycleRecord)
+                .where(RunCycleRecord.id == cycle_id, RunCycleRecord.owner == self.owner)
+                .values(status=CYCLE_COMPLETED, finished_at=_utcnow(), owner=None)
+            )
+            await session.commit()
+        logger.info(f"Cycle {cycle_id} completed")
+
+    async def _heartbeat(self, cycle_id: str) -> None:
+        # Batches can take longer than the lease timeout, so the lease is renewed independently
+        while True:
+            await asyncio.sleep(settings.runner_lease_timeout / 3)
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(
+                        update(RunCycleRecord)
+                        .where(RunCycleRecord.id == cycle_id, RunCycleRecord.owner == self.owner)
+                        .values(heartbeat_at=_utcnow())
+                    )
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Cycle {cycle_id} heartbeat failed: {str(e)}")
+
+    async def run_once(self) -> bool:
+        """Run or resume at most one cycle; returns whether one ran"""
+        cycle = await self.claim_cycle()
+        if cycle is None:
+            return False
+        await self.run_cycle(cycle)
+        return True
+
+    async def run_forever(
+            self,
+            poll_interval: float = 60,
+            after_run: Optional[Callable[[], Awaitable]] = None
+    ) -> None:
+        """Run cycles as they come due; `after_run` (e.g. mention extraction) runs after every poll"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Prompt run cycle failed: {str(e)}")
+            if after_run is not None:
+                try:
+                    await after_run()
+                except Exception as e:
+                    logger.error(f"Post-run processing failed: {str(e)}")
+            await asyncio.sleep(poll_interval)
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            await backend.aclose()
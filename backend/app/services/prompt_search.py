@@ -0,0 +1,57 @@
+"""
+Keyword search over brand prompts.
+
+On MySQL, searches use the FULLTEXT index on brand_prompts.prompt
+(ft_brand_prompts_prompt) in natural language mode, ranked by InnoDB's
+relevance score, so only prompts containing the words are read instead of the
+full table scan a LIKE '%term%' would need. SQLite has no FULLTEXT indexes;
+there, for development and tests, prompts containing any of the words are
+found with LIKE and ranked by how many of the words they contain.
+
+Results are scoped to one company's active prompts and paged with
+limit/offset; one extra row is read to tell whether another page follows.
+InnoDB resolves MATCH through the FULLTEXT index before the company filter,
+so a term common across all companies costs its matches in every company;
+scripts/bench_prompt_search.py measures this (rows read per common-word
+query) next to the LIKE scan.
+"""
+import re
+
+from sqlalchemy import case, literal, or_, select
+from sqlalchemy.dialects.mysql import match
+
+from app.core.db import BrandPromptRecord
+
+_WORD = re.compile(r"\w+")
+
+
+async def search_prompts(session, company_id: str, query: str, limit: int, offset: int = 0) -> tuple[list, bool]:
+    """Return ((record, relevance) pairs for one page, whether more results follow)"""
+    terms = _WORD.findall(query)
+    if not terms:
+        return [], False
+
+    if session.bind.dialect.name == "mysql":
+        relevance = match(BrandPromptRecord.prompt, against=" ".join(terms)).in_natural_language_mode()
+        condition = relevance > 0
+    else:
+        hits = [BrandPromptRecord.prompt.ilike(f"%{_escape(term)}%", escape="\\") for term in terms]
+        relevance = sum((case((hit, 1.0), else_=0.0) for hit in hits), literal(0.0))
+        condition = or_(*hits)
+
+    rows = (await session.execute(
+        select(BrandPromptRecord, relevance.label("relevance"))
+        .where(
+            BrandPromptRecord.company_id == company_id,
+            BrandPromptRecord.is_active.is_(True),
+            condition
+        )
+        .order_by(relevance.desc(), BrandPromptRecord.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+    )).all()
+    return [(record, float(score)) for record, score in rows[:limit]], len(rows) > limit
+
+
+def _escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,122 @@
+"""
+Prompt counts per company, user, brand and day.
+
+prompt_daily holds one counter per (company, day, user, brand). record_prompts
+adds newly inserted prompts to it with a single upsert in the caller's
+transaction, so create_prompt and any bulk insert keep it exact without a
+background job, and dashboards read these few rows instead of grouping
+brand_prompts on every page load. rebuild_prompt_stats recomputes it from
+brand_prompts, for repairs after prompts are inserted or deleted by other
+means.
+"""
+import logging
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from app.core.db import BrandPromptRecord, PromptDailyRecord, upsert_counters
+
+logger = logging.getLogger(__name__)
+
+
+def _day(created_at: Optional[datetime]) -> date:
+    if created_at is None:
+        return datetime.now(timezone.utc).date()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+async def record_prompts(session, prompts: list[BrandPromptRecord]) -> None:
+    """Count flushed, not yet committed prompts in the caller's transaction"""
+    counts = Counter(
+        (prompt.company_id, _day(prompt.created_at), prompt.user_id, prompt.brand_id, prompt.brand_name)
+        for prompt in prompts
+    )
+    if not counts:
+        return
+    rows = [
+        {"company_id": company_id, "day": day, "user_id": user_id, "brand_id": brand_id, "brand_name": brand_name,
+         "prompts": count}
+        for (company_id, day, user_id, brand_id, brand_name), count in sorted(counts.items())
+    ]
+    # Sorted, so concurrent batches lock the rows they share in the same order
+    await session.execute(upsert_counters(
+        session.bind.dialect.name,
+        PromptDailyRecord.__table__,
+        rows,
+        ["company_id", "day", "user_id", "brand_id"],
+        ["prompts"]
+    ))
+
+
+async def rebuild_prompt_stats(session, company_id: Optional[str] = None) -> int:
+    """Recompute the rollup of one company, or of all, from brand_prompts; returns the rows written"""
+    day = func.date(BrandPromptRecord.created_at)
+    source = select(
+        BrandPromptRecord.company_id,
+        day,
+        BrandPromptRecord.user_id,
+        BrandPromptRecord.brand_id,
+        func.min(BrandPromptRecord.brand_name),
+        func.count()
+    ).group_by(BrandPromptRecord.company_id, day, BrandPromptRecord.user_id, BrandPromptRecord.brand_id)
+    clear = delete(PromptDailyRecord)
+    if company_id is not None:
+        source = source.where(BrandPromptRecord.company_id == company_id)
+        clear = clear.where(PromptDailyRecord.company_id == company_id)
+
+    await session.execute(clear)
+    result = await session.execute(
+        insert(PromptDailyRecord).from_select(
+            ["company_id", "day", "user_id", "brand_id", "brand_name", "prompts"], source
+        )
+    )
+    return result.rowcount
+
+
+async def get_prompt_stats(session, company_id: str, start: date, end: date) -> dict:
+    """Prompt counts over all time and per day, user and brand in [start, end], read from the rollup only"""
+    in_range = [
+        PromptDailyRecord.company_id == company_id, PromptDailyRecord.day >= start, PromptDailyRecord.day <= end
+    ]
+    all_time = (await session.execute(
+        select(func.sum(PromptDailyRecord.prompts)).where(PromptDailyRecord.company_id == company_id)
+    )).scalar() or 0
+    by_day = (await session.execute(
+        select(PromptDailyRecord.day, func.sum(PromptDailyRecord.prompts))
+        .where(*in_range)
+        .group_by(PromptDailyRecord.day)
+        .order_by(PromptDailyRecord.day)
+    )).all()
+    by_user = (await session.execute(
+        select(PromptDailyRecord.user_id, func.sum(PromptDailyRecord.prompts))
+        .where(*in_range)
+        .group_by(PromptDailyRecord.user_id)
+        .order_by(func.sum(PromptDailyRecord.prompts).desc(), PromptDailyRecord.user_id)
+    )).all()
+    by_brand = (await session.execute(
+        select(
+            PromptDailyRecord.brand_id,
+            func.min(PromptDailyRecord.brand_name),
+            func.sum(PromptDailyRecord.prompts)
+        )
+        .where(*in_range)
+        .group_by(PromptDailyRecord.brand_id)
+        .order_by(func.sum(PromptDailyRecord.prompts).desc(), PromptDailyRecord.brand_id)
+    )).all()
+    return {
+        "company_id": company_id,
+        "start": start,
+        "end": end,
+        "all_time": int(all_time),
+        "total": sum(int(prompts) for _, prompts in by_day),
+        "by_day": [{"day": day, "prompts": int(prompts)} for day, prompts in by_day],
+        "by_user": [{"user_id": user_id, "prompts": int(prompts)} for user_id, prompts in by_user],
+        "by_brand": [
+            {"brand_id": brand_id, "brand_name": brand_name, "prompts": int(prompts)}
+            for brand_id, brand_name, prompts in by_brand
+        ],
+    }
@@ -0,0 +1,277 @@
+"""
+Model providers and overflow routing.
+
+Generation goes through a ModelProvider: OllamaProvider runs on the local
+backend via LocalModelService, AnthropicProvider calls the hosted Anthropic
+API. Each keeps one pooled async client for the life of the worker.
+
+ModelRouter sends calls to the local provider and overflows to the hosted one
+while the local backend is saturated, i.e. while at least
+overflow_queue_depth calls are waiting for a scheduler slot or the recent
+local latency (queueing included) is above overflow_latency. The static system
+prompt is sent as a cached prompt prefix to Anthropic, so overflow calls are
+billed and processed mostly as cache reads.
+
+Locally, OllamaProvider picks a model tier per request (see model_tiers).
+"""
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+
+import anthropic
+from anthropic import DefaultAioHttpClient
+
+from app.config import settings
+from app.core.deadline import DeadlineExceeded, bounded, check_deadline, timeout_for
+from app.services.local_ai_services import LocalModelService, local_model_service
+from app.services.model_tiers import ModelTierSelector
+from app.services.scheduling import FairScheduler, Priority, model_scheduler
+from app.services.usage import usage_meter
+
+logger = logging.getLogger(__name__)
+
+
+class ModelProvider(ABC):
+    """A backend that turns a system prompt and a user prompt into a completion"""
+
+    name: str = "provider"
+
+    def __init__(self, latency_alpha: float = 0.2):
+        self.latency_alpha = latency_alpha
+        self.latency: Optional[float] = None  # moving average of call latency, seconds
+        self.latency_at = 0.0  # monotonic time of the last latency sample
+        self.counters = {"completed": 0, "failed": 0}
+
+    @abstractmethod
+    async def _complete(
+            self,
+            system: str,
+            prompt: str,
+            company_id: Optional[str],
+            user_id: Optional[str],
+            priority: Priority,
+            validate: Optional[Callable[[str], Any]],
+            subject: str
+    ) -> str:
+        """Generate the completion; timing and counters are handled by complete"""
+
+    async def complete(
+            self,
+            system: str,
+            prompt: str,
+            company_id: Optional[str] = None,
+            user_id: Optional[str] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            validate: Optional[Callable[[str], Any]] = None,
+            subject: Optional[str] = None
+    ) -> str:
+        """
+        Args:
+            validate: Raises if the output does not match the expected schema;
+                      providers with several models may retry on a larger one
+            subject: The request-specific part of the prompt, used to judge its complexity
+        """
+        started = time.monotonic()
+        try:
+            result = await self._complete(
+                system, prompt, company_id, user_id, priority, validate, subject or prompt
+            )
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        self.counters["completed"] += 1
+        self._observe(time.monotonic() - started)
+        return result
+
+    def _observe(self, elapsed: float) -> None:
+        self.latency_at = time.monotonic()
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += self.latency_alpha * (elapsed - self.latency)
+
+    async def aclose(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "latency": self.latency}
+
+
+class OllamaProvider(ModelProvider):
+    """Local models served by Ollama"""
+
+    name = "ollama"
+
+    def __init__(self, service: LocalModelService = local_model_service, tiers: Optional[ModelTierSelector] = None):
+        super().__init__()
+        self.service = service
+        self.tiers = tiers or ModelTierSelector()
+
+    async def _generate(self, model, system, prompt, company_id, user_id, priority) -> str:
+        started = time.monotonic()
+        # The system prompt goes in its own message so every call shares the same
+        # leading tokens and Ollama can reuse their KV cache instead of re-evaluating them
+        result = await self.service.chat(
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+            company_id=company_id,
+            user_id=user_id,
+            priority=priority,
+            model=model
+        )
+        self.tiers.observe(model, time.monotonic() - started)
+        return result
+
+    async def _complete(self, system, prompt, company_id, user_id, priority, validate, subject) -> str:
+        model = self.tiers.select(subject)
+        result = await self._generate(model, system, prompt, company_id, user_id, priority)
+        if validate is None or model == self.tiers.largest:
+            return result
+        try:
+            validate(result)
+        except Exception as e:
+            logger.info(f"Output of {model} failed validation, falling back to {self.tiers.largest}: {str(e)}")
+            self.tiers.observe_fallback(model)
+            result = await self._generate(self.tiers.largest, system, prompt, company_id, user_id, priority)
+        return result
+
+    async def aclose(self) -> None:
+        await self.service.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "tiers": self.tiers.stats()}
+
+
+class AnthropicProvider(ModelProvider):
+    """Hosted models through the Anthropic Messages API"""
+
+    name = "anthropic"
+
+    def __init__(
+            self,
+            api_key: str = settings.anthropic_api_key,
+            base_url: Optional[str] = settings.anthropic_base_url,
+            model: str = settings.anthropic_model
+    ):
+        super().__init__()
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.counters.update({"cache_read_tokens": 0, "cache_write_tokens": 0})
+        self._client: Optional[anthropic.AsyncAnthropic] = None
+
+    def _anthropic(self) -> anthropic.AsyncAnthropic:
+        # Created on first use, inside the running event loop the aiohttp pool is bound to
+        if self._client is None:
+            self._client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=settings.anthropic_timeout,
+                http_client=DefaultAioHttpClient()
+            )
+        return self._client
+
+    async def _complete(self, system, prompt, company_id, user_id, priority, validate, subject) -> str:
+        usage_meter.check_quota(company_id)
+        check_deadline(settings.ai_min_budget)
+
+        try:
+            message = await bounded(self._anthropic().messages.create(
+                model=self.model,
+                max_tokens=settings.anthropic_max_tokens,
+                # The system prompt is identical across calls: cache it as the prompt prefix
+                system=[{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
+                messages=[{"role": "user", "content": prompt}],
+                timeout=timeout_for(settings.anthropic_timeout)
+            ))
+        except DeadlineExceeded:
+            raise
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API error: {str(e)}")
+            raise Exception(f"Failed to call Anthropic: {str(e)}")
+
+        usage = message.usage
+        cache_read = usage.cache_read_input_tokens or 0
+        cache_write = usage.cache_creation_input_tokens or 0
+        self.counters["cache_read_tokens"] += cache_read
+        self.counters["cache_write_tokens"] += cache_write
+        usage_meter.record(
+            company_id=company_id,
+            user_id=user_id,
+            model=self.model,
+            prompt_tokens=usage.input_tokens + cache_read + cache_write,
+            completion_tokens=usage.output_tokens
+        )
+        return "".join(block.text for block in message.content if block.type == "text")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class ModelRouter:
+    """Route completions to the local provider, overflowing to a hosted one under load"""
+
+    def __init__(
+            self,
+            local: ModelProvider,
+            overflow: Optional[ModelProvider] = None,
+            scheduler: FairScheduler = model_scheduler,
+            queue_depth_threshold: int = settings.overflow_queue_depth,
+            latency_threshold: float = settings.overflow_latency,
+            latency_ttl: float = 60.0
+    ):
+        self.local = local
+        self.overflow = overflow
+        self.scheduler = scheduler
+        self.queue_depth_threshold = queue_depth_threshold
+        self.latency_threshold = latency_threshold
+        # While overflowing on latency the local average gets no new samples, so it expires
+        self.latency_ttl = latency_ttl
+        self.routed = {"local": 0, "overflow": 0}
+
+    def should_overflow(self) -> bool:
+        if self.overflow is None:
+            return False
+        if self.scheduler.queue_depth >= self.queue_depth_threshold:
+            return True
+        if self.local.latency is None or time.monotonic() - self.local.latency_at > self.latency_ttl:
+            return False
+        return self.local.latency >= self.latency_threshold
+
+    async def complete(
+            self,
+            system: str,
+            prompt: str,
+            company_id: Optional[str] = None,
+            user_id: Optional[str] = None,
+            priority: Priority = Priority.INTERACTIVE,
+            validate: Optional[Callable[[str], Any]] = None,
+            subject: Optional[str] = None
+    ) -> str:
+        provider = self.local
+        if self.should_overflow():
+            self.routed["overflow"] += 1
+            provider = self.overflow
+        else:
+            self.routed["local"] += 1
+        return await provider.complete(system, prompt, company_id, user_id, priority, validate, subject)
+
+    async def aclose(self) -> None:
+        await self.local.aclose()
+        if self.overflow is not None:
+            await self.overflow.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        providers = {self.local.name: self.local.stats()}
+        if self.overflow is not None:
+            providers[self.overflow.name] = self.overflow.stats()
+        return {"routed": dict(self.routed), "providers": providers}
+
+
+# Create global instance
+model_router = ModelRouter(
+    OllamaProvider(),
+    AnthropicProvider() if settings.overflow_enabled and settings.anthropic_api_key else None
+)
@@ -0,0 +1,258 @@
+"""
+Content-addressed, compressed storage for model answers.
+
+prompt_runs rows keep only the SHA-256 of their answer (response_hash); the
+answer itself lives once in response_blobs, however many runs produced it.
+Blobs are compressed with zstd using a dictionary trained on recent answers of
+the same model, which is what makes short, similar answers compress well.
+Until a model has response_store_dict_min_samples answers, its blobs are
+compressed without one.
+
+Dictionaries are immutable and every blob records the one it was written
+with, so training a new dictionary (after response_store_retrain_after answers
+on the current one) only affects new writes. Compressors and decompressors are
+cached per dictionary id.
+
+train_pending runs after every runner cycle, so it never counts more than a
+threshold's worth of a model's blobs on its current dictionary (an index range
+scan on (model, dictionary_id)), and a model whose training failed is not
+retried for response_store_train_backoff seconds.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import zstandard
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, CompressionDictionaryRecord, ResponseBlobRecord, insert_ignore
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    """Deduplicate, compress and read model answers"""
+
+    def __init__(
+            self,
+            session_factory=AsyncSessionLocal,
+            level: int = settings.response_store_level,
+            dict_size: int = settings.response_store_dict_size,
+            dict_min_samples: int = settings.response_store_dict_min_samples,
+            dict_samples: int = settings.response_store_dict_samples,
+            retrain_after: int = settings.response_store_retrain_after,
+            train_backoff: float = settings.response_store_train_backoff
+    ):
+        self.session_factory = session_factory
+        self.level = level
+        self.dict_size = dict_size
+        self.dict_min_samples = dict_min_samples
+        self.dict_samples = dict_samples
+        self.retrain_after = retrain_after
+        self.train_backoff = train_backoff
+        self._retry_at: dict[str, float] = {}  # model -> time.monotonic() before which training is not retried
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._compressors: dict[Optional[int], zstandard.ZstdCompressor] = {}
+        self._decompressors: dict[Optional[int], zstandard.ZstdDecompressor] = {}
+        self._counters = {
+            "writes": 0, "deduplicated": 0, "bytes_in": 0, "bytes_stored": 0, "write_seconds": 0.0,
+            "reads": 0, "bytes_out": 0, "read_seconds": 0.0,
+        }
+
+    async def _dictionary(self, session, dictionary_id: int) -> zstandard.ZstdCompressionDict:
+        if dictionary_id not in self._dictionaries:
+            data = await session.scalar(
+                select(CompressionDictionaryRecord.data).where(CompressionDictionaryRecord.id == dictionary_id)
+            )
+            if data is None:
+                raise LookupError(f"Compression dictionary {dictionary_id} does not exist")
+            self._dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(data)
+        return self._dictionaries[dictionary_id]
+
+    async def _compressor(self, session, dictionary_id: Optional[int]) -> zstandard.ZstdCompressor:
+        if dictionary_id not in self._compressors:
+            dict_data = await self._dictionary(session, dictionary_id) if dictionary_id else None
+            self._compressors[dictionary_id] = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+        return self._compressors[dictionary_id]
+
+    async def _decompressor(self, session, dictionary_id: Optional[int]) -> zstandard.ZstdDecompressor:
+        if dictionary_id not in self._decompressors:
+            dict_data = await self._dictionary(session, dictionary_id) if dictionary_id else None
+            self._decompressors[dictionary_id] = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return self._decompressors[dictionary_id]
+
+    async def _current_dictionaries(self, session, models: Iterable[str]) -> dict[str, int]:
+        rows = await session.execute(
+            select(CompressionDictionaryRecord.model, func.max(CompressionDictionaryRecord.id))
+            .where(CompressionDictionaryRecord.model.in_(set(models)))
+            .group_by(CompressionDictionaryRecord.model)
+        )
+        return dict(rows.all())
+
+    async def put_many(self, session, items: list[tuple[str, Optional[str]]]) -> list[Optional[str]]:
+        """
+        Store (model, text) answers in the caller's transaction and return their hashes,
+        None for a missing answer. Answers already stored are not written again.
+        """
+        started = time.perf_counter()
+        hashes = [content_hash(text) if text is not None else None for _, text in items]
+        pending = {h: item for h, item in zip(hashes, items) if h is not None}
+        if not pending:
+            return hashes
+
+        existing = set((await session.execute(
+            select(ResponseBlobRecord.hash).where(ResponseBlobRecord.hash.in_(list(pending)))
+        )).scalars())
+        new = {h: item for h, item in pending.items() if h not in existing}
+
+        rows = []
+        if new:
+            current = await self._current_dictionaries(session, (model for model, _ in new.values()))
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            for h, (model, text) in new.items():
+                raw = text.encode("utf-8")
+                dictionary_id = current.get(model)
+                data = (await self._compressor(session, dictionary_id)).compress(raw)
+                rows.append({
+                    "hash": h,
+                    "model": model,
+                    "dictionary_id": dictionary_id,
+                    "size": len(raw),
+                    "stored_size": len(data),
+                    "data": data,
+                    "created_at": now,
+                })
+            # A concurrent writer may store the same answer first, which is just as good
+            await session.execute(insert_ignore(session.bind.dialect.name, ResponseBlobRecord.__table__, rows))
+
+        # bytes_in counts every answer written, so the ratio includes what deduplication saved
+        counters = self._counters
+        written = [text for _, text in items if text is not None]
+        counters["writes"] += len(written)
+        counters["deduplicated"] += len(written) - len(rows)
+        counters["bytes_in"] += sum(len(text.encode("utf-8")) for text in written)
+        counters["bytes_stored"] += sum(row["stored_size"] for row in rows)
+        counters["write_seconds"] += time.perf_counter() - started
+        return hashes
+
+    async def get_many(self, session, hashes: Iterable[Optional[str]]) -> dict[str, str]:
+        """Read answers by hash; hashes that are not stored are left out"""
+        started = time.perf_counter()
+        wanted = {h for h in hashes if h}
+        if not wanted:
+            return {}
+        blobs = (await session.execute(
+            select(ResponseBlobRecord.hash, ResponseBlobRecord.dictionary_id, ResponseBlobRecord.data)
+            .where(ResponseBlobRecord.hash.in_(list(wanted)))
+        )).all()
+
+        texts = {}
+        for blob in blobs:
+            decompressor = await self._decompressor(session, blob.dictionary_id)
+            texts[blob.hash] = decompressor.decompress(blob.data).decode("utf-8")
+
+        self._counters["reads"] += len(texts)
+        self._counters["bytes_out"] += sum(len(text.encode("utf-8")) for text in texts.values())
+        self._counters["read_seconds"] += time.perf_counter() - started
+        return texts
+
+    async def get(self, session, response_hash: Optional[str]) -> Optional[str]:
+        return (await self.get_many(session, [response_hash])).get(response_hash)
+
+    async def train_dictionary(self, model: str) -> Optional[int]:
+        """Train a dictionary on the model's most recent answers; returns its id, or None without enough samples"""
+        async with self.session_factory() as session:
+            blobs = (await session.execute(
+                select(ResponseBlobRecord.hash)
+                .where(ResponseBlobRecord.model == model)
+                .order_by(ResponseBlobRecord.created_at.desc())
+                .limit(self.dict_samples)
+            )).scalars().all()
+            if len(blobs) < self.dict_min_samples:
+                return None
+            samples = [text.encode("utf-8") for text in (await self.get_many(session, blobs)).values()]
+            try:
+                trained = zstandard.train_dictionary(self.dict_size, samples, level=self.level)
+            except zstandard.ZstdError as e:
+                self._retry_at[model] = time.monotonic() + self.train_backoff
+                logger.error(f"Training a compression dictionary for {model} failed, retrying in "
+                             f"{self.train_backoff}s: {str(e)}")
+                return None
+            self._retry_at.pop(model, None)
+
+            dictionary = CompressionDictionaryRecord(model=model, data=trained.as_bytes(), samples=len(samples))
+            session.add(dictionary)
+            await session.commit()
+        logger.info(f"Trained a {len(dictionary.data)}-byte compression dictionary for {model} "
+                    f"on {len(samples)} answers")
+        return dictionary.id
+
+    async def _due(self, session, model: str, dictionary_id: Optional[int]) -> bool:
+        threshold = self.retrain_after if dictionary_id else self.dict_min_samples
+        on_current = ResponseBlobRecord.dictionary_id == dictionary_id if dictionary_id \
+            else ResponseBlobRecord.dictionary_id.is_(None)
+        # Counting stops at the threshold, so a model with millions of blobs costs no more than a new one
+        capped = select(ResponseBlobRecord.hash).where(ResponseBlobRecord.model == model, on_current) \
+            .limit(threshold).subquery()
+        return await session.scalar(select(func.count()).select_from(capped)) >= threshold
+
+    async def train_pending(self) -> list[int]:
+        """Train dictionaries for models without one, or whose dictionary has compressed retrain_after answers"""
+        now = time.monotonic()
+        async with self.session_factory() as session:
+            models = (await session.execute(select(ResponseBlobRecord.model).distinct())).scalars().all()
+            models = [model for model in models if self._retry_at.get(model, 0) <= now]
+            current = await self._current_dictionaries(session, models)
+            due = [model for model in sorted(models) if await self._due(session, model, current.get(model))]
+
+        trained = []
+        for model in due:
+            dictionary_id = await self.train_dictionary(model)
+            if dictionary_id is not None:
+                trained.append(dictionary_id)
+        return trained
+
+    def stats(self) -> dict:
+        """Write/read volumes, compression ratio and throughput since the process started"""
+        c = self._counters
+        return {
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in c.items()},
+            "compression_ratio": round(c["bytes_in"] / c["bytes_stored"], 2) if c["bytes_stored"] else None,
+            "write_mb_per_s": round(c["bytes_in"] / c["write_seconds"] / 1e6, 2) if c["write_seconds"] else None,
+            "read_mb_per_s": round(c["bytes_out"] / c["read_seconds"] / 1e6, 2) if c["read_seconds"] else None,
+        }
+
+
+async def storage_stats(session) -> list[dict]:
+    """Stored answers, their raw and compressed size and the compression ratio per model"""
+    rows = (await session.execute(
+        select(
+            ResponseBlobRecord.model,
+            func.count(),
+            func.sum(ResponseBlobRecord.size),
+            func.sum(ResponseBlobRecord.stored_size)
+        )
+        .group_by(ResponseBlobRecord.model)
+        .order_by(ResponseBlobRecord.model)
+    )).all()
+    return [
+        {
+            "model": model,
+            "blobs": count,
+            "size": int(size or 0),
+            "stored_size": int(stored or 0),
+            "compression_ratio": round(size / stored, 2) if stored else None,
+        }
+        for model, count, size, stored in rows
+    ]
+
+
+# Create global instance
+response_store = ResponseStore()
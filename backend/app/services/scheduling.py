@@ -0,0 +1,148 @@
+"""
+Weighted fair scheduling of model calls across tenants.
+
+All tenants share a fixed number of model slots (ai_max_concurrency). When
+every slot is busy, callers queue per tenant and per priority class, and slots
+are handed out with start-time fair queuing: each request gets a virtual start
+tag max(virtual_time, tenant's previous finish tag), and the lowest tag runs
+next. A tenant with weight w advances its tags 1/w per request, so a burst of
+a thousand batch jobs from one company only delays another company's next call
+by about one job, not a thousand.
+
+Interactive requests always go before batch requests, and batch work may not
+occupy the last ai_interactive_reserved_slots slots, so an interactive call
+never waits behind a full set of long batch generations.
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+@dataclass
+class _Waiter:
+    tenant: str
+    start_tag: float
+    future: asyncio.Future = field(repr=False)
+
+
+class FairScheduler:
+    """Hand out a bounded number of slots fairly across tenants"""
+
+    def __init__(
+            self,
+            max_concurrency: int = settings.ai_max_concurrency,
+            weights: Optional[dict[str, float]] = None,
+            interactive_reserved: int = settings.ai_interactive_reserved_slots
+    ):
+        self.max_concurrency = max_concurrency
+        self.weights = weights if weights is not None else dict(settings.ai_tenant_weights)
+        self.interactive_reserved = min(interactive_reserved, max_concurrency - 1)
+        self._active = {Priority.INTERACTIVE: 0, Priority.BATCH: 0}
+        self._queues: dict[Priority, dict[str, deque[_Waiter]]] = {p: {} for p in Priority}
+        self._virtual_time = {p: 0.0 for p in Priority}
+        self._finish_tags: dict[Priority, dict[str, float]] = {p: {} for p in Priority}
+
+    @property
+    def active(self) -> int:
+        return sum(self._active.values())
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for queues in self._queues.values() for q in queues.values())
+
+    def _weight(self, tenant: str) -> float:
+        return max(self.weights.get(tenant, 1.0), 1e-6)
+
+    def _can_start(self, priority: Priority) -> bool:
+        if priority == Priority.INTERACTIVE:
+            return self.active < self.max_concurrency
+        return self.active < self.max_concurrency - self.interactive_reserved
+
+    def _tag(self, tenant: str, priority: Priority, cost: float) -> float:
+        start = max(self._virtual_time[priority], self._finish_tags[priority].get(tenant, 0.0))
+        self._finish_tags[priority][tenant] = start + cost / self._weight(tenant)
+        return start
+
+    @asynccontextmanager
+    async def slot(
+            self,
+            tenant: str,
+            priority: Priority = Priority.INTERACTIVE,
+            cost: float = 1.0
+    ) -> AsyncIterator[None]:
+        """Hold one model slot for the duration of the block"""
+        start_tag = self._tag(tenant, priority, cost)
+
+        if self._can_start(priority) and not self._has_waiters(priority):
+            self._active[priority] += 1
+            self._virtual_time[priority] = start_tag
+        else:
+            waiter = _Waiter(tenant, start_tag, asyncio.get_running_loop().create_future())
+            self._queues[priority].setdefault(tenant, deque()).append(waiter)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # The slot was granted just as the caller went away
+                    self._release(priority)
+                else:
+                    self._remove(priority, waiter)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def _has_waiters(self, priority: Priority) -> bool:
+        if any(self._queues[Priority.INTERACTIVE].values()):
+            return True
+        return priority == Priority.BATCH and any(self._queues[Priority.BATCH].values())
+
+    def _remove(self, priority: Priority, waiter: _Waiter) -> None:
+        queue = self._queues[priority].get(waiter.tenant)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[priority][waiter.tenant]
+
+    def _release(self, priority: Priority) -> None:
+        self._active[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for priority in Priority:
+            queues = self._queues[priority]
+            while queues and self._can_start(priority):
+                tenant = min(queues, key=lambda t: queues[t][0].start_tag)
+                waiter = queues[tenant].popleft()
+                if not queues[tenant]:
+                    del queues[tenant]
+                if waiter.future.done():
+                    continue
+                self._virtual_time[priority] = waiter.start_tag
+                self._active[priority] += 1
+                waiter.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "active": {p.value: n for p, n in self._active.items()},
+            "queued": {
+                p.value: {tenant: len(q) for tenant, q in self._queues[p].items()}
+                for p in Priority
+            },
+        }
+
+
+# Create global instance
+model_scheduler = FairScheduler()
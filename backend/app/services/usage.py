@@ -0,0 +1,172 @@
+"""
+Token-usage accounting and per-company quotas.
+
+Every generation's prompt/completion token counts are added to in-memory
+counters keyed by (company, user, model, hour). A background flusher writes the
+pending counters to the token_usage table in one upsert per batch and then
+re-reads each active company's total for the current quota window, which folds
+in usage recorded by the other workers. Quota checks are therefore a dict
+lookup, accurate to within one flush interval across workers.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, TokenUsageRecord, upsert_counters
+
+logger = logging.getLogger(__name__)
+
+USAGE_BUCKET_SECONDS = 3600
+
+
+class QuotaExceededError(Exception):
+    """Raised when a company has used up its token quota for the current window"""
+
+    def __init__(self, company_id: str, retry_after: float):
+        super().__init__(f"Token quota exhausted for company {company_id}")
+        self.company_id = company_id
+        self.retry_after = retry_after
+
+
+def _window_start(now: float, window: int) -> float:
+    return now - (now % window)
+
+
+class UsageMeter:
+    """Aggregate token usage in memory and flush it to the database in batches"""
+
+    def __init__(self, quota_window: int = settings.usage_quota_window):
+        self.quota_window = quota_window
+        # (company_id, user_id, model, bucket_start) -> [requests, prompt_tokens, completion_tokens]
+        self._pending: dict[tuple[str, str, str, float], list[int]] = defaultdict(lambda: [0, 0, 0])
+        # company_id -> (quota window start, tokens already flushed by all workers, tokens recorded locally since)
+        self._window_totals: dict[str, tuple[float, int, int]] = {}
+
+    def quota_for(self, company_id: str) -> int:
+        return settings.usage_quota_overrides.get(company_id, settings.usage_quota_tokens)
+
+    def used_in_window(self, company_id: str, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        window_start, flushed, local = self._window_totals.get(company_id, (0.0, 0, 0))
+        if window_start != _window_start(now, self.quota_window):
+            return 0
+        return flushed + local
+
+    def check_quota(self, company_id: Optional[str]) -> None:
+        """Raise QuotaExceededError before any model work is done for an exhausted company"""
+        if not company_id:
+            return
+        quota = self.quota_for(company_id)
+        if quota <= 0:
+            return
+        now = time.time()
+        if self.used_in_window(company_id, now) >= quota:
+            retry_after = _window_start(now, self.quota_window) + self.quota_window - now
+            raise QuotaExceededError(company_id, retry_after)
+
+    def record(
+            self,
+            company_id: Optional[str],
+            user_id: Optional[str],
+            model: str,
+            prompt_tokens: int,
+            completion_tokens: int
+    ) -> None:
+        company_id = company_id or "unknown"
+        now = time.time()
+        counters = self._pending[(company_id, user_id or "unknown", model, _window_start(now, USAGE_BUCKET_SECONDS))]
+        counters[0] += 1
+        counters[1] += prompt_tokens
+        counters[2] += completion_tokens
+
+        window_start = _window_start(now, self.quota_window)
+        current_start, flushed, local = self._window_totals.get(company_id, (window_start, 0, 0))
+        if current_start != window_start:
+            flushed, local = 0, 0
+        self._window_totals[company_id] = (window_start, flushed, local + prompt_tokens + completion_tokens)
+
+    async def flush(self, session_factory=AsyncSessionLocal) -> int:
+        """Write pending counters in one batch and resync quota windows; returns rows written"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, defaultdict(lambda: [0, 0, 0])
+        rows = [
+            {
+                "company_id": company_id,
+                "user_id": user_id,
+                "model": model,
+                "window_start": datetime.fromtimestamp(bucket, timezone.utc).replace(tzinfo=None),
+                "requests": requests,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            }
+            for (company_id, user_id, model, bucket), (requests, prompt_tokens, completion_tokens) in pending.items()
+        ]
+        companies = {row["company_id"] for row in rows}
+        now = time.time()
+        window_start = _window_start(now, self.quota_window)
+
+        try:
+            async with session_factory() as session:
+                table = TokenUsageRecord.__table__
+                await session.execute(upsert_counters(
+                    session.bind.dialect.name, table, rows,
+                    key_columns=["company_id", "user_id", "model", "window_start"],
+                    counter_columns=["requests", "prompt_tokens", "completion_tokens"]
+                ))
+                await session.commit()
+        except Exception:
+            # Nothing was committed: put the counters back so the next flush retries them
+            for key, (requests, prompt_tokens, completion_tokens) in pending.items():
+                counters = self._pending[key]
+                counters[0] += requests
+                counters[1] += prompt_tokens
+                counters[2] += completion_tokens
+            raise
+
+        try:
+            async with session_factory() as session:
+                result = await session.execute(
+                    select(
+                        TokenUsageRecord.company_id,
+                        func.sum(TokenUsageRecord.prompt_tokens + TokenUsageRecord.completion_tokens)
+                    )
+                    .where(
+                        TokenUsageRecord.company_id.in_(companies),
+                        TokenUsageRecord.window_start >= datetime.fromtimestamp(window_start, timezone.utc).replace(tzinfo=None)
+                    )
+                    .group_by(TokenUsageRecord.company_id)
+                )
+                totals = dict(result.all())
+        except Exception as e:
+            # The counters are committed, so they must not be retried; the quota windows keep counting
+            # them as local usage until a later flush resyncs
+            logger.error(f"Token usage quota resync failed: {str(e)}")
+            return len(rows)
+
+        for company_id in companies:
+            # Local usage recorded while the flush was in flight is still pending
+            in_flight = sum(
+                c[1] + c[2] for (company, _, _, bucket), c in self._pending.items()
+                if company == company_id and bucket >= window_start
+            )
+            self._window_totals[company_id] = (window_start, int(totals.get(company_id) or 0), in_flight)
+        return len(rows)
+
+    async def run_flusher(self, interval: float = settings.usage_flush_interval) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Token usage flush failed: {str(e)}")
+
+
+# Create global instance
+usage_meter = UsageMeter()
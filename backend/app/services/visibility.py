@@ -0,0 +1,276 @@
+"""
+Brand-visibility scores and their daily rollups.
+
+VisibilityRollup folds new prompt runs and their brand mentions into two
+rollup tables of additive counters, per company and day:
+
+    run_daily         runs, mentions (all brands)
+    visibility_daily  runs_mentioned, mentions, rank_sum (per brand)
+
+Runs are read in id order from a watermark, and only up to the mention
+extractor's watermark, so every run is counted after its mentions exist. Each
+batch is loaded as columns, grouped with NumPy (np.unique over an integer
+composite key, then np.bincount), and upserted in one statement per table,
+committed together with the watermark.
+
+Scores are derived from the counters when read, for a single day or any range:
+
+    mention_rate    runs_mentioned / runs
+    average_rank    rank_sum / runs_mentioned   (1 = named first)
+    share_of_voice  mentions / all brand mentions
+"""
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.core.db import (
+    AsyncSessionLocal, BrandMentionRecord, PromptRunRecord, RunDailyRecord, VisibilityDailyRecord,
+    WatermarkRecord, upsert_counters
+)
+from app.models.prompts_schemas import ExecutionStatus
+from app.services.mentions import WATERMARK_NAME as MENTIONS_WATERMARK
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "visibility_daily"
+
+
+def _group(*codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Group rows by several integer code columns; returns (first row of each group, group of each row)"""
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    for column in codes:
+        key = key * (int(column.max()) + 1 if len(column) else 1) + column
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def rollup_counters(runs: list, mentions: list) -> tuple[list[dict], list[dict]]:
+    """
+    Aggregate one batch into (run_daily rows, visibility_daily rows).
+    `runs` are (id, company_id, created_at) and `mentions` are
+    (run_id, brand_name, is_competitor, mention_count, rank) tuples.
+    """
+    if not runs:
+        return [], []
+    run_ids = np.fromiter((r[0] for r in runs), dtype=np.int64, count=len(runs))
+    run_companies = np.array([r[1] for r in runs], dtype=object)
+    run_days = np.array([r[2] for r in runs], dtype="datetime64[D]")
+
+    _, company_codes = np.unique(run_companies, return_inverse=True)
+    day_codes = (run_days - run_days.min()).astype(np.int64)
+
+    # Mentions inherit company and day from their run
+    order = np.argsort(run_ids)
+    if mentions:
+        mention_runs = np.fromiter((m[0] for m in mentions), dtype=np.int64, count=len(mentions))
+        run_index = order[np.searchsorted(run_ids, mention_runs, sorter=order)]
+        counts = np.fromiter((m[3] for m in mentions), dtype=np.int64, count=len(mentions))
+        ranks = np.fromiter((m[4] for m in mentions), dtype=np.int64, count=len(mentions))
+        competitor = np.fromiter((bool(m[2]) for m in mentions), dtype=bool, count=len(mentions))
+        brand_names, brand_codes = np.unique(np.array([m[1] for m in mentions], dtype=object), return_inverse=True)
+    else:
+        run_index = counts = ranks = brand_codes = np.zeros(0, dtype=np.int64)
+        competitor = np.zeros(0, dtype=bool)
+        brand_names = np.zeros(0, dtype=object)
+
+    first, group = _group(company_codes.ravel(), day_codes)
+    runs_per_group = np.bincount(group)
+    mention_group = group[run_index]
+    mentions_per_group = np.bincount(mention_group, weights=counts, minlength=len(first)).astype(np.int64)
+    run_rows = [
+        {
+            "company_id": str(run_companies[first[g]]),
+            "day": run_days[first[g]].item(),
+            "runs": int(runs_per_group[g]),
+            "mentions": int(mentions_per_group[g]),
+        }
+        for g in range(len(first))
+    ]
+
+    brand_rows = []
+    if len(run_index):
+        first, group = _group(company_codes.ravel()[run_index], day_codes[run_index], brand_codes.ravel())
+        runs_mentioned = np.bincount(group)
+        mention_sums = np.bincount(group, weights=counts).astype(np.int64)
+        rank_sums = np.bincount(group, weights=ranks).astype(np.int64)
+        is_competitor = np.zeros(len(first), dtype=bool)
+        np.logical_or.at(is_competitor, group, competitor)
+        brand_rows = [
+            {
+                "company_id": str(run_companies[run_index[first[g]]]),
+                "brand_name": str(brand_names[brand_codes.ravel()[first[g]]]),
+                "day": run_days[run_index[first[g]]].item(),
+                "is_competitor": bool(is_competitor[g]),
+                "runs_mentioned": int(runs_mentioned[g]),
+                "mentions": int(mention_sums[g]),
+                "rank_sum": int(rank_sums[g]),
+            }
+            for g in range(len(first))
+        ]
+    return run_rows, brand_rows
+
+
+class VisibilityRollup:
+    """Incrementally maintain the daily visibility rollups"""
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size: int = settings.visibility_batch_size):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    async def process_batch(self) -> int:
+        """Fold the next batch of runs into the rollups; returns the number of runs processed"""
+        async with self.session_factory() as session:
+            async with session.begin():
+                watermark = await session.get(WatermarkRecord, WATERMARK_NAME, with_for_update=True)
+                if watermark is None:
+                    watermark = WatermarkRecord(name=WATERMARK_NAME, position=0)
+                    session.add(watermark)
+                limit = await session.scalar(
+                    select(WatermarkRecord.position).where(WatermarkRecord.name == MENTIONS_WATERMARK)
+                ) or 0
+
+                runs = (await session.execute(
+                    select(PromptRunRecord.id, PromptRunRecord.company_id, PromptRunRecord.created_at)
+                    .where(PromptRunRecord.id > watermark.position, PromptRunRecord.id <= limit)
+                    .where(PromptRunRecord.status == ExecutionStatus.SUCCESS.value)
+                    .order_by(PromptRunRecord.id)
+                    .limit(self.batch_size)
+                )).all()
+                if not runs:
+                    return 0
+
+                mentions = (await session.execute(
+                    select(
+                        BrandMentionRecord.run_id,
+                        BrandMentionRecord.brand_name,
+                        BrandMentionRecord.is_competitor,
+                        BrandMentionRecord.mention_count,
+                        BrandMentionRecord.rank
+                    )
+                    .where(BrandMentionRecord.run_id > watermark.position, BrandMentionRecord.run_id <= runs[-1].id)
+                )).all()
+
+                run_rows, brand_rows = rollup_counters(runs, mentions)
+                dialect = session.bind.dialect.name
+                await session.execute(upsert_counters(
+                    dialect, RunDailyRecord.__table__, run_rows,
+                    key_columns=["company_id", "day"], counter_columns=["runs", "mentions"]
+                ))
+                if brand_rows:
+                    await session.execute(upsert_counters(
+                        dialect, VisibilityDailyRecord.__table__, brand_rows,
+                        key_columns=["company_id", "brand_name", "day"],
+                        counter_columns=["runs_mentioned", "mentions", "rank_sum"]
+                    ))
+                watermark.position = runs[-1].id
+                watermark.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        return len(runs)
+
+    async def process_pending(self) -> int:
+        total = 0
+        while True:
+            processed = await self.process_batch()
+            if not processed:
+                break
+            total += processed
+        if total:
+            logger.info(f"Rolled up visibility for {total} prompt runs")
+        return total
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+
+def visibility_scores(brand_rows: list, run_totals: dict) -> list[dict]:
+    """
+    Scores from rollup counters. `brand_rows` are (key, brand_name, is_competitor,
+    runs_mentioned, mentions, rank_sum) tuples and `run_totals` maps key -> (runs, mentions),
+    where key is a day or None for a whole range.
+    """
+    if not brand_rows:
+        return []
+    runs_mentioned = np.array([r[3] for r in brand_rows], dtype=np.float64)
+    mentions = np.array([r[4] for r in brand_rows], dtype=np.float64)
+    rank_sum = np.array([r[5] for r in brand_rows], dtype=np.float64)
+    runs = np.array([run_totals.get(r[0], (0, 0))[0] for r in brand_rows], dtype=np.float64)
+    all_mentions = np.array([run_totals.get(r[0], (0, 0))[1] for r in brand_rows], dtype=np.float64)
+
+    mention_rate = _ratio(runs_mentioned, runs)
+    average_rank = _ratio(rank_sum, runs_mentioned)
+    share_of_voice = _ratio(mentions, all_mentions)
+    return [
+        {
+            "day": row[0],
+            "brand_name": row[1],
+            "is_competitor": bool(row[2]),
+            "runs": int(runs[i]),
+            "runs_mentioned": int(row[3]),
+            "mentions": int(row[4]),
+            "mention_rate": round(float(mention_rate[i]), 4),
+            "average_rank": round(float(average_rank[i]), 2),
+            "share_of_voice": round(float(share_of_voice[i]), 4),
+        }
+        for i, row in enumerate(brand_rows)
+    ]
+
+
+async def get_visibility(
+        session,
+        company_id: str,
+        start: date,
+        end: date,
+        brand_name: Optional[str] = None
+) -> dict:
+    """Daily scores and scores over the whole range, read from the rollups only"""
+    runs_filter = [RunDailyRecord.company_id == company_id, RunDailyRecord.day >= start, RunDailyRecord.day <= end]
+    brand_filter = [
+        VisibilityDailyRecord.company_id == company_id,
+        VisibilityDailyRecord.day >= start,
+        VisibilityDailyRecord.day <= end,
+    ]
+    if brand_name:
+        brand_filter.append(VisibilityDailyRecord.brand_name == brand_name)
+
+    run_days = (await session.execute(
+        select(RunDailyRecord.day, RunDailyRecord.runs, RunDailyRecord.mentions).where(*runs_filter)
+    )).all()
+    daily_totals = {day: (runs, mentions) for day, runs, mentions in run_days}
+    range_totals = {None: (sum(r[1] for r in run_days), sum(r[2] for r in run_days))}
+
+    daily = (await session.execute(
+        select(
+            VisibilityDailyRecord.day,
+            VisibilityDailyRecord.brand_name,
+            VisibilityDailyRecord.is_competitor,
+            VisibilityDailyRecord.runs_mentioned,
+            VisibilityDailyRecord.mentions,
+            VisibilityDailyRecord.rank_sum
+        )
+        .where(*brand_filter)
+        .order_by(VisibilityDailyRecord.day, VisibilityDailyRecord.brand_name)
+    )).all()
+    totals = (await session.execute(
+        select(
+            VisibilityDailyRecord.brand_name,
+            func.max(VisibilityDailyRecord.is_competitor),
+            func.sum(VisibilityDailyRecord.runs_mentioned),
+            func.sum(VisibilityDailyRecord.mentions),
+            func.sum(VisibilityDailyRecord.rank_sum)
+        )
+        .where(*brand_filter)
+        .group_by(VisibilityDailyRecord.brand_name)
+        .order_by(func.sum(VisibilityDailyRecord.mentions).desc())
+    )).all()
+
+    return {
+        "company_id": company_id,
+        "start": start,
+        "end": end,
+        "summary": visibility_scores([(None, *row) for row in totals], range_totals),
+        "daily": visibility_scores(daily, daily_totals),
+    }
@@ -7,10 +7,10 @@ from typing import Any
 import emails  # type: ignore
 import jwt
 from jinja2 import Template
-from jwt.exceptions import InvalidTokenError
 
 from app.core import security
-from app.core.config import settings
+from app.config import settings
+from app.core.tokens import token_verifier
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -107,17 +107,14 @@ def generate_password_reset_token(email: str) -> str:
     exp = expires.timestamp()
     encoded_jwt = jwt.encode(
         {"exp": exp, "nbf": now, "sub": email},
-        settings.SECRET_KEY,
+        settings.secret_key,
         algorithm=security.ALGORITHM,
     )
     return encoded_jwt
 
 
 def verify_password_reset_token(token: str) -> str | None:
-    try:
-        decoded_token = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        return str(decoded_token["sub"])
-    except InvalidTokenError:
+    decoded_token = token_verifier.verify(token)
+    if decoded_token is None or "sub" not in decoded_token:
         return None
+    return str(decoded_token["sub"])
@@ -0,0 +1,69 @@
+"""
+Index existing brand prompts for near-duplicate detection.
+create_prompt indexes new prompts as they are inserted; run this once to add
+the prompts that existed before, or after restoring brand_prompts from a
+backup. Prompts already indexed are skipped, so it is safe to re-run.
+
+Usage:
+    python scripts/backfill_near_duplicates.py
+"""
+
+import asyncio
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from app.core.db import AsyncSessionLocal, BrandPromptRecord, PromptLshBucketRecord, engine, init_db
+from app.services.near_duplicates import near_duplicate_index
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+async def main():
+    await init_db()
+    cursor, indexed, flagged = 0, 0, 0
+    try:
+        while True:
+            async with AsyncSessionLocal() as session:
+                prompts = (await session.execute(
+                    select(BrandPromptRecord.id, BrandPromptRecord.company_id, BrandPromptRecord.prompt)
+                    .where(
+                        BrandPromptRecord.id > cursor,
+                        BrandPromptRecord.id.not_in(select(PromptLshBucketRecord.prompt_id))
+                    )
+                    .order_by(BrandPromptRecord.id)
+                    .limit(BATCH_SIZE)
+                )).all()
+                if not prompts:
+                    break
+
+                by_company = defaultdict(list)
+                for prompt in prompts:
+                    by_company[prompt.company_id].append((prompt.id, prompt.prompt))
+                for company_id, items in by_company.items():
+                    matches = await near_duplicate_index.add_many(session, company_id, items)
+                    flagged += sum(1 for ids in matches.values() if ids)
+                await session.commit()
+
+            cursor = prompts[-1].id
+            indexed += len(prompts)
+            logger.info(f"Indexed {indexed} prompts up to id {cursor}, {flagged} near-duplicates so far")
+    finally:
+        await engine.dispose()
+    logger.info(f"Done: {indexed} prompts indexed, {flagged} of them nearly duplicate an earlier prompt")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
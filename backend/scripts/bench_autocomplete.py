@@ -0,0 +1,87 @@
+"""
+Benchmark prompt autocomplete lookups.
+
+Builds one company's PrefixIndex from --prompts synthetic prompts in memory
+(the database is not touched), then times --queries suggestions for prefixes
+of 1 to 20 characters cut from random prompts. Reports build time, index size
+and p50/p99/max lookup latency.
+
+Usage:
+    python scripts/bench_autocomplete.py
+    python scripts/bench_autocomplete.py --prompts 1000000 --queries 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.services.autocomplete import PrefixIndex
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+WORDS = ("best cheap budget premium gaming office student travel laptop phone camera headphones chair desk "
+         "monitor keyboard mouse router tablet watch speaker blender vacuum mattress bike stroller sneakers "
+         "jacket backpack lens drone printer espresso grinder kettle fridge heater purifier").split()
+TEMPLATES = [
+    "What is the {a} {b} for {c} use",
+    "{a} {b} vs {c} {d} which one should I buy",
+    "Top rated {b} under {n} dollars with {c} features",
+    "recommend a {a} {b} and a {c} {d}",
+    "Is the {b} from {c} brands worth it in {n}",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=100000)
+    parser.add_argument("--brands", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    prompts = []
+    for _ in range(args.prompts):
+        a, b, c, d = rng.sample(WORDS, 4)
+        prompts.append(rng.choice(TEMPLATES).format(a=a, b=b, c=c, d=d, n=rng.randrange(100, 5000)))
+    brands = [f"{rng.choice(WORDS).title()} {i}" for i in range(args.brands)]
+
+    start = time.perf_counter()
+    index = PrefixIndex()
+    index.prompts.extend(prompts)
+    index.brands.extend(brands)
+    logger.info(
+        f"Built index of {len(index.prompts.keys)} distinct prompts in {time.perf_counter() - start:.2f}s, "
+        f"{index.nbytes / 2 ** 20:.1f} MiB"
+    )
+
+    prefixes = [rng.choice(prompts)[:rng.randint(1, 20)] for _ in range(args.queries)]
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix, args.limit)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    p50, p99, worst = np.percentile(latencies, [50, 99, 100])
+    logger.info(f"suggest: p50 {p50:.1f}us, p99 {p99:.1f}us, max {worst:.1f}us over {len(prefixes)} prefixes")
+
+    start = time.perf_counter()
+    for prompt in prompts[:1000]:
+        index.add(prompt + " today", "Acme")
+    logger.info(f"add: {(time.perf_counter() - start) * 1000:.3f}us per prompt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark the async database drivers against the brand_prompts queries used
+by app/api/routes/user_prompts.py.
+
+For every driver it seeds a throwaway company with --rows prompts, then times:
+  - by_company:     SELECT ... WHERE company_id = ?   (large result set, row decode bound)
+  - by_id:          SELECT ... WHERE id = ?           (single row, round-trip bound)
+  - by_idempotency: SELECT ... WHERE idempotency_key = ?
+
+and reports latency percentiles plus row-decode throughput. Seeded rows are
+deleted afterwards.
+
+Usage:
+    python scripts/bench_db_drivers.py --drivers aiomysql asyncmy aiosqlite --rows 5000
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.db import BrandPromptRecord
+from app.config import settings
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, samples: list[float], rows_per_call: int) -> dict:
+    total = sum(samples)
+    return {
+        "query": name,
+        "calls": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "rows_per_sec": rows_per_call * len(samples) / total if total else 0.0,
+    }
+
+
+async def seed(engine, company_id: str, rows: int) -> list[tuple[int, str]]:
+    """Insert benchmark rows and return (id, idempotency_key) pairs"""
+    records = [
+        {
+            "brand_id": f"brand-{i % 50}",
+            "brand_name": f"Brand {i % 50}",
+            "prompt": f"What are the best laptops for use case {i}? " * 4,
+            "user_id": f"bench-user-{i % 20}",
+            "company_id": company_id,
+            "idempotency_key": f"{company_id}-{i}",
+        }
+        for i in range(rows)
+    ]
+    async with engine.begin() as conn:
+        await conn.run_sync(BrandPromptRecord.metadata.create_all, tables=[BrandPromptRecord.__table__])
+        for start in range(0, rows, 1000):
+            await conn.execute(insert(BrandPromptRecord), records[start:start + 1000])
+        result = await conn.execute(
+            select(BrandPromptRecord.id, BrandPromptRecord.idempotency_key)
+            .where(BrandPromptRecord.company_id == company_id)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+async def bench_driver(driver: str, rows: int, iterations: int) -> list[dict]:
+    url = settings.model_copy(update={"db_driver": driver}).database_url
+    engine = create_async_engine(url, pool_size=settings.mysql_pool_size)
+    company_id = f"bench-{uuid.uuid4().hex[:12]}"
+
+    try:
+        keys = await seed(engine, company_id, rows)
+        by_company, by_id, by_key = [], [], []
+
+        async with engine.connect() as conn:
+            # Warm up the connection and statement caches
+            await conn.execute(select(BrandPromptRecord).where(BrandPromptRecord.company_id == company_id))
+
+            for i in range(iterations):
+                start = time.perf_counter()
+                result = await conn.execute(select(BrandPromptRecord).where(BrandPromptRecord.company_id == company_id))
+                fetched = result.all()
+                by_company.append(time.perf_counter() - start)
+                assert len(fetched) == rows
+
+                prompt_id, key = keys[i % len(keys)]
+                start = time.perf_counter()
+                result = await conn.execute(select(BrandPromptRecord).where(BrandPromptRecord.id == prompt_id))
+                result.one()
+                by_id.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                result = await conn.execute(select(BrandPromptRecord).where(BrandPromptRecord.idempotency_key == key))
+                result.one()
+                by_key.append(time.perf_counter() - start)
+
+        return [
+            {"driver": driver, **summarize("by_company", by_company, rows)},
+            {"driver": driver, **summarize("by_id", by_id, 1)},
+            {"driver": driver, **summarize("by_idempotency", by_key, 1)},
+        ]
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(BrandPromptRecord).where(BrandPromptRecord.company_id == company_id))
+        await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", nargs="+", default=["aiomysql", "asyncmy", "aiosqlite"])
+    parser.add_argument("--rows", type=int, default=5000, help="rows seeded for the company scan")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    results = []
+    for driver in args.drivers:
+        logger.info(f"Benchmarking {driver} with {args.rows} rows...")
+        try:
+            results.extend(await bench_driver(driver, args.rows, args.iterations))
+        except Exception as e:
+            logger.error(f"Skipping {driver}: {str(e)}")
+
+    header = f"{'driver':<10} {'query':<15} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>12}"
+    logger.info(header)
+    logger.info("-" * len(header))
+    for r in results:
+        logger.info(f"{r['driver']:<10} {r['query']:<15} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+                    f"{r['p99_ms']:>9.2f} {r['rows_per_sec']:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
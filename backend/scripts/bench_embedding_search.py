@@ -0,0 +1,68 @@
+"""
+Benchmark semantic search over a company's prompt embeddings.
+
+Appends --prompts random unit vectors of --dim dimensions to a scratch
+PromptEmbeddingStore, then times --queries top-k searches against the
+memory-mapped matrix (the Ollama call that embeds a query text is not
+included). Reports the matrix size and p50/p95/p99 search latency.
+
+Usage:
+    python scripts/bench_embedding_search.py --prompts 100000 --dim 768
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.services.embeddings import PromptEmbeddingStore
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        store = PromptEmbeddingStore(directory)
+        start = time.perf_counter()
+        for offset in range(0, args.prompts, 10000):
+            count = min(10000, args.prompts - offset)
+            ids = np.arange(offset + 1, offset + count + 1)
+            store.append("bench", "bench-model", ids, rng.standard_normal((count, args.dim), dtype=np.float32))
+        logger.info(f"Appended {args.prompts} x {args.dim} embeddings "
+                    f"({args.prompts * args.dim * 4 / 1e6:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        store.search("bench", queries[0], args.limit)  # map the matrix and warm the page cache
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            store.search("bench", query, args.limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    logger.info(f"top-{args.limit} search over {args.prompts} prompts: "
+                f"p50 {p50:.1f}ms, p95 {p95:.1f}ms, p99 {p99:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
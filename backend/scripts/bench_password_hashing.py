@@ -0,0 +1,91 @@
+"""
+Benchmark event-loop latency while many logins verify bcrypt passwords at once.
+
+A heartbeat task sleeps for --tick-ms in a loop and records how late it wakes
+up; that lag is what every other request on the worker would see. The same
+burst of --logins concurrent verifications is run twice:
+  - sync:  verify_password() called directly on the event loop (current crud.py)
+  - async: verify_password_async() through the bounded hash pool
+
+Usage:
+    python scripts/bench_password_hashing.py --logins 32
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core import security
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PASSWORD = "benchmark-password"
+
+
+async def heartbeat(tick: float, lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - start - tick)
+
+
+async def run_burst(mode: str, logins: int, tick: float, hashed: str) -> dict:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(tick, lags, stop))
+    await asyncio.sleep(tick * 2)
+
+    async def login_sync() -> bool:
+        return security.verify_password(PASSWORD, hashed)
+
+    async def login_async() -> bool:
+        return await security.verify_password_async(PASSWORD, hashed)
+
+    login = login_sync if mode == "sync" else login_async
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    assert all(results)
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "wall_s": elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000,
+        "lag_p99_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login verifications")
+    parser.add_argument("--tick-ms", type=float, default=5.0, help="heartbeat interval")
+    args = parser.parse_args()
+
+    hashed = security.get_password_hash(PASSWORD)
+    logger.info(f"Hash pool: {security.settings.password_hash_workers} workers, "
+                f"max pending {security.settings.password_hash_max_pending}")
+
+    for mode in ("sync", "async"):
+        r = await run_burst(mode, args.logins, args.tick_ms / 1000, hashed)
+        logger.info(f"{r['mode']:<6} logins={args.logins} wall={r['wall_s']:.2f}s "
+                    f"loop lag p50={r['lag_p50_ms']:.1f}ms p99={r['lag_p99_ms']:.1f}ms max={r['lag_max_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Measure the prompt-eval time saved by sending the static system prompt as a chat
+system message instead of concatenating it into each /api/generate prompt.
+
+Each strategy is warmed up once, then run over --calls origin prompts against a
+live Ollama server. Ollama reports prompt_eval_count / prompt_eval_duration for
+the tokens it actually evaluated, so tokens served from the KV cache show up as
+a smaller count and a shorter duration.
+
+Usage:
+    python scripts/bench_prompt_cache.py --calls 20 --model qwen3-coder:30b
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+from pathlib import Path
+
+import httpx
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.config.prompts import system_prompts
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ORIGIN_PROMPTS = [
+    "best laptops", "cheap flights to tokyo", "running shoes for flat feet", "crm for small business",
+    "vegan protein powder", "noise cancelling headphones", "project management software",
+    "electric cars under 40k", "home espresso machine", "budget travel insurance",
+]
+
+SYSTEM = system_prompts.alternative_prompts_system_input
+
+
+def _user_prompt(origin: str) -> str:
+    return f"Now provide alternative prompts for this reference: {origin}"
+
+
+async def _generate(client: httpx.AsyncClient, base_url: str, model: str, origin: str) -> dict:
+    response = await client.post(f"{base_url}/api/generate", json={
+        "model": model, "prompt": f"{SYSTEM}\n {_user_prompt(origin)}", "stream": False
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+async def _chat(client: httpx.AsyncClient, base_url: str, model: str, origin: str) -> dict:
+    response = await client.post(f"{base_url}/api/chat", json={
+        "model": model,
+        "messages": [{"role": "system", "content": SYSTEM}, {"role": "user", "content": _user_prompt(origin)}],
+        "stream": False
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+async def _run(name: str, call, client, base_url: str, model: str, calls: int) -> float:
+    await call(client, base_url, model, "warmup")
+    tokens, millis = [], []
+    for i in range(calls):
+        result = await call(client, base_url, model, ORIGIN_PROMPTS[i % len(ORIGIN_PROMPTS)])
+        tokens.append(result.get("prompt_eval_count", 0))
+        millis.append(result.get("prompt_eval_duration", 0) / 1e6)
+    mean_ms = statistics.mean(millis)
+    logger.info(f"{name}: mean prompt_eval_count={statistics.mean(tokens):.0f} "
+                f"mean prompt_eval={mean_ms:.1f}ms p50={statistics.median(millis):.1f}ms")
+    return mean_ms
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--model", default=settings.ai_model)
+    parser.add_argument("--url", default=settings.ai_model_url.rstrip('/'))
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(settings.ai_timeout * 10)) as client:
+        generate_ms = await _run("generate (concatenated)", _generate, client, args.url, args.model, args.calls)
+        chat_ms = await _run("chat (system message)", _chat, client, args.url, args.model, args.calls)
+
+    logger.info(f"Prompt-eval time saved per call: {generate_ms - chat_ms:.1f}ms "
+                f"({(generate_ms - chat_ms) / generate_ms * 100 if generate_ms else 0:.0f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
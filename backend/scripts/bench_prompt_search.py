@@ -0,0 +1,168 @@
+"""
+Benchmark keyword search over brand prompts.
+
+Loads --rows synthetic prompts spread over --companies companies into the
+configured database (company ids bench-0, bench-1, ...), then times
+search_prompts (FULLTEXT on MySQL) against the LIKE '%term%' scan it replaces,
+for --queries random one- and two-word queries. Reports p50/p95/p99 latency
+per approach. Run scripts/init_db.py first (or alembic upgrade head on an
+existing database) so the FULLTEXT index exists.
+
+Queries are timed in two sets: rare product words (each in ~10% of all
+prompts) and common template words (in ~20% of all prompts). A company holds
+only 1/--companies of the rows, so on MySQL the script also reports the rows
+the server read per query (Handler_read_* counters) and the plan of a common
+query: if it reads close to every company's matches, the company filter is
+applied after the FULLTEXT lookup rather than narrowing it.
+
+Usage:
+    python scripts/bench_prompt_search.py --rows 1000000   # load, benchmark, keep the rows
+    python scripts/bench_prompt_search.py --skip-load      # benchmark rows loaded earlier
+    python scripts/bench_prompt_search.py --cleanup        # delete the benchmark rows
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sqlalchemy import delete, insert, select, text
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, BrandPromptRecord, engine, init_db
+from app.services.prompt_search import search_prompts
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+WORDS = ("best cheap budget premium gaming office student travel laptop phone camera headphones chair desk "
+         "monitor keyboard mouse router tablet watch speaker blender vacuum mattress bike stroller sneakers "
+         "jacket backpack lens drone printer espresso grinder kettle fridge heater purifier").split()
+COMMON_WORDS = ("buy", "worth", "recommend", "rated", "features", "dollars", "brands")
+TEMPLATES = [
+    "what is the {a} {b} for {c} use",
+    "{a} {b} vs {c} {d} which one should I buy",
+    "top rated {b} under 500 dollars with {c} features",
+    "recommend a {a} {b} and a {c} {d}",
+    "is the {b} from {c} brands worth it in 2026",
+]
+
+
+def _prompt(rng: random.Random) -> str:
+    a, b, c, d = rng.sample(WORDS, 4)
+    return rng.choice(TEMPLATES).format(a=a, b=b, c=c, d=d)
+
+
+async def load(rows: int, companies: int, rng: random.Random) -> None:
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        for offset in range(0, rows, 5000):
+            await session.execute(insert(BrandPromptRecord), [
+                {
+                    "brand_id": "bench",
+                    "brand_name": "Bench",
+                    "prompt": _prompt(rng),
+                    "user_id": "bench",
+                    "company_id": f"bench-{i % companies}",
+                    "idempotency_key": f"bench-{i}",
+                }
+                for i in range(offset, min(rows, offset + 5000))
+            ])
+            await session.commit()
+    logger.info(f"Loaded {rows} prompts in {time.perf_counter() - start:.1f}s")
+
+
+async def like_scan(session, company_id: str, query: str, limit: int) -> list:
+    conditions = [BrandPromptRecord.prompt.like(f"%{term}%") for term in query.split()]
+    return (await session.execute(
+        select(BrandPromptRecord.id)
+        .where(BrandPromptRecord.company_id == company_id, BrandPromptRecord.is_active.is_(True), *conditions)
+        .order_by(BrandPromptRecord.id.desc())
+        .limit(limit)
+    )).all()
+
+
+async def rows_read(session) -> int:
+    """Rows this connection has read so far, from MySQL's session Handler_read_* counters"""
+    rows = await session.execute(text("SHOW SESSION STATUS LIKE 'Handler_read%'"))
+    return sum(int(value) for _, value in rows)
+
+
+async def measure(name: str, search, queries: list[tuple[str, str]], limit: int) -> None:
+    latencies = []
+    read = 0
+    async with AsyncSessionLocal() as session:
+        for company_id, query in queries:
+            before = await rows_read(session) if not settings.is_sqlite else 0
+            start = time.perf_counter()
+            await search(session, company_id, query, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not settings.is_sqlite:
+                read += await rows_read(session) - before
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    rows = "" if settings.is_sqlite else f", {read / len(queries):.0f} rows read per query"
+    logger.info(f"{name}: p50 {p50:.1f}ms, p95 {p95:.1f}ms, p99 {p99:.1f}ms over {len(queries)} queries{rows}")
+
+
+async def explain(company_id: str, query: str) -> None:
+    async with AsyncSessionLocal() as session:
+        plan = await session.execute(text(
+            f"EXPLAIN SELECT id FROM {settings.db_brand_prompts_table_name} "
+            f"WHERE company_id = :company_id AND is_active AND MATCH (prompt) AGAINST (:query IN NATURAL LANGUAGE MODE)"
+        ), {"company_id": company_id, "query": query})
+        for row in plan.mappings():
+            logger.info(f"EXPLAIN '{query}': type={row['type']} key={row['key']} rows={row['rows']} "
+                        f"extra={row['Extra']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-load", action="store_true", help="reuse rows loaded by an earlier run")
+    parser.add_argument("--cleanup", action="store_true", help="delete the benchmark rows and exit")
+    args = parser.parse_args()
+
+    await init_db()
+    try:
+        if args.cleanup:
+            async with AsyncSessionLocal() as session:
+                await session.execute(delete(BrandPromptRecord).where(BrandPromptRecord.brand_id == "bench"))
+                await session.commit()
+            logger.info("Deleted benchmark prompts")
+            return
+
+        rng = random.Random(args.seed)
+        if not args.skip_load:
+            await load(args.rows, args.companies, rng)
+
+        backend = "FULLTEXT" if not settings.is_sqlite else "LIKE fallback (SQLite)"
+        logger.info(f"{args.rows} prompts over {args.companies} companies")
+        for label, words in (("rare words", WORDS), ("common words", COMMON_WORDS)):
+            queries = [
+                (f"bench-{rng.randrange(args.companies)}", " ".join(rng.sample(words, rng.randint(1, 2))))
+                for _ in range(args.queries)
+            ]
+            await measure(f"{label}, search_prompts, {backend}", search_prompts, queries, args.limit)
+            await measure(f"{label}, LIKE '%term%' scan", like_scan, queries, args.limit)
+        if not settings.is_sqlite:
+            await explain("bench-0", COMMON_WORDS[0])
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
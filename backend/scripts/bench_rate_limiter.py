@@ -0,0 +1,92 @@
+"""
+Benchmark the shared SQLite token-bucket rate limiter.
+
+1. Per-request overhead: time --calls acquire() calls spread over --keys clients
+   in a single process and report latency percentiles (target: well under 1ms).
+2. Cross-worker enforcement: --workers processes hammer one key at the same
+   time; the total number of allowed requests must equal the bucket capacity,
+   not capacity x workers.
+
+Usage:
+    python scripts/bench_rate_limiter.py --calls 20000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.rate_limit import SQLiteTokenBucket
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def bench_overhead(path: str, calls: int, keys: int) -> None:
+    limiter = SQLiteTokenBucket(path, capacity=1_000_000, period=60)
+    limiter.acquire("warmup")
+
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        limiter.acquire(f"company:{i % keys}")
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+
+    def pct(p: float) -> float:
+        return samples[min(len(samples) - 1, int(len(samples) * p))] * 1e6
+
+    logger.info(f"acquire() over {calls} calls / {keys} keys: "
+                f"p50={pct(0.5):.1f}us p99={pct(0.99):.1f}us max={samples[-1] * 1e6:.1f}us")
+
+
+def _hammer(path: str, capacity: int, attempts: int, results) -> None:
+    limiter = SQLiteTokenBucket(path, capacity=capacity, period=3600)
+    allowed = 0
+    for _ in range(attempts):
+        try:
+            allowed += limiter.acquire("shared-client")[0]
+        except Exception:
+            pass
+    results.put(allowed)
+
+
+def bench_shared(path: str, workers: int, capacity: int) -> None:
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_hammer, args=(path, capacity, capacity, results))
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    allowed = sum(results.get() for _ in processes)
+    logger.info(f"{workers} workers x {capacity} attempts on one key with capacity {capacity}: "
+                f"{allowed} allowed (expected {capacity})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_overhead(f"{tmp}/overhead.sqlite3", args.calls, args.keys)
+        bench_shared(f"{tmp}/shared.sqlite3", args.workers, args.capacity)
+
+
+if __name__ == "__main__":
+    main()
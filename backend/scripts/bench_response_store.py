@@ -0,0 +1,132 @@
+"""
+Benchmark the response store.
+
+Generates --answers synthetic model answers for each of --models models, with
+--duplicates of them repeating an earlier answer verbatim, and writes them to a
+scratch SQLite database through ResponseStore twice: once compressing without
+dictionaries, once after training a dictionary per model on --train other
+answers of that model. Reports the compression ratio (raw UTF-8 bytes of all
+answers over bytes stored, so deduplication counts too) and write/read
+throughput.
+
+Usage:
+    python scripts/bench_response_store.py --models 2 --answers 5000
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import CompressionDictionaryRecord, ResponseBlobRecord
+from app.services.response_store import ResponseStore
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BRANDS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne", "Tyrell", "Soylent"]
+PHRASES = [
+    "Based on recent reviews, {a} is the strongest choice for most buyers.",
+    "{a} and {b} both offer solid warranties, but {a} has better customer support.",
+    "If budget matters most, {b} is usually cheaper than {a}.",
+    "Many users report that {c} is reliable, although its range is smaller.",
+    "Here are the top options: 1. {a} 2. {b} 3. {c}.",
+    "Overall, I would recommend comparing prices and warranty terms before deciding.",
+    "{c} has improved a lot in the last year, especially in durability.",
+    "Experts often rank {a} first for build quality and {b} for value.",
+]
+
+
+def _answers(count: int, duplicates: float, rng: random.Random) -> list[str]:
+    answers = []
+    for _ in range(count):
+        if answers and rng.random() < duplicates:
+            answers.append(rng.choice(answers))
+            continue
+        a, b, c = rng.sample(BRANDS, 3)
+        sentences = [rng.choice(PHRASES).format(a=a, b=b, c=c) for _ in range(rng.randint(4, 12))]
+        answers.append(" ".join(sentences))
+    return answers
+
+
+async def _run(items: list[tuple[str, str]], samples: list[tuple[str, str]], use_dictionaries: bool) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            for table in (ResponseBlobRecord, CompressionDictionaryRecord):
+                await conn.run_sync(table.__table__.create)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        store = ResponseStore(factory)
+
+        if use_dictionaries:
+            models = sorted({model for model, _ in samples})
+            trainer = ResponseStore(factory, dict_min_samples=1, dict_samples=len(samples))
+            async with factory() as session:
+                await trainer.put_many(session, samples)
+                await session.commit()
+            start = time.perf_counter()
+            for model in models:
+                await trainer.train_dictionary(model)
+            logger.info(f"Trained {len(models)} dictionaries in {time.perf_counter() - start:.2f}s")
+
+        hashes = []
+        start = time.perf_counter()
+        for offset in range(0, len(items), 200):
+            async with factory() as session:
+                hashes += await store.put_many(session, items[offset:offset + 200])
+                await session.commit()
+        write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, len(hashes), 200):
+            async with factory() as session:
+                await store.get_many(session, hashes[offset:offset + 200])
+        read = time.perf_counter() - start
+        await engine.dispose()
+
+    return {**store.stats(), "write_wall": write, "read_wall": read}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=2)
+    parser.add_argument("--answers", type=int, default=5000, help="answers per model")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of answers repeating an earlier one")
+    parser.add_argument("--train", type=int, default=1000, help="answers per model a dictionary is trained on")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [
+        (f"model-{m}", text)
+        for m in range(args.models)
+        for text in _answers(args.answers, args.duplicates, rng)
+    ]
+    samples = [(f"model-{m}", text) for m in range(args.models) for text in _answers(args.train, 0, rng)]
+    megabytes = sum(len(text.encode("utf-8")) for _, text in items) / 1e6
+    logger.info(f"{len(items)} answers, {megabytes:.1f} MB of text")
+
+    for label, use_dictionaries in (("zstd", False), ("zstd + dictionary", True)):
+        result = await _run(items, samples, use_dictionaries)
+        logger.info(f"{label}: ratio {result['compression_ratio']}x "
+                    f"({result['deduplicated']} of {result['writes']} answers deduplicated), "
+                    f"write {megabytes / result['write_wall']:.1f} MB/s end to end "
+                    f"({result['write_mb_per_s']} MB/s in the store), "
+                    f"read {megabytes / result['read_wall']:.1f} MB/s end to end "
+                    f"({result['read_mb_per_s']} MB/s in the store)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Standalone prompt clustering job.
+Groups each company's prompts into topic clusters with mini-batch k-means over
+the embeddings written by scripts/index_prompts.py, so it must run where
+EMBEDDINGS_DIR is readable. New prompts are folded into the existing clusters
+on every run; a company is refit from scratch only once it has grown enough
+to need more clusters.
+
+Usage:
+    python scripts/cluster_prompts.py                       # cluster new prompts forever
+    python scripts/cluster_prompts.py --once                # cluster what is pending, then exit
+    python scripts/cluster_prompts.py --once --refit        # recompute every company's clusters from scratch
+    python scripts/cluster_prompts.py --once --company c1   # only one company
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.core.db import engine, init_db
+from app.services.clustering import prompt_clusterer
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="cluster pending prompts and exit")
+    parser.add_argument("--refit", action="store_true", help="recompute clusters from scratch on the first run")
+    parser.add_argument("--company", help="only cluster this company's prompts")
+    args = parser.parse_args()
+
+    await init_db()
+    refit = args.refit
+    try:
+        while True:
+            try:
+                if args.company:
+                    await prompt_clusterer.process_company(args.company, refit=refit)
+                else:
+                    await prompt_clusterer.process_pending(refit=refit)
+            except Exception as e:
+                logger.error(f"Prompt clustering failed: {str(e)}")
+            refit = False
+            if args.once:
+                break
+            await asyncio.sleep(settings.cluster_poll_interval)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
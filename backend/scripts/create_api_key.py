@@ -0,0 +1,54 @@
+"""
+Issue or revoke an API key for a company.
+The raw key is printed once; only its HMAC-SHA256 digest is stored.
+
+Usage:
+    python scripts/create_api_key.py --company-id acme --name "ingest pipeline"
+    python scripts/create_api_key.py --revoke 42
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.api_keys import create_api_key, revoke_api_key
+from app.core.db import AsyncSessionLocal, engine, init_db
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--company-id")
+    parser.add_argument("--name", default="default")
+    parser.add_argument("--revoke", type=int, help="id of the key to revoke")
+    args = parser.parse_args()
+
+    try:
+        await init_db()
+        async with AsyncSessionLocal() as session:
+            if args.revoke is not None:
+                await revoke_api_key(session, args.revoke)
+                logger.info(f"API key {args.revoke} revoked")
+                return
+            if not args.company_id:
+                parser.error("--company-id is required when creating a key")
+
+            raw_key, record = await create_api_key(session, args.company_id, args.name)
+            logger.info(f"Created API key {record.id} for company {record.company_id}")
+            logger.info(f"Key (shown once, store it now): {raw_key}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Standalone prompt indexer.
+Embeds new brand prompts through the local Ollama embeddings endpoint, in
+batches, and appends them to their company's embedding matrix for semantic
+search. Run it as a single process next to the API workers, on the host (or
+volume) holding EMBEDDINGS_DIR; prompts become searchable within
+EMBEDDING_POLL_INTERVAL seconds of being created.
+
+Usage:
+    python scripts/index_prompts.py            # index new prompts forever
+    python scripts/index_prompts.py --once     # index what is pending, then exit
+    python scripts/index_prompts.py --rebuild  # drop all embeddings and re-embed every prompt
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete
+
+from app.config import settings
+from app.core.db import AsyncSessionLocal, WatermarkRecord, engine, init_db
+from app.services.embeddings import WATERMARK_NAME, EmbeddingIndexer
+from app.services.local_ai_services import local_model_service
+from app.services.usage import usage_meter
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def rebuild():
+    """Forget every embedding, e.g. after changing AI_EMBEDDING_MODEL"""
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(WatermarkRecord).where(WatermarkRecord.name == WATERMARK_NAME))
+        await session.commit()
+    shutil.rmtree(settings.embeddings_dir, ignore_errors=True)
+    logger.info(f"Removed embeddings in {settings.embeddings_dir}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="index pending prompts and exit")
+    parser.add_argument("--rebuild", action="store_true", help="drop all embeddings before indexing")
+    args = parser.parse_args()
+
+    await init_db()
+    if args.rebuild:
+        await rebuild()
+    indexer = EmbeddingIndexer()
+    flusher = asyncio.create_task(usage_meter.run_flusher())
+    logger.info(f"Indexing prompts with {indexer.model} into {settings.embeddings_dir}")
+    try:
+        while True:
+            try:
+                await indexer.process_pending()
+            except Exception as e:
+                logger.error(f"Prompt indexing failed: {str(e)}")
+            if args.once:
+                break
+            await asyncio.sleep(settings.embedding_poll_interval)
+    finally:
+        flusher.cancel()
+        await usage_meter.flush()
+        await local_model_service.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
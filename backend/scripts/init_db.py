@@ -14,8 +14,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy import text
-from app.repo import Base
+from sqlalchemy import text, inspect
+from app.core.db import Base
 from app.config import settings
 import logging
 
@@ -28,10 +28,12 @@ logger = logging.getLogger(__name__)
 
 async def create_database_if_not_exists():
     """Create the database if it doesn't exist"""
-    # Connect without database specified
-    base_url = f"mysql+aiomysql://{settings.mysql_user}:{settings.mysql_password}@{settings.mysql_host}:{settings.mysql_port}"
+    if settings.is_sqlite:
+        logger.info(f"Using SQLite database file '{settings.sqlite_path}', nothing to provision")
+        return
 
-    engine = create_async_engine(base_url, echo=False)
+    # Connect without database specified
+    engine = create_async_engine(settings.database_server_url, echo=False)
 
     try:
         async with engine.connect() as conn:
@@ -72,9 +74,8 @@ async def create_tables():
             logger.info("Tables created successfully")
 
             # Verify tables were created
-            result = await conn.execute(text("SHOW TABLES"))
-            tables = result.fetchall()
-            logger.info(f"Existing tables: {[table[0] for table in tables]}")
+            tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+            logger.info(f"Existing tables: {tables}")
 
     except Exception as e:
         logger.error(f"Error creating tables: {str(e)}")
@@ -85,6 +86,10 @@ async def create_tables():
 
 async def verify_schema():
     """Verify the schema is correct"""
+    if settings.is_sqlite:
+        logger.info("Skipping schema verification for SQLite")
+        return
+
     engine = create_async_engine(settings.database_url, echo=False)
 
     try:
@@ -0,0 +1,61 @@
+"""
+Rebuild the prompt_daily rollup from brand_prompts.
+create_prompt keeps the rollup up to date as prompts are inserted; run this
+once to count the prompts that existed before, or to repair it after prompts
+were inserted, moved or deleted outside the API. Each company is rebuilt in
+its own transaction, so dashboards never see it half counted.
+
+Usage:
+    python scripts/rebuild_prompt_stats.py                # every company
+    python scripts/rebuild_prompt_stats.py --company c1   # one company
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select, union
+
+from app.core.db import AsyncSessionLocal, BrandPromptRecord, PromptDailyRecord, engine, init_db
+from app.services.prompt_stats import rebuild_prompt_stats
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--company", help="only rebuild this company's counts")
+    args = parser.parse_args()
+
+    await init_db()
+    try:
+        if args.company:
+            companies = [args.company]
+        else:
+            # Companies only left in the rollup are cleared too
+            async with AsyncSessionLocal() as session:
+                companies = sorted((await session.execute(union(
+                    select(BrandPromptRecord.company_id), select(PromptDailyRecord.company_id)
+                ))).scalars().all())
+
+        rows = 0
+        for company_id in companies:
+            async with AsyncSessionLocal() as session:
+                rows += await rebuild_prompt_stats(session, company_id)
+                await session.commit()
+        logger.info(f"Rebuilt prompt counts of {len(companies)} companies into {rows} rollup rows")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Standalone brand-prompt runner.
+Runs every active brand prompt against the configured model backends once per
+RUNNER_INTERVAL, records the runs in the prompt_runs table and the answers in
+the response store, extracts the brand mentions from them and folds both into
+the daily visibility rollups. It also trains the response store's compression
+dictionaries as answers pile up. Run it as its own process, next to the API
+workers; a crashed runner resumes its cycle on restart.
+
+Usage:
+    python scripts/run_prompts.py          # run cycles forever
+    python scripts/run_prompts.py --once   # run or resume one cycle, then exit
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.db import engine, init_db
+from app.services.mentions import MentionExtractor
+from app.services.prompt_runner import PromptRunner
+from app.services.response_store import response_store
+from app.services.usage import usage_meter
+from app.services.visibility import VisibilityRollup
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run or resume a single cycle and exit")
+    args = parser.parse_args()
+
+    await init_db()
+    runner = PromptRunner()
+    extractor = MentionExtractor()
+    rollup = VisibilityRollup()
+
+    async def after_run():
+        await extractor.process_pending()
+        await rollup.process_pending()
+        await response_store.train_pending()
+
+    flusher = asyncio.create_task(usage_meter.run_flusher())
+    logger.info(f"Prompt runner {runner.owner} using backends {[b.base_url for b in runner.backends]}")
+    try:
+        if args.once:
+            if not await runner.run_once():
+                logger.info("No cycle due")
+            await after_run()
+        else:
+            await runner.run_forever(after_run=after_run)
+    finally:
+        flusher.cancel()
+        await usage_meter.flush()
+        await runner.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
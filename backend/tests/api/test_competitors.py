@@ -0,0 +1,45 @@
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.deps import require_api_key
+from app.config import settings
+from app.core.db import CompetitorRecord, get_lazy_db
+from app.main import app
+
+URL = f"{settings.api_prefix}/competitors/"
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'competitors.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(CompetitorRecord.__table__.create)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_test_db():
+        async with factory() as session:
+            yield session
+
+    app.dependency_overrides[get_lazy_db] = get_test_db
+    app.dependency_overrides[require_api_key] = lambda: None
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_removed_competitor_can_be_added_again(client) -> None:
+    created = await client.post(URL, json={"company_id": "c1", "name": "Globex"})
+    assert created.status_code == 201
+    assert (await client.post(URL, json={"company_id": "c1", "name": "Globex "})).status_code == 409
+
+    assert (await client.delete(f"{URL}{created.json()['id']}")).status_code == 204
+    assert (await client.get(f"{URL}company_id/c1")).json() == []
+
+    readded = await client.post(URL, json={"company_id": "c1", "name": "Globex"})
+    assert readded.status_code == 201
+    assert readded.json()["id"] == created.json()["id"] and readded.json()["is_active"]
+    assert [competitor["name"] for competitor in (await client.get(f"{URL}company_id/c1")).json()] == ["Globex"]
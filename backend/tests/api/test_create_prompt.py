@@ -0,0 +1,61 @@
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.deps import require_api_key
+from app.config import settings
+from app.core.db import BrandPromptRecord, PromptDailyRecord, PromptLshBucketRecord, get_lazy_db
+from app.main import app
+
+URL = f"{settings.api_prefix}/prompts/"
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'prompts.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, PromptLshBucketRecord, PromptDailyRecord):
+            await conn.run_sync(table.__table__.create)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_test_db():
+        async with factory() as session:
+            yield session
+
+    app.dependency_overrides[get_lazy_db] = get_test_db
+    app.dependency_overrides[require_api_key] = lambda: None
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+def _prompt(prompt: str, key: str) -> dict:
+    return {"prompt": prompt, "brand_id": "b1", "brand_name": "Acme", "user_id": "u1", "idempotency_key": key,
+            "company_id": "c1"}
+
+
+@pytest.mark.asyncio
+async def test_create_prompt_flags_near_duplicates(client) -> None:
+    first = await client.post(URL, json=_prompt("What is the best gaming laptop for students?", "k1"))
+    assert first.status_code == 201, first.text
+    assert first.json()["brand_name"] == "Acme" and first.json()["near_duplicates"] == []
+
+    second = await client.post(URL, json=_prompt("Students: what is the best laptop for gaming?", "k2"))
+    assert second.status_code == 201, second.text
+    assert second.json()["near_duplicates"] == [first.json()["id"]]
+
+    replay = await client.post(URL, json=_prompt("Students: what is the best laptop for gaming?", "k2"))
+    assert replay.json()["is_duplicate"] and replay.json()["id"] == second.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_created_prompts_are_counted_in_the_daily_rollup(client) -> None:
+    for key, prompt in (("k1", "best gaming laptop"), ("k2", "cheapest office chair"), ("k2", "cheapest office chair")):
+        assert (await client.post(URL, json=_prompt(prompt, key))).status_code == 201
+
+    stats = (await client.get(f"{settings.api_prefix}/analytics/prompts/c1")).json()
+    assert stats["all_time"] == 2 and stats["total"] == 2
+    assert stats["by_brand"] == [{"brand_id": "b1", "brand_name": "Acme", "prompts": 2}]
+    assert stats["by_user"] == [{"user_id": "u1", "prompts": 2}]
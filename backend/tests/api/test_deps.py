@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.deps import ClientDisconnected, require_operator, run_until_disconnected
+from app.config import settings
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: int):
+        self.polls = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls > self.disconnect_after
+
+
+@pytest.mark.asyncio
+async def test_returns_result_when_client_stays() -> None:
+    async def work() -> str:
+        await asyncio.sleep(0.02)
+        return "done"
+
+    assert await run_until_disconnected(FakeRequest(100), work(), poll_interval=0.005) == "done"
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_the_work() -> None:
+    cancelled = asyncio.Event()
+
+    async def work() -> str:
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "never"
+
+    with pytest.raises(ClientDisconnected):
+        await run_until_disconnected(FakeRequest(1), work(), poll_interval=0.005)
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_operator_routes_need_the_metrics_token(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "environment", "production")
+    monkeypatch.setattr(settings, "metrics_token", "")
+    with pytest.raises(HTTPException) as exc:
+        await require_operator("anything")
+    assert exc.value.status_code == 403  # no token configured: closed
+
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    with pytest.raises(HTTPException) as exc:
+        await require_operator(None)
+    assert exc.value.status_code == 401
+    with pytest.raises(HTTPException) as exc:
+        await require_operator("wrong")
+    assert exc.value.status_code == 403
+    await require_operator("s3cret")
+
+    monkeypatch.setattr(settings, "environment", "development")
+    await require_operator(None)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import user_prompts
+from app.config import settings
+from app.services.embeddings import PromptEmbeddingStore
+
+
+class FakeEmbeddingService:
+    def __init__(self, result=None, error: Exception = None):
+        self.result = result
+        self.error = error
+
+    async def embed(self, texts, **kwargs):
+        if self.error:
+            raise self.error
+        return self.result
+
+
+async def _similar(store, service, monkeypatch):
+    monkeypatch.setattr(user_prompts, "prompt_embeddings", store)
+    monkeypatch.setattr(user_prompts, "local_model_service", service)
+    return await user_prompts.get_similar_prompts(
+        company_id="c1", q="best running shoes", prompt_id=None, limit=5, database=None, principal=None
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PromptEmbeddingStore(str(tmp_path))
+    store.append("c1", settings.ai_embedding_model, np.array([1, 2]), np.eye(2, 3))
+    return store
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("service", [
+    FakeEmbeddingService(error=Exception("Failed to call Ollama embed: connection refused")),
+    FakeEmbeddingService(result=[]),
+])
+async def test_embedding_failures_are_service_unavailable(store, service, monkeypatch) -> None:
+    with pytest.raises(HTTPException) as e:
+        await _similar(store, service, monkeypatch)
+    assert e.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_query_that_does_not_match_the_index_is_a_conflict(store, monkeypatch) -> None:
+    with pytest.raises(HTTPException) as e:
+        await _similar(store, FakeEmbeddingService(result=[[1.0, 0.0]]), monkeypatch)
+    assert e.value.status_code == 409
+
+    monkeypatch.setattr(settings, "ai_embedding_model", "another-embedding-model")
+    with pytest.raises(HTTPException) as e:
+        await _similar(store, FakeEmbeddingService(result=[[1.0, 0.0, 0.0]]), monkeypatch)
+    assert e.value.status_code == 409 and "--rebuild" in e.value.detail
@@ -1,27 +1,30 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from sqlmodel import Session, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import delete
 
-from app.core.config import settings
-from app.core.db import engine, init_db
+from app.config import settings
+from app.core.db import AsyncSessionLocal
+from app.initial_data import init
 from app.main import app
 from app.models import Item, User
 from tests.utils.user import authentication_token_from_email
 from tests.utils.utils import get_superuser_token_headers
 
 
-@pytest.fixture(scope="session", autouse=True)
-def db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
-        init_db(session)
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def db() -> AsyncGenerator[AsyncSession, None]:
+    await init()
+    async with AsyncSessionLocal() as session:
         yield session
         statement = delete(Item)
-        session.execute(statement)
+        await session.execute(statement)
         statement = delete(User)
-        session.execute(statement)
-        session.commit()
+        await session.execute(statement)
+        await session.commit()
 
 
 @pytest.fixture(scope="module")
@@ -35,8 +38,8 @@ def superuser_token_headers(client: TestClient) -> dict[str, str]:
     return get_superuser_token_headers(client)
 
 
-@pytest.fixture(scope="module")
-def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]:
-    return authentication_token_from_email(
+@pytest_asyncio.fixture(scope="module", loop_scope="session")
+async def normal_user_token_headers(client: TestClient, db: AsyncSession) -> dict[str, str]:
+    return await authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core import api_keys
+from app.core.db import ApiKeyRecord
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'keys.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(ApiKeyRecord.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(api_keys, "api_key_cache", api_keys.ApiKeyCache(ttl=60, negative_ttl=60))
+
+
+def test_digest_is_stable_and_not_the_key() -> None:
+    key = api_keys.generate_api_key()
+    assert api_keys.hash_api_key(key) == api_keys.hash_api_key(key)
+    assert key not in api_keys.hash_api_key(key)
+    assert len(api_keys.hash_api_key(key)) == 64
+
+
+def test_cache_expires_entries() -> None:
+    cache = api_keys.ApiKeyCache(ttl=-1, negative_ttl=-1)
+    cache.put("digest", api_keys.ApiKeyPrincipal(key_id=1, company_id="c1"))
+    assert cache.get("digest") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_authenticate_uses_cache_after_first_lookup(session_factory) -> None:
+    async with session_factory() as session:
+        raw_key, record = await api_keys.create_api_key(session, "c1", "test")
+
+    principal = await api_keys.authenticate_api_key(raw_key, session_factory=session_factory)
+    assert principal == api_keys.ApiKeyPrincipal(key_id=record.id, company_id="c1")
+
+    # A cached key no longer needs the database at all
+    principal = await api_keys.authenticate_api_key(raw_key, session_factory=None)
+    assert principal.company_id == "c1"
+
+
+@pytest.mark.asyncio
+async def test_unknown_key_is_negatively_cached(session_factory) -> None:
+    assert await api_keys.authenticate_api_key("kila_nope", session_factory=session_factory) is None
+    assert await api_keys.authenticate_api_key("kila_nope", session_factory=None) is None
+
+
+@pytest.mark.asyncio
+async def test_revocation_poll_evicts_cached_key(session_factory) -> None:
+    async with session_factory() as session:
+        raw_key, record = await api_keys.create_api_key(session, "c1", "test")
+    assert await api_keys.authenticate_api_key(raw_key, session_factory=session_factory)
+
+    async with session_factory() as session:
+        await api_keys.revoke_api_key(session, record.id)
+    assert await api_keys.api_key_cache.poll_revocations(session_factory) == 1
+
+    assert await api_keys.authenticate_api_key(raw_key, session_factory=session_factory) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_revocation_poll_is_retried_from_the_same_point(session_factory, monkeypatch) -> None:
+    async with session_factory() as session:
+        raw_key, record = await api_keys.create_api_key(session, "c1", "test")
+    assert await api_keys.authenticate_api_key(raw_key, session_factory=session_factory)
+    async with session_factory() as session:
+        await api_keys.revoke_api_key(session, record.id)
+
+    def broken_factory():
+        raise ConnectionError("database unavailable")
+
+    class _Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(minutes=1)
+
+    # The failed poll happens well after the revocation, outside the next poll's overlap
+    monkeypatch.setattr(api_keys, "datetime", _Later)
+    with pytest.raises(ConnectionError):
+        await api_keys.api_key_cache.poll_revocations(broken_factory)
+    monkeypatch.setattr(api_keys, "datetime", datetime)
+    assert await api_keys.api_key_cache.poll_revocations(session_factory) == 1
+    assert await api_keys.authenticate_api_key(raw_key, session_factory=session_factory) is None
@@ -0,0 +1,71 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.db import BrandPromptRecord, LazyAsyncSession
+
+
+@pytest_asyncio.fixture
+async def sqlite_engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'lazy.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(BrandPromptRecord.__table__.create)
+    yield engine
+    await engine.dispose()
+
+
+def _track_checkouts(engine) -> dict[str, int]:
+    counts = {"out": 0}
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(*_):
+        counts["out"] += 1
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(*_):
+        counts["out"] -= 1
+
+    return counts
+
+
+def _record(key: str) -> BrandPromptRecord:
+    return BrandPromptRecord(
+        brand_id="b1", brand_name="acme", prompt="best laptops",
+        user_id="u1", company_id="c1", idempotency_key=key,
+    )
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_releases_connection_after_read(sqlite_engine) -> None:
+    counts = _track_checkouts(sqlite_engine)
+    async with LazyAsyncSession(bind=sqlite_engine, expire_on_commit=False) as session:
+        assert counts["out"] == 0
+        result = await session.execute(select(BrandPromptRecord))
+        assert result.scalars().all() == []
+        assert counts["out"] == 0
+        assert not session.in_transaction()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_releases_connection_after_commit_and_refresh(sqlite_engine) -> None:
+    counts = _track_checkouts(sqlite_engine)
+    async with LazyAsyncSession(bind=sqlite_engine, expire_on_commit=False) as session:
+        record = _record("k1")
+        session.add(record)
+        await session.commit()
+        assert counts["out"] == 0
+        await session.refresh(record)
+        assert counts["out"] == 0
+        assert record.id is not None
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_keeps_explicit_unit_of_work(sqlite_engine) -> None:
+    counts = _track_checkouts(sqlite_engine)
+    async with LazyAsyncSession(bind=sqlite_engine, expire_on_commit=False) as session:
+        async with session.begin():
+            await session.execute(select(BrandPromptRecord))
+            assert counts["out"] == 1
+            session.add(_record("k2"))
+        assert counts["out"] == 0
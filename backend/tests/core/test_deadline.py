@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.core import deadline
+from app.core.db import UsersRecord, _with_deadline
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware, bounded, check_deadline, remaining, timeout_for
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+
+    @app.get("/budget")
+    async def budget():
+        return {"remaining": remaining()}
+
+    return app
+
+
+def test_no_deadline_outside_requests() -> None:
+    assert remaining() is None
+    assert timeout_for(5.0) == 5.0
+    check_deadline(1000)
+
+
+def test_header_sets_budget_capped_by_max() -> None:
+    client = TestClient(_app())
+    left = client.get("/budget", headers={"X-Request-Timeout-Ms": "2000"}).json()["remaining"]
+    assert 1.5 < left <= 2.0
+    left = client.get("/budget", headers={"X-Request-Timeout-Ms": "99999999"}).json()["remaining"]
+    assert left <= deadline.settings.request_timeout_max
+
+
+def test_invalid_header_budgets_fall_back_to_the_route_default() -> None:
+    client = TestClient(_app())
+    default = deadline.route_timeout("/budget")
+    for value in ("nan", "inf", "-inf", "-500", "0", "soon"):
+        left = client.get("/budget", headers={"X-Request-Timeout-Ms": value}).json()["remaining"]
+        assert default - 0.5 < left <= default, value
+
+
+def test_route_default_uses_longest_prefix(monkeypatch) -> None:
+    monkeypatch.setattr(deadline.settings, "request_timeout_default", 7.0)
+    monkeypatch.setattr(deadline.settings, "request_timeouts", {"/a": 3.0, "/a/b": 1.0})
+    assert deadline.route_timeout("/a/b/c") == 1.0
+    assert deadline.route_timeout("/a/x") == 3.0
+    assert deadline.route_timeout("/z") == 7.0
+
+
+@pytest.mark.asyncio
+async def test_bounded_abandons_work_past_deadline() -> None:
+    token = deadline._deadline.set(time.monotonic() + 0.05)
+    try:
+        assert timeout_for(10.0) <= 0.05
+        with pytest.raises(DeadlineExceeded):
+            check_deadline(1.0)
+        with pytest.raises(DeadlineExceeded):
+            await bounded(asyncio.sleep(1))
+        with pytest.raises(DeadlineExceeded):
+            await bounded(asyncio.sleep(0))
+    finally:
+        deadline._deadline.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_select_gets_mysql_execution_time_hint() -> None:
+    statement = select(UsersRecord.id)
+    assert _with_deadline(statement) is statement
+
+    token = deadline._deadline.set(time.monotonic() + 0.42)
+    try:
+        bounded_statement = _with_deadline(statement)
+    finally:
+        deadline._deadline.reset(token)
+    assert "MAX_EXECUTION_TIME(500)" in str(bounded_statement.compile(dialect=mysql.dialect()))
+    assert "MAX_EXECUTION_TIME" not in str(bounded_statement.compile(dialect=sqlite.dialect()))
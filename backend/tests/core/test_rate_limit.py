@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.middleware.cors import CORSMiddleware
+
+from app.core.api_keys import ApiKeyPrincipal, api_key_cache, hash_api_key
+from app.core.rate_limit import RateLimitMiddleware, SQLiteTokenBucket, rate_limit_key
+
+
+def test_bucket_allows_capacity_then_rejects(tmp_path) -> None:
+    limiter = SQLiteTokenBucket(str(tmp_path / "rl.sqlite3"), capacity=3, period=60)
+    assert [limiter.acquire("k")[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = limiter.acquire("k")
+    assert not allowed
+    assert 0 < retry_after <= 20
+    assert limiter.acquire("other")[0]
+
+
+def test_bucket_refills_over_time(tmp_path) -> None:
+    limiter = SQLiteTokenBucket(str(tmp_path / "rl.sqlite3"), capacity=2, period=10)
+    with patch("app.core.rate_limit.time.time", return_value=1000.0):
+        assert limiter.acquire("k")[0] and limiter.acquire("k")[0]
+        assert not limiter.acquire("k")[0]
+    with patch("app.core.rate_limit.time.time", return_value=1005.0):
+        assert limiter.acquire("k")[0]
+        assert not limiter.acquire("k")[0]
+
+
+def test_limit_is_shared_between_limiter_instances(tmp_path) -> None:
+    # Two instances on the same file stand in for two worker processes
+    path = str(tmp_path / "rl.sqlite3")
+    worker_a = SQLiteTokenBucket(path, capacity=4, period=60)
+    worker_b = SQLiteTokenBucket(path, capacity=4, period=60)
+    results = [worker.acquire("k")[0] for worker in (worker_a, worker_b) * 3]
+    assert results.count(True) == 4
+
+
+def _app(tmp_path, capacity: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping() -> dict[str, str]:
+        return {"status": "ok"}
+
+    app.add_middleware(
+        RateLimitMiddleware, limiter=SQLiteTokenBucket(str(tmp_path / "rl.sqlite3"), capacity=capacity, period=60)
+    )
+    return app
+
+
+def test_middleware_returns_429_with_retry_after(tmp_path) -> None:
+    client = TestClient(_app(tmp_path, capacity=1))
+    assert client.get("/ping").status_code == 200
+    response = client.get("/ping")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_client_chosen_identifiers_do_not_get_their_own_bucket(tmp_path) -> None:
+    client = TestClient(_app(tmp_path, capacity=2))
+    assert client.get("/ping", headers={"X-Company-Id": "c1"}).status_code == 200
+    assert client.get("/ping", headers={"X-API-Key": "kila_random1"}).status_code == 200
+    assert client.get("/ping", headers={"X-Company-Id": "c2"}).status_code == 429
+    assert client.get("/ping", headers={"X-API-Key": "kila_random2"}).status_code == 429
+
+
+def test_verified_api_keys_are_limited_per_company() -> None:
+    scope = {"type": "http", "client": ("10.0.0.1", 1234), "headers": [(b"x-api-key", b"kila_valid")]}
+    assert rate_limit_key(scope) == "ip:10.0.0.1"
+    api_key_cache.put(hash_api_key("kila_valid"), ApiKeyPrincipal(key_id=1, company_id="c1"))
+    try:
+        assert rate_limit_key(scope) == "company:c1"
+        assert rate_limit_key({**scope, "headers": [(b"x-company-id", b"c2")]}) == "ip:10.0.0.1"
+    finally:
+        api_key_cache.clear()
+
+
+def test_429_carries_cors_headers_when_limiter_runs_inside_cors(tmp_path) -> None:
+    # Same order as app.main: the limiter is added first, so CORSMiddleware wraps it
+    app = _app(tmp_path, capacity=1)
+    app.add_middleware(CORSMiddleware, allow_origins=["https://app.example"])
+    client = TestClient(app)
+    client.get("/ping", headers={"Origin": "https://app.example"})
+    response = client.get("/ping", headers={"Origin": "https://app.example"})
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == "https://app.example"
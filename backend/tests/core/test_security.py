@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.core import security
+
+
+@pytest.mark.asyncio
+async def test_password_hash_async_round_trip() -> None:
+    hashed = await security.get_password_hash_async("correct horse battery")
+    assert await security.verify_password_async("correct horse battery", hashed)
+    assert not await security.verify_password_async("wrong password", hashed)
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_does_not_block_event_loop() -> None:
+    hashed = security.get_password_hash("correct horse battery")
+    ticks = 0
+
+    async def heartbeat() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    task = asyncio.create_task(heartbeat())
+    await asyncio.gather(*(security.verify_password_async("correct horse battery", hashed) for _ in range(4)))
+    task.cancel()
+    assert ticks > 0
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_rejects_when_backlog_is_full(monkeypatch) -> None:
+    monkeypatch.setattr(security.settings, "password_hash_max_pending", 0)
+    with pytest.raises(security.PasswordHasherBusy):
+        await security.get_password_hash_async("correct horse battery")
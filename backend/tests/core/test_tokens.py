@@ -0,0 +1,84 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+
+from app.config import settings
+from app.core.security import create_access_token
+from app.core.tokens import TokenVerifier
+
+
+def test_verify_caches_decoded_claims() -> None:
+    verifier = TokenVerifier()
+    token = create_access_token("user-1", timedelta(minutes=5))
+    assert verifier.verify(token)["sub"] == "user-1"
+
+    with patch("app.core.tokens.jwt.decode", side_effect=AssertionError("decoded twice")):
+        assert verifier.verify(token)["sub"] == "user-1"
+
+
+def test_verify_rejects_invalid_and_expired_tokens() -> None:
+    verifier = TokenVerifier()
+    assert verifier.verify("not-a-token") is None
+    assert verifier.verify(create_access_token("user-1", timedelta(seconds=-1))) is None
+
+
+def test_cached_token_expires() -> None:
+    verifier = TokenVerifier()
+    token = create_access_token("user-1", timedelta(minutes=5))
+    assert verifier.verify(token)
+
+    with patch("app.core.tokens.time.time", return_value=jwt.decode(
+            token, options={"verify_signature": False})["exp"] + 1):
+        assert verifier.verify(token) is None
+
+
+def test_revoked_token_is_rejected_even_when_cached() -> None:
+    verifier = TokenVerifier()
+    token = create_access_token("user-1", timedelta(minutes=5))
+    other = create_access_token("user-2", timedelta(minutes=5))
+    assert verifier.verify(token) and verifier.verify(other)
+
+    verifier.revoke(token)
+    assert verifier.verify(token) is None
+    assert verifier.verify(other)
+
+    verifier.revoke_subject("user-2")
+    assert verifier.verify(other) is None
+
+
+def test_revoked_token_stays_rejected_past_the_cache_ttl() -> None:
+    verifier = TokenVerifier()
+    token = create_access_token("user-1", timedelta(minutes=settings.access_token_expire_minutes))
+    assert verifier.verify(token)
+    verifier.revoke(token)
+
+    with patch("app.core.tokens.time.time", return_value=time.time() + settings.jwt_cache_max_ttl + 60):
+        verifier.revoke("some-other-token")  # prunes revocations at the later time
+        assert verifier.verify(token) is None
+
+
+def test_token_issued_right_after_subject_revocation_is_valid() -> None:
+    verifier = TokenVerifier()
+    old = create_access_token("user-1", timedelta(minutes=5))
+    verifier.revoke_subject("user-1")
+    time.sleep(0.002)
+    fresh = create_access_token("user-1", timedelta(minutes=5))
+    assert verifier.verify(old) is None
+    assert verifier.verify(fresh)["sub"] == "user-1"
+
+
+def test_subject_revocations_are_forgotten_once_tokens_have_expired() -> None:
+    verifier = TokenVerifier()
+    verifier.revoke_subject("user-1")
+    with patch("app.core.tokens.time.time", return_value=time.time() + settings.access_token_expire_minutes * 60 + 1):
+        verifier.revoke_subject("user-2")
+    assert list(verifier._revoked_subjects) == ["user-2"]
+
+
+def test_cache_is_bounded() -> None:
+    verifier = TokenVerifier(max_entries=2)
+    for i in range(5):
+        verifier.verify(create_access_token(f"user-{i}", timedelta(minutes=5)))
+    assert len(verifier._cache) == 2
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.models import ItemCreate
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def test_create_items_bulk(db: AsyncSession) -> None:
+    user = await create_random_user(db)
+    items_in = [ItemCreate(title=random_lower_string()) for _ in range(5)]
+    items = await crud.create_items(session=db, items_in=items_in, owner_id=user.id)
+    assert len(items) == 5
+    assert all(item.owner_id == user.id for item in items)
+
+
+async def test_get_user_with_items(db: AsyncSession) -> None:
+    user = await create_random_user(db)
+    titles = sorted(random_lower_string() for _ in range(3))
+    await crud.create_items(
+        session=db, items_in=[ItemCreate(title=t) for t in titles], owner_id=user.id
+    )
+    db.expunge_all()
+    loaded = await crud.get_user_with_items(session=db, user_id=user.id)
+    assert loaded
+    assert sorted(item.title for item in loaded.items) == titles
@@ -0,0 +1,106 @@
+from typing import Optional
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import BrandPromptRecord
+from app.services.autocomplete import AutocompleteCache, PrefixIndex
+
+
+async def _add(factory, company_id: str, prompt: str, brand_name: str = "Acme", active: bool = True,
+               prompt_id: Optional[int] = None) -> None:
+    async with factory() as session:
+        session.add(BrandPromptRecord(id=prompt_id, brand_id="b1", brand_name=brand_name, prompt=prompt, user_id="u1",
+                                      company_id=company_id, idempotency_key=f"{company_id}-{prompt}",
+                                      is_active=active))
+        await session.commit()
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'autocomplete.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(BrandPromptRecord.__table__.create)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    await _add(factory, "c1", "Best gaming laptop under 1000")
+    await _add(factory, "c1", "best   GAMING laptop under 1000")
+    await _add(factory, "c1", "best budget phone", brand_name="Bestow")
+    await _add(factory, "c1", "best gaming chair", active=False)
+    await _add(factory, "c2", "best gaming laptop for students")
+    yield factory
+    await engine.dispose()
+
+
+def test_prefix_index_matches_case_and_whitespace_insensitively() -> None:
+    index = PrefixIndex()
+    for prompt in ["Best gaming laptop", "best  gaming LAPTOP", "bestseller list", "cheap tablet"]:
+        index.add(prompt, "Acme")
+    assert index.suggest("BEST  g", 10) == {"brands": [], "prompts": ["Best gaming laptop"]}
+    assert index.suggest("best", 10)["prompts"] == ["Best gaming laptop", "bestseller list"]
+    assert index.suggest("best ", 10)["prompts"] == ["Best gaming laptop"]
+    assert index.suggest("best", 1)["prompts"] == ["Best gaming laptop"]
+    assert index.suggest("ac", 10)["brands"] == ["Acme"]
+
+    bulk = PrefixIndex()
+    bulk.prompts.extend(["Best gaming laptop", "best  gaming LAPTOP", "bestseller list", "cheap tablet"])
+    assert (bulk.prompts.keys, bulk.prompts.texts, bulk.prompts.nbytes) == \
+        (index.prompts.keys, index.prompts.texts, index.prompts.nbytes)
+
+
+@pytest.mark.asyncio
+async def test_cache_builds_lazily_and_picks_up_new_prompts(session_factory) -> None:
+    cache = AutocompleteCache(refresh_interval=3600)
+    async with session_factory() as session:
+        suggestions = await cache.suggest(session, "c1", "best", 10)
+        assert suggestions == {"brands": ["Bestow"], "prompts": ["best budget phone", "Best gaming laptop under 1000"]}
+        assert (await cache.suggest(session, "c2", "best", 10))["prompts"] == ["best gaming laptop for students"]
+
+        # Added by this worker: visible at once
+        cache.add_prompt("c1", "best gaming mouse", "Acme")
+        assert "best gaming mouse" in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+
+    # Added by another worker: visible after the refresh interval
+    await _add(session_factory, "c1", "best gaming monitor")
+    async with session_factory() as session:
+        assert "best gaming monitor" not in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+        cache.refresh_interval = 0
+        assert "best gaming monitor" in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+    assert cache.stats()["builds"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used_company(session_factory) -> None:
+    cache = AutocompleteCache(memory_budget=1, refresh_interval=3600)
+    async with session_factory() as session:
+        await cache.suggest(session, "c1", "best", 10)
+        await cache.suggest(session, "c2", "best", 10)
+        assert cache.stats()["companies"] == 1 and cache.stats()["evictions"] == 1
+
+        # Evicted companies are rebuilt on their next request
+        assert (await cache.suggest(session, "c1", "best g", 10))["prompts"] == ["Best gaming laptop under 1000"]
+    assert cache.stats()["builds"] == 3
+
+
+@pytest.mark.asyncio
+async def test_refresh_rereads_late_commits_and_rebuild_drops_deactivated_prompts(session_factory) -> None:
+    cache = AutocompleteCache(refresh_interval=0, refresh_overlap=100, rebuild_interval=3600)
+    async with session_factory() as session:
+        await cache.suggest(session, "c1", "best", 10)
+
+    # id 20 commits and is loaded before id 15, which another worker was still committing
+    await _add(session_factory, "c1", "best gaming desk", prompt_id=20)
+    async with session_factory() as session:
+        assert "best gaming desk" in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+    await _add(session_factory, "c1", "best gaming headset", prompt_id=15)
+    async with session_factory() as session:
+        assert "best gaming headset" in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+
+    async with session_factory() as session:
+        await session.execute(update(BrandPromptRecord).where(BrandPromptRecord.id == 20).values(is_active=False))
+        await session.commit()
+        assert "best gaming desk" in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+        cache.rebuild_interval = 0
+        assert "best gaming desk" not in (await cache.suggest(session, "c1", "best g", 10))["prompts"]
+    assert cache.stats()["builds"] == 2
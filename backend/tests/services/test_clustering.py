@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import BrandPromptRecord, PromptClusterAssignmentRecord, PromptClusterRecord
+from app.services.clustering import PromptClusterer, assign, choose_k, fit, get_clusters, label_clusters
+from app.services.embeddings import PromptEmbeddingStore, normalize
+
+TOPICS = {
+    "gaming laptop": np.array([1.0, 0, 0, 0]),
+    "budget phone": np.array([0, 1.0, 0, 0]),
+    "espresso machine": np.array([0, 0, 1.0, 0]),
+}
+
+
+def _vectors(rng, topic: str, count: int) -> np.ndarray:
+    return normalize(TOPICS[topic] + rng.normal(scale=0.1, size=(count, 4)))
+
+
+def test_fit_separates_topics() -> None:
+    rng = np.random.default_rng(1)
+    vectors = np.concatenate([_vectors(rng, topic, 50) for topic in TOPICS])
+    centroids = fit(vectors, 3, rng, batch_size=32, iterations=30)
+    clusters, similarities = assign(vectors, centroids)
+    assert sorted(len(set(clusters[i * 50:(i + 1) * 50])) for i in range(3)) == [1, 1, 1]
+    assert len(set(clusters)) == 3 and similarities.min() > 0.9
+    assert choose_k(10) == 2 and choose_k(800) == 20 and choose_k(10 ** 6) == 50
+
+
+def test_labels_prefer_distinctive_words() -> None:
+    texts = {1: "best gaming laptop", 2: "gaming laptop under 1000", 3: "best budget phone", 4: "budget phone deals"}
+    assert label_clusters(texts, {1: 0, 2: 0, 3: 1, 4: 1}, terms=2) == {0: "gaming laptop", 1: "budget phone"}
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'clusters.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, PromptClusterRecord, PromptClusterAssignmentRecord):
+            await conn.run_sync(table.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _add(session_factory, store, rng, topics: list[str]) -> list[int]:
+    async with session_factory() as session:
+        records = [
+            BrandPromptRecord(brand_id="b1", brand_name="Acme", prompt=f"which {topic} to buy {rng.integers(10 ** 6)}",
+                              user_id="u1", company_id="c1", idempotency_key=f"k{rng.integers(10 ** 12)}")
+            for topic in topics
+        ]
+        session.add_all(records)
+        await session.commit()
+    ids = [record.id for record in records]
+    store.append("c1", "m", np.array(ids), np.concatenate([_vectors(rng, topic, 1) for topic in topics]))
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_clusters_are_fit_then_updated_incrementally(session_factory, tmp_path) -> None:
+    rng = np.random.default_rng(2)
+    store = PromptEmbeddingStore(str(tmp_path / "embeddings"))
+    clusterer = PromptClusterer(session_factory, store, min_prompts=20)
+    await _add(session_factory, store, rng, ["gaming laptop", "budget phone"] * 5)
+    assert await clusterer.process_company("c1") == 0  # too few prompts
+
+    await _add(session_factory, store, rng, ["gaming laptop", "budget phone", "espresso machine"] * 10)
+    assert await clusterer.process_company("c1") == 40
+    async with session_factory() as session:
+        clusters = await get_clusters(session, "c1", examples=2)
+        before = dict((await session.execute(
+            select(PromptClusterAssignmentRecord.prompt_id, PromptClusterAssignmentRecord.cluster)
+        )).all())
+    assert len(clusters) == choose_k(40) == 4
+    assert sum(cluster.size for cluster, _ in clusters) == 40
+    assert all(len(examples) == 2 for _, examples in clusters)
+    labels = {" ".join(cluster.label.split()[:2]) for cluster, _ in clusters}  # then "buy", in every prompt
+    assert labels >= {"gaming laptop", "budget phone", "espresso machine"}
+
+    # New prompts join the existing clusters without a refit
+    new_ids = await _add(session_factory, store, rng, ["espresso machine"] * 3)
+    assert await clusterer.process_company("c1") == 3
+    assert await clusterer.process_company("c1") == 0
+    async with session_factory() as session:
+        after = dict((await session.execute(
+            select(PromptClusterAssignmentRecord.prompt_id, PromptClusterAssignmentRecord.cluster)
+        )).all())
+        sizes = {cluster.cluster: cluster.size for cluster, _ in await get_clusters(session, "c1", examples=0)}
+    assert {prompt_id: after[prompt_id] for prompt_id in before} == before
+    assert len({after[prompt_id] for prompt_id in new_ids}) == 1
+    assert sum(sizes.values()) == 43
+
+    # A lower id that reaches the matrix after a higher one is still assigned
+    ids = await _add(session_factory, PromptEmbeddingStore(str(tmp_path / "elsewhere")), rng, ["budget phone"] * 2)
+    vectors = _vectors(rng, "budget phone", 2)
+    store.append("c1", "m", np.array(ids[1:]), vectors[1:])
+    assert await clusterer.process_company("c1") == 1
+    store.append("c1", "m", np.array(ids[:1]), vectors[:1])
+    assert await clusterer.process_company("c1") == 1
+
+    assert await clusterer.process_company("c1", refit=True) == 45
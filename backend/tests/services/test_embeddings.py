@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import BrandPromptRecord, WatermarkRecord
+from app.services.embeddings import EmbeddingIndexer, PromptEmbeddingStore
+
+VOCABULARY = ["laptop", "gaming", "budget", "phone", "camera", "battery"]
+
+
+class _FakeEmbedder:
+    """Bag-of-words vectors, so prompts sharing words are similar"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def embed(self, texts, company_id=None, priority=None, model=None):
+        self.calls.append((company_id, len(texts)))
+        return [[text.split().count(word) for word in VOCABULARY] for text in texts]
+
+
+def test_search_ranks_by_cosine_similarity(tmp_path) -> None:
+    store = PromptEmbeddingStore(str(tmp_path))
+    store.append("c1", "m", np.array([1, 2, 3]), np.array([[1, 0], [1, 1], [0, 1]]))
+    assert store.append("c1", "m", np.array([2, 3]), np.ones((2, 2))) == 0  # already indexed
+    store.append("c1", "m", np.array([7]), np.array([[-1, 0]]))
+
+    assert [prompt_id for prompt_id, _ in store.search("c1", np.array([2.0, 0.1]), 3)] == [1, 2, 3]
+    top = store.search("c1", np.array([1.0, 1.0]), 1)
+    assert top[0][0] == 2 and top[0][1] == pytest.approx(1.0)
+    assert [prompt_id for prompt_id, _ in store.search("c1", store.vector("c1", 1), 2, exclude_id=1)] == [2, 3]
+    assert store.vector("c1", 4) is None
+
+    # A lower id that committed late is appended too
+    assert store.append("c1", "m", np.array([5]), np.array([[0, -1]])) == 1
+    assert store.vector("c1", 5) == pytest.approx([0, -1])
+    assert list(store.missing("c1", np.array([3, 4, 5, 6]))) == [False, True, False, True]
+    assert store.search("c2", np.array([1.0, 0.0]), 3) == []
+
+
+def test_model_change_requires_rebuild(tmp_path) -> None:
+    store = PromptEmbeddingStore(str(tmp_path))
+    store.append("c1", "m", np.array([1]), np.array([[1.0, 0.0]]))
+    with pytest.raises(ValueError):
+        store.append("c1", "other", np.array([2]), np.array([[1.0, 0.0]]))
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'embeddings.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, WatermarkRecord):
+            await conn.run_sync(table.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _add_prompts(session_factory, prompts: list[tuple[str, str]]) -> None:
+    async with session_factory() as session:
+        for company_id, prompt in prompts:
+            session.add(BrandPromptRecord(brand_id="b1", brand_name="Acme", prompt=prompt, user_id="u1",
+                                          company_id=company_id, idempotency_key=f"{company_id}-{prompt}"))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_indexer_embeds_new_prompts_per_company_in_batches(session_factory, tmp_path) -> None:
+    store = PromptEmbeddingStore(str(tmp_path / "vectors"))
+    embedder = _FakeEmbedder()
+    indexer = EmbeddingIndexer(session_factory, store, embedder, batch_size=3, model="m")
+    await _add_prompts(session_factory, [
+        ("c1", "best gaming laptop"), ("c1", "budget phone"), ("c2", "phone camera"), ("c1", "gaming laptop deals"),
+    ])
+    assert await indexer.process_pending() == 4
+    await _add_prompts(session_factory, [("c1", "phone battery life")])
+    assert await indexer.process_pending() == 1
+    assert await indexer.process_pending() == 0
+
+    assert embedder.calls == [("c1", 2), ("c2", 1), ("c1", 1), ("c1", 1)]
+    matches = store.search("c1", store.vector("c1", 1), 2, exclude_id=1)
+    assert [prompt_id for prompt_id, _ in matches] == [4, 2]
+    assert [prompt_id for prompt_id, _ in store.search("c2", np.ones(len(VOCABULARY)), 5)] == [3]
+
+
+@pytest.mark.asyncio
+async def test_indexer_embeds_prompts_that_commit_below_the_watermark(session_factory, tmp_path) -> None:
+    store = PromptEmbeddingStore(str(tmp_path / "vectors"))
+    embedder = _FakeEmbedder()
+    indexer = EmbeddingIndexer(session_factory, store, embedder, batch_size=10, model="m", reindex_overlap=100)
+    await _add_prompts(session_factory, [("c1", "best gaming laptop"), ("c1", "budget phone")])
+    async with session_factory() as session:
+        session.add(BrandPromptRecord(id=10, brand_id="b1", brand_name="Acme", prompt="phone camera", user_id="u1",
+                                      company_id="c1", idempotency_key="late-10"))
+        await session.commit()
+    assert await indexer.process_pending() == 3
+
+    # id 5 was allocated before 10 but its transaction committed after the indexer passed 10
+    async with session_factory() as session:
+        session.add(BrandPromptRecord(id=5, brand_id="b1", brand_name="Acme", prompt="gaming laptop deals",
+                                      user_id="u1", company_id="c1", idempotency_key="late-5"))
+        await session.commit()
+    await indexer.process_pending()
+    assert store.vector("c1", 5) is not None
+    assert embedder.calls == [("c1", 3), ("c1", 1)]
+    await indexer.process_pending()
+    assert len(embedder.calls) == 2
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.hedging import HedgePolicy
+from app.services.local_ai_services import LocalModelService
+
+PRIMARY = "http://primary:11434"
+SECONDARY = "http://secondary:11434"
+
+
+def test_delay_is_percentile_of_observed_latencies() -> None:
+    policy = HedgePolicy(percentile=0.9, min_delay=0.01, min_samples=10)
+    assert policy.delay() is None
+    for i in range(1, 11):
+        policy.observe(i / 10)
+    assert policy.delay() == pytest.approx(0.9)
+
+
+def test_calls_without_a_first_token_count_as_at_least_the_delay() -> None:
+    policy = HedgePolicy(percentile=0.5, min_delay=0.01, min_samples=4)
+    for latency in (0.1, 0.1, 0.1, 0.1):
+        policy.observe(latency)
+    for elapsed in (0.001, 0.002, 0.003, 0.004):  # failed or cancelled long before a token could arrive
+        policy.observe_censored(elapsed)
+    assert policy.delay() == pytest.approx(0.1)
+
+
+def test_budget_caps_hedges() -> None:
+    policy = HedgePolicy(budget=0.5, max_tokens=1)
+    assert policy.try_spend()
+    assert not policy.try_spend()
+    policy.earn()
+    assert not policy.try_spend()
+    policy.earn()
+    assert policy.try_spend()
+
+
+def _service(delays: dict[str, float], calls: list[str], cancelled: list[str]) -> LocalModelService:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        calls.append(host)
+
+        async def body():
+            try:
+                await asyncio.sleep(delays[host])
+                yield json.dumps({"response": host, "done": False}).encode() + b"\n"
+                yield json.dumps({"response": "", "done": True, "prompt_eval_count": 3, "eval_count": 1}).encode()
+            except asyncio.CancelledError:
+                cancelled.append(host)
+                raise
+
+        return httpx.Response(200, content=body())
+
+    service = LocalModelService()
+    service.hedge_enabled = True
+    service.hedge_urls = [SECONDARY]
+    service.base_url = PRIMARY
+    service.hedge_policy = HedgePolicy(min_delay=0.05, min_samples=1, budget=1.0)
+    service.hedge_policy.observe(0.05)
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_cancelled() -> None:
+    calls, cancelled = [], []
+    service = _service({"primary": 5.0, "secondary": 0.01}, calls, cancelled)
+    assert await service.generate("hi", company_id="c1") == "secondary"
+    await asyncio.sleep(0)
+    assert calls == ["primary", "secondary"]
+    assert cancelled == ["primary"]
+    assert service.counters["hedged"] == 1
+    assert service.counters["hedge_won"] == 1
+    # The cancelled primary is sampled as at least as slow as the hedge delay
+    assert service.hedge_policy.stats()["samples"] == 2 and min(service.hedge_policy._samples) >= 0.05
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged() -> None:
+    calls, cancelled = [], []
+    service = _service({"primary": 0.0, "secondary": 0.0}, calls, cancelled)
+    assert await service.generate("hi", company_id="c1") == "primary"
+    assert calls == ["primary"]
+    assert service.counters["hedged"] == 0
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_waits_for_primary() -> None:
+    calls, cancelled = [], []
+    service = _service({"primary": 0.2, "secondary": 0.0}, calls, cancelled)
+    service.hedge_policy = HedgePolicy(min_delay=0.05, min_samples=1, budget=0.0, max_tokens=0)
+    service.hedge_policy.observe(0.05)
+    assert await service.generate("hi", company_id="c1") == "primary"
+    assert calls == ["primary"]
+    assert service.counters["hedge_denied"] == 1
+    await service.aclose()
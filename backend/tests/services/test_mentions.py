@@ -0,0 +1,95 @@
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import (
+    BrandMentionRecord, BrandPromptRecord, CompetitorRecord, CompressionDictionaryRecord, PromptRunRecord,
+    ResponseBlobRecord, WatermarkRecord
+)
+from app.services.mentions import BrandMatcher, MatcherCache, MentionExtractor
+from app.services.response_store import ResponseStore
+
+
+def test_matcher_finds_overlapping_brands_on_word_boundaries() -> None:
+    matcher = BrandMatcher(["Acme", "Acme Pro"], ["Globex"])
+    found = matcher.find("acme pro or ACME? Globex beats Acmeville and globexcorp.")
+    assert [(m.brand, m.is_competitor, m.positions) for m in found] == [
+        ("Acme", False, [0, 12]),
+        ("Acme Pro", False, [0]),
+        ("Globex", True, [18]),
+    ]
+
+
+def test_matcher_shares_prefixes_and_suffixes() -> None:
+    matcher = BrandMatcher(["he", "she", "his", "hers"])
+    found = {m.brand: m.positions for m in matcher.find("she said hers, his and he")}
+    assert found == {"she": [0], "hers": [9], "his": [15], "he": [23]}
+
+
+def test_offsets_survive_case_folding_that_changes_length() -> None:
+    matcher = BrandMatcher(["Zeta"])
+    text = "İstanbul loves Zeta"
+    assert matcher.find(text)[0].positions == [text.index("Zeta")]
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'mentions.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, CompetitorRecord, PromptRunRecord, BrandMentionRecord, WatermarkRecord,
+                      ResponseBlobRecord, CompressionDictionaryRecord):
+            await conn.run_sync(table.__table__.create)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as session:
+        session.add(BrandPromptRecord(brand_id="b1", brand_name="Acme", prompt="best anvils", user_id="u1",
+                                      company_id="c1", idempotency_key="k1"))
+        session.add(CompetitorRecord(company_id="c1", name="Globex"))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+
+async def _add_runs(session_factory, responses: list[str]) -> None:
+    async with session_factory() as session:
+        hashes = await ResponseStore(session_factory).put_many(session, [("m", response) for response in responses])
+        for response, response_hash in zip(responses, hashes):
+            session.add(PromptRunRecord(cycle_id="cycle-1", prompt_id=len(response), company_id="c1", brand_id="b1",
+                                        model="m", backend="b", status="success", response_hash=response_hash))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_extractor_records_mentions_incrementally(session_factory) -> None:
+    extractor = MentionExtractor(session_factory, MatcherCache(), batch_size=1, store=ResponseStore(session_factory))
+    await _add_runs(session_factory, ["Globex, then Acme and Acme again", "nothing relevant"])
+    assert await extractor.process_pending() == 2
+    await _add_runs(session_factory, ["Only Acme here."])
+    assert await extractor.process_pending() == 1
+    assert await extractor.process_pending() == 0
+
+    async with session_factory() as session:
+        mentions = (await session.execute(
+            select(BrandMentionRecord).order_by(BrandMentionRecord.run_id, BrandMentionRecord.rank)
+        )).scalars().all()
+    assert [(m.run_id, m.brand_name, m.is_competitor, m.mention_count, m.rank) for m in mentions] == [
+        (1, "Globex", True, 1, 1),
+        (1, "Acme", False, 2, 2),
+        (3, "Acme", False, 1, 1),
+    ]
+    assert json.loads(mentions[1].positions) == [13, 22]
+
+
+@pytest.mark.asyncio
+async def test_cache_rebuilds_only_when_brand_set_changes(session_factory) -> None:
+    cache = MatcherCache(ttl=0)
+    async with session_factory() as session:
+        first = await cache.get(session, "c1")
+        assert await cache.get(session, "c1") is first
+        session.add(CompetitorRecord(company_id="c1", name="Initech"))
+        await session.commit()
+        rebuilt = await cache.get(session, "c1")
+    assert rebuilt is not first
+    assert [m.brand for m in rebuilt.find("Initech")] == ["Initech"]
@@ -0,0 +1,66 @@
+import json
+
+import httpx
+import pytest
+
+from app.services.local_ai_services import LocalModelService
+from app.services.model_tiers import ModelTierSelector, complexity_score
+from app.services.providers import OllamaProvider
+
+SMALL, MEDIUM, LARGE = "small:3b", "medium:8b", "large:30b"
+
+
+def test_short_prompts_go_to_the_smallest_tier() -> None:
+    selector = ModelTierSelector([SMALL, LARGE], max_words=12)
+    assert selector.select("best laptops") == SMALL
+    assert selector.select("best laptops vs tablets for students, designers and gamers?") == LARGE
+    assert selector.select(" ".join(["word"] * 30)) == LARGE
+
+
+def test_score_spreads_over_intermediate_tiers() -> None:
+    selector = ModelTierSelector([SMALL, MEDIUM, LARGE], max_words=4)
+    assert selector.select("cheap flights") == SMALL
+    assert selector.select("cheap flights to paris in spring") == MEDIUM
+    assert complexity_score("compare a and b") > complexity_score("a b c")
+
+
+def test_without_tiers_everything_uses_the_default_model() -> None:
+    selector = ModelTierSelector([])
+    assert selector.tiers == [selector.largest]
+
+
+def _provider(outputs: dict[str, str], calls: list[str]) -> OllamaProvider:
+    def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        calls.append(model)
+        return httpx.Response(200, json={"model": model, "message": {"role": "assistant", "content": outputs[model]},
+                                         "done": True})
+
+    service = LocalModelService()
+    service.hedge_enabled = False
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return OllamaProvider(service, ModelTierSelector([SMALL, LARGE], max_words=12))
+
+
+@pytest.mark.asyncio
+async def test_invalid_small_model_output_falls_back_to_large() -> None:
+    calls = []
+    provider = _provider({SMALL: "not json", LARGE: '{"ok": true}'}, calls)
+    result = await provider.complete("SYSTEM", "prompt", company_id="c1", validate=json.loads, subject="laptops")
+    assert result == '{"ok": true}'
+    assert calls == [SMALL, LARGE]
+    stats = provider.tiers.stats()
+    assert stats[SMALL]["fallback_rate"] == 1.0
+    assert stats[LARGE]["calls"] == 1
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_valid_small_model_output_is_kept() -> None:
+    calls = []
+    provider = _provider({SMALL: '{"ok": true}', LARGE: "unused"}, calls)
+    await provider.complete("SYSTEM", "prompt", company_id="c1", validate=json.loads, subject="laptops")
+    assert calls == [SMALL]
+    assert provider.tiers.stats()[SMALL]["fallbacks"] == 0
+    assert provider.tiers.stats()[SMALL]["latency_p50"] is not None
+    await provider.aclose()
@@ -0,0 +1,85 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import BrandPromptRecord, PromptLshBucketRecord
+from app.services.near_duplicates import MinHashLSH, NearDuplicateIndex, words
+
+
+def test_buckets_ignore_case_punctuation_and_word_order() -> None:
+    lsh = MinHashLSH(num_perm=64, bands=16)
+    assert lsh.buckets(words("Best gaming laptop, under $1000?")) == lsh.buckets(words("under 1000 best LAPTOP gaming"))
+    shared = set(lsh.buckets(words("best gaming laptop"))) & set(lsh.buckets(words("cheapest office chair")))
+    assert not shared
+    assert lsh.buckets(words("?!")) == []
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'dedup.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, PromptLshBucketRecord):
+            await conn.run_sync(table.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _create(session_factory, index, company_id: str, prompts: list[str]) -> dict[int, list[int]]:
+    """Insert prompts and index them in one transaction, as create_prompt does"""
+    async with session_factory() as session:
+        records = [
+            BrandPromptRecord(brand_id="b1", brand_name="Acme", prompt=prompt, user_id="u1", company_id=company_id,
+                              idempotency_key=f"{company_id}-{prompt}")
+            for prompt in prompts
+        ]
+        session.add_all(records)
+        await session.flush()
+        matches = await index.add_many(session, company_id, [(record.id, record.prompt) for record in records])
+        await session.commit()
+    return matches
+
+
+@pytest.mark.asyncio
+async def test_new_prompts_are_flagged_against_earlier_ones(session_factory) -> None:
+    index = NearDuplicateIndex()
+    assert await _create(session_factory, index, "c1", ["What is the best gaming laptop for students?"]) == {1: []}
+    matches = await _create(session_factory, index, "c1", [
+        "WHAT is the best gaming laptop, for students",
+        "Students: what is the best laptop for gaming?",
+        "Which phone has the best camera?",
+    ])
+    assert matches == {2: [1], 3: [1, 2], 4: []}
+    # Other companies' prompts are never matched
+    assert await _create(session_factory, index, "c2", ["What is the best gaming laptop for students?"]) == {5: []}
+
+
+@pytest.mark.asyncio
+async def test_report_groups_active_near_duplicates(session_factory) -> None:
+    index = NearDuplicateIndex()
+    await _create(session_factory, index, "c1", [
+        "best gaming laptop for students", "Best laptop for gaming students!", "students best gaming laptop",
+        "which phone has the best camera", "Which phone has the best camera?", "cheapest office chair",
+    ])
+    async with session_factory() as session:
+        groups = await index.report(session, "c1")
+        assert [[prompt_id for prompt_id, _ in group] for group in groups] == [[1, 2, 3], [4, 5]]
+
+        (await session.get(BrandPromptRecord, 5)).is_active = False
+        await session.commit()
+        groups = await index.report(session, "c1")
+    assert [[prompt_id for prompt_id, _ in group] for group in groups] == [[1, 2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_matches_are_capped_and_report_groups_a_large_template(session_factory) -> None:
+    index = NearDuplicateIndex(max_candidates=10, max_matches=3)
+    template = [f"what is the best gaming laptop for college students in city {i}" for i in range(40)]
+    matches = await _create(session_factory, index, "c1", template[:30])
+    assert max(len(ids) for ids in matches.values()) == 3
+    matches = await _create(session_factory, index, "c1", template[30:] + ["which phone has the best camera"])
+    assert all(len(ids) == 3 and max(ids) < prompt_id for prompt_id, ids in matches.items() if prompt_id <= 40)
+    assert matches[41] == []
+
+    async with session_factory() as session:
+        groups = await index.report(session, "c1")
+    assert [len(group) for group in groups] == [40]
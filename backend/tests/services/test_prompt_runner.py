@@ -0,0 +1,141 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.core.db import (
+    BrandPromptRecord, CompressionDictionaryRecord, PromptRunRecord, ResponseBlobRecord, RunCycleRecord
+)
+from app.services.prompt_runner import AsyncRateLimiter, PromptRunner
+from app.services.response_store import ResponseStore
+
+
+class _FakeBackend:
+    def __init__(self, base_url: str, fail_on: str = ""):
+        self.base_url = base_url
+        self.model = "stub-model"
+        self.fail_on = fail_on
+        self.prompts = []
+
+    async def chat(self, messages, company_id=None, user_id=None, priority=None) -> str:
+        content = messages[-1]["content"]
+        self.prompts.append(content)
+        if content == self.fail_on:
+            raise Exception("backend error")
+        return f"answer to {content}"
+
+    async def aclose(self) -> None:
+        pass
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'runs.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, RunCycleRecord, PromptRunRecord, ResponseBlobRecord,
+                      CompressionDictionaryRecord):
+            await conn.run_sync(table.__table__.create)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as session:
+        for i in range(1, 8):
+            session.add(BrandPromptRecord(
+                brand_id="b1", brand_name="Acme", prompt=f"prompt {i}", user_id="u1",
+                company_id="c1" if i % 2 else "c2", idempotency_key=f"k{i}", is_active=i != 7
+            ))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+
+async def _runs(session_factory) -> list[PromptRunRecord]:
+    async with session_factory() as session:
+        return list((await session.execute(select(PromptRunRecord).order_by(PromptRunRecord.prompt_id))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_cycle_runs_every_active_prompt_once(session_factory) -> None:
+    backends = [_FakeBackend("http://a", fail_on="prompt 3"), _FakeBackend("http://b", fail_on="prompt 3")]
+    runner = PromptRunner(session_factory, backends, concurrency=2, batch_size=2, interval=3600, owner="r1",
+                          store=ResponseStore(session_factory))
+    assert await runner.run_once()
+    assert not await runner.run_once()  # this interval's cycle is done
+
+    runs = await _runs(session_factory)
+    assert [run.prompt_id for run in runs] == [1, 2, 3, 4, 5, 6]
+    assert {run.backend for run in runs} == {"http://a", "http://b"}
+    failed = [run for run in runs if run.status == "failed"]
+    assert [run.prompt_id for run in failed] == [3] and failed[0].error and failed[0].response_hash is None
+    async with session_factory() as session:
+        assert await runner.store.get(session, runs[0].response_hash) == "answer to prompt 1"
+
+    async with session_factory() as session:
+        cycle = (await session.execute(select(RunCycleRecord))).scalar_one()
+    assert (cycle.status, cycle.cursor, cycle.prompts_run, cycle.prompts_failed) == ("completed", 6, 6, 1)
+
+
+@pytest.mark.asyncio
+async def test_crashed_cycle_resumes_after_cursor(session_factory) -> None:
+    stale = datetime.utcnow() - timedelta(hours=1)
+    async with session_factory() as session:
+        session.add(RunCycleRecord(id="cycle-1", status="running", cursor=4, prompts_run=4, prompts_failed=0,
+                                   owner="crashed", heartbeat_at=stale, started_at=stale))
+        await session.commit()
+
+    backend = _FakeBackend("http://a")
+    runner = PromptRunner(session_factory, [backend], batch_size=10, interval=3600, owner="r2",
+                          store=ResponseStore(session_factory))
+    assert await runner.run_once()
+    assert backend.prompts == ["prompt 5", "prompt 6"]
+
+
+@pytest.mark.asyncio
+async def test_live_lease_is_not_taken_over(session_factory) -> None:
+    async with session_factory() as session:
+        session.add(RunCycleRecord(id="cycle-1", status="running", cursor=0, prompts_run=0, prompts_failed=0,
+                                   owner="other", heartbeat_at=datetime.utcnow(), started_at=datetime.utcnow()))
+        await session.commit()
+
+    runner = PromptRunner(session_factory, [_FakeBackend("http://a")], owner="r3", store=ResponseStore(session_factory))
+    assert await runner.claim_cycle() is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_requests() -> None:
+    limiter = AsyncRateLimiter(rate=20, burst=1)
+    started = time.monotonic()
+    for _ in range(4):
+        await limiter.acquire()
+    assert time.monotonic() - started >= 0.14
+
+
+@pytest.mark.asyncio
+async def test_cycle_keeps_runner_concurrency_calls_in_flight(session_factory, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "runner_backend_urls", ["http://a", "http://b"])
+    monkeypatch.setattr(settings, "runner_default_rate_limit", 0)
+    in_flight, peak = 0, 0
+
+    async def ollama(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200, json={"message": {"content": "answer"}, "model": "stub-model"})
+
+    # More than the API workers' scheduler would allow a batch caller (ai_max_concurrency minus the reserved slot)
+    runner = PromptRunner(session_factory, concurrency=6, batch_size=10, interval=3600, owner="r4",
+                          store=ResponseStore(session_factory))
+    for backend in runner.backends:
+        backend._client = httpx.AsyncClient(transport=httpx.MockTransport(ollama))
+    try:
+        assert await runner.run_once()
+    finally:
+        await runner.aclose()
+    assert peak == 6
+    assert [run.status for run in await _runs(session_factory)] == ["success"] * 6
@@ -0,0 +1,48 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import BrandPromptRecord
+from app.services.prompt_search import search_prompts
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(BrandPromptRecord.__table__.create)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as session:
+        for i, (company_id, prompt, active) in enumerate([
+            ("c1", "best gaming laptop under 1000", True),
+            ("c1", "gaming chair for long sessions", True),
+            ("c1", "laptop bag with 100% waterproof lining", True),
+            ("c1", "best gaming laptop for students", False),
+            ("c2", "best gaming laptop", True),
+        ]):
+            session.add(BrandPromptRecord(brand_id="b1", brand_name="Acme", prompt=prompt, user_id="u1",
+                                          company_id=company_id, idempotency_key=f"k{i}", is_active=active))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_company_prompts_by_matching_terms(session_factory) -> None:
+    async with session_factory() as session:
+        results, has_more = await search_prompts(session, "c1", "Gaming laptop", limit=10)
+        assert [(record.id, relevance) for record, relevance in results] == [(1, 2.0), (3, 1.0), (2, 1.0)]
+        assert not has_more
+
+        first, has_more = await search_prompts(session, "c1", "gaming laptop", limit=2)
+        second, more = await search_prompts(session, "c1", "gaming laptop", limit=2, offset=2)
+        assert has_more and not more
+        assert [record.id for record, _ in first + second] == [1, 3, 2]
+
+
+@pytest.mark.asyncio
+async def test_search_treats_like_wildcards_literally(session_factory) -> None:
+    async with session_factory() as session:
+        assert await search_prompts(session, "c1", "%", limit=10) == ([], False)
+        results, _ = await search_prompts(session, "c1", "100%", limit=10)
+    assert [record.id for record, _ in results] == [3, 1]  # "100" also matches inside "1000" with LIKE
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import BrandPromptRecord, PromptDailyRecord
+from app.services.prompt_stats import get_prompt_stats, rebuild_prompt_stats, record_prompts
+
+PROMPTS = [
+    # company, user, brand, created_at
+    ("c1", "u1", "b1", datetime(2026, 3, 1, 9)),
+    ("c1", "u1", "b1", datetime(2026, 3, 1, 23, 59)),
+    ("c1", "u2", "b1", datetime(2026, 3, 2, 0, 1)),
+    ("c1", "u2", "b2", datetime(2026, 3, 5)),
+    ("c1", "u1", "b2", datetime(2026, 2, 1)),
+    ("c2", "u3", "b1", datetime(2026, 3, 1)),
+]
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}")
+    async with engine.begin() as conn:
+        for table in (BrandPromptRecord, PromptDailyRecord):
+            await conn.run_sync(table.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _ingest(session_factory, prompts, batch_size: int) -> None:
+    for offset in range(0, len(prompts), batch_size):
+        async with session_factory() as session:
+            records = [
+                BrandPromptRecord(brand_id=brand_id, brand_name=brand_id.upper(), prompt="p", user_id=user_id,
+                                  company_id=company_id, idempotency_key=f"{company_id}-{user_id}-{created_at}",
+                                  created_at=created_at)
+                for company_id, user_id, brand_id, created_at in prompts[offset:offset + batch_size]
+            ]
+            session.add_all(records)
+            await session.flush()
+            await record_prompts(session, records)
+            await session.commit()
+
+
+async def _rollup(session_factory) -> list:
+    async with session_factory() as session:
+        return (await session.execute(
+            select(PromptDailyRecord.company_id, PromptDailyRecord.day, PromptDailyRecord.user_id,
+                   PromptDailyRecord.brand_id, PromptDailyRecord.brand_name, PromptDailyRecord.prompts)
+            .order_by(PromptDailyRecord.company_id, PromptDailyRecord.day, PromptDailyRecord.user_id,
+                      PromptDailyRecord.brand_id)
+        )).all()
+
+
+@pytest.mark.asyncio
+async def test_stats_read_from_incrementally_maintained_rollup(session_factory) -> None:
+    # One prompt per transaction, as create_prompt does, then a bulk batch
+    await _ingest(session_factory, PROMPTS[:3], batch_size=1)
+    await _ingest(session_factory, PROMPTS[3:], batch_size=10)
+
+    async with session_factory() as session:
+        stats = await get_prompt_stats(session, "c1", date(2026, 3, 1), date(2026, 3, 31))
+    assert stats["all_time"] == 5 and stats["total"] == 4
+    assert stats["by_day"] == [
+        {"day": date(2026, 3, 1), "prompts": 2}, {"day": date(2026, 3, 2), "prompts": 1},
+        {"day": date(2026, 3, 5), "prompts": 1},
+    ]
+    assert stats["by_user"] == [{"user_id": "u1", "prompts": 2}, {"user_id": "u2", "prompts": 2}]
+    assert stats["by_brand"] == [
+        {"brand_id": "b1", "brand_name": "B1", "prompts": 3}, {"brand_id": "b2", "brand_name": "B2", "prompts": 1},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_incremental_rollup(session_factory) -> None:
+    await _ingest(session_factory, PROMPTS, batch_size=2)
+    incremental = await _rollup(session_factory)
+
+    async with session_factory() as session:
+        await session.execute(delete(BrandPromptRecord).where(BrandPromptRecord.company_id == "c2"))
+        assert await rebuild_prompt_stats(session) == len(incremental) - 1
+        await session.commit()
+    assert await _rollup(session_factory) == [row for row in incremental if row.company_id != "c2"]
+
+    async with session_factory() as session:
+        await session.execute(delete(PromptDailyRecord))
+        assert await rebuild_prompt_stats(session, "c1") == len(incremental) - 1
+        await session.commit()
+    assert await _rollup(session_factory) == [row for row in incremental if row.company_id == "c1"]
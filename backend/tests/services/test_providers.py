@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.local_ai_services import LocalModelService
+from app.services.providers import AnthropicProvider, ModelRouter, OllamaProvider
+from app.services.scheduling import FairScheduler
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Answers like Ollama's /api/chat and Anthropic's /v1/messages"""
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body))
+        if self.path == "/api/chat":
+            payload = {"model": body["model"], "message": {"role": "assistant", "content": "local"}, "done": True,
+                       "prompt_eval_count": 12, "prompt_eval_duration": 6_000_000, "eval_count": 3}
+        elif self.path == "/v1/messages":
+            payload = {
+                "id": "msg_stub", "type": "message", "role": "assistant", "model": body["model"],
+                "content": [{"type": "text", "text": "hosted"}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 4, "output_tokens": 2,
+                          "cache_read_input_tokens": 100, "cache_creation_input_tokens": 0},
+            }
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _router(stub_server, scheduler: FairScheduler) -> ModelRouter:
+    url = f"http://127.0.0.1:{stub_server.server_address[1]}"
+    service = LocalModelService()
+    service.base_url = url
+    service.hedge_enabled = False
+    return ModelRouter(
+        OllamaProvider(service),
+        AnthropicProvider(api_key="test-key", base_url=url, model="claude-stub"),
+        scheduler=scheduler,
+        queue_depth_threshold=1,
+        latency_threshold=5.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_routes_to_local_provider_when_idle(stub_server) -> None:
+    router = _router(stub_server, FairScheduler(max_concurrency=2))
+    assert await router.complete("SYSTEM", "prompt", company_id="c1") == "local"
+    path, body = stub_server.requests[0]
+    assert path == "/api/chat"
+    assert body["messages"] == [{"role": "system", "content": "SYSTEM"}, {"role": "user", "content": "prompt"}]
+    assert router.local.service.prompt_eval_stats() == {"/api/chat": {"calls": 1, "mean_tokens": 12, "mean_ms": 6.0}}
+    assert router.routed == {"local": 1, "overflow": 0}
+    await router.aclose()
+
+
+@pytest.mark.asyncio
+async def test_overflows_with_cached_system_prompt_when_queue_is_deep(stub_server) -> None:
+    scheduler = FairScheduler(max_concurrency=1, interactive_reserved=0)
+    router = _router(stub_server, scheduler)
+
+    async def queued_call():
+        async with scheduler.slot("other"):
+            pass
+
+    async with scheduler.slot("busy"):
+        waiter = asyncio.create_task(queued_call())
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 1
+        assert await router.complete("SYSTEM", "prompt", company_id="c1") == "hosted"
+    await waiter
+
+    path, body = stub_server.requests[0]
+    assert path == "/v1/messages"
+    assert body["system"] == [{"type": "text", "text": "SYSTEM", "cache_control": {"type": "ephemeral"}}]
+    assert body["messages"] == [{"role": "user", "content": "prompt"}]
+    assert router.overflow.counters["cache_read_tokens"] == 100
+    assert router.routed == {"local": 0, "overflow": 1}
+    await router.aclose()
+
+
+@pytest.mark.asyncio
+async def test_overflows_while_local_latency_is_high(stub_server) -> None:
+    router = _router(stub_server, FairScheduler(max_concurrency=2))
+    router.local._observe(30.0)
+    assert router.should_overflow()
+    router.latency_ttl = 0
+    assert not router.should_overflow()
+    await router.aclose()
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+import pytest_asyncio
+import zstandard
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import CompressionDictionaryRecord, ResponseBlobRecord
+from app.services.response_store import ResponseStore, content_hash
+
+
+def _answer(i: int) -> str:
+    return (f"Based on current reviews, the top pick for option {i} is Acme Pro, followed by Globex {i % 7} "
+            f"and Initech. Acme Pro offers a {i % 5 + 1}-year warranty, strong durability and good support, "
+            f"while Globex is cheaper but has fewer service centers. Overall we recommend comparing prices.")
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'store.db'}")
+    async with engine.begin() as conn:
+        for table in (ResponseBlobRecord, CompressionDictionaryRecord):
+            await conn.run_sync(table.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_identical_answers_are_stored_once(session_factory) -> None:
+    store = ResponseStore(session_factory)
+    async with session_factory() as session:
+        hashes = await store.put_many(session, [("m", "same"), ("m", "same"), ("m", None), ("m", "other")])
+        await session.commit()
+        assert hashes == [content_hash("same"), content_hash("same"), None, content_hash("other")]
+        assert await store.put_many(session, [("m", "same")]) == [content_hash("same")]
+        await session.commit()
+
+        assert await session.scalar(select(func.count()).select_from(ResponseBlobRecord)) == 2
+        assert await store.get_many(session, hashes) == {hashes[0]: "same", hashes[3]: "other"}
+    assert store.stats()["writes"] == 4 and store.stats()["deduplicated"] == 2
+
+
+@pytest.mark.asyncio
+async def test_trained_dictionary_compresses_new_answers_and_old_ones_stay_readable(session_factory) -> None:
+    store = ResponseStore(session_factory, dict_size=4096, dict_min_samples=100, dict_samples=500)
+    answers = [_answer(i) for i in range(300)]
+    async with session_factory() as session:
+        before = await store.put_many(session, [("m", text) for text in answers[:200]])
+        await session.commit()
+
+    assert await store.train_pending() == [1]
+    assert await store.train_pending() == []  # the new dictionary has not compressed anything yet
+
+    async with session_factory() as session:
+        after = await store.put_many(session, [("m", text) for text in answers[200:]])
+        await session.commit()
+        blobs = (await session.execute(select(ResponseBlobRecord))).scalars().all()
+        texts = await ResponseStore(session_factory).get_many(session, before + after)
+
+    assert texts == dict(zip(before + after, answers))
+    plain = [blob.size / blob.stored_size for blob in blobs if blob.dictionary_id is None]
+    trained = [blob.size / blob.stored_size for blob in blobs if blob.dictionary_id == 1]
+    assert len(plain) == 200 and len(trained) == 100
+    assert sum(trained) / len(trained) > 2 * sum(plain) / len(plain)
+
+
+@pytest.mark.asyncio
+async def test_failed_training_is_not_retried_until_the_backoff_passes(session_factory, monkeypatch) -> None:
+    store = ResponseStore(session_factory, dict_size=4096, dict_min_samples=100, dict_samples=500, train_backoff=60)
+    async with session_factory() as session:
+        await store.put_many(session, [("m", _answer(i)) for i in range(100)])
+        await store.put_many(session, [("small", _answer(i)) for i in range(99)])
+        await session.commit()
+
+    attempts = []
+
+    def fail(*args, **kwargs):
+        attempts.append(args)
+        raise zstandard.ZstdError("cannot train dictionary")
+
+    monkeypatch.setattr(zstandard, "train_dictionary", fail)
+    assert await store.train_pending() == []
+    assert await store.train_pending() == []
+    assert len(attempts) == 1  # "small" is one answer short of a dictionary, "m" is backing off
+
+    monkeypatch.undo()
+    store._retry_at["m"] = time.monotonic()
+    assert await store.train_pending() == [1]
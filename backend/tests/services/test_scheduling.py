@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.services.scheduling import FairScheduler, Priority
+
+
+async def _run_jobs(scheduler: FairScheduler, jobs: list[tuple[str, Priority]]) -> list[str]:
+    """Queue every job behind a held slot, then record the order slots are granted in"""
+    order: list[str] = []
+    gate = asyncio.Event()
+
+    async def blocker() -> None:
+        async with scheduler.slot("blocker"):
+            await gate.wait()
+
+    async def job(tenant: str, priority: Priority) -> None:
+        async with scheduler.slot(tenant, priority):
+            order.append(tenant if priority == Priority.INTERACTIVE else f"{tenant}:batch")
+            await asyncio.sleep(0)
+
+    holder = asyncio.create_task(blocker())
+    await asyncio.sleep(0)
+    tasks = []
+    for tenant, priority in jobs:
+        tasks.append(asyncio.create_task(job(tenant, priority)))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(holder, *tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_burst_from_one_tenant_does_not_starve_another() -> None:
+    scheduler = FairScheduler(max_concurrency=1, weights={})
+    order = await _run_jobs(scheduler, [("a", Priority.INTERACTIVE)] * 10 + [("b", Priority.INTERACTIVE)])
+    assert order.index("b") <= 1
+
+
+@pytest.mark.asyncio
+async def test_weights_split_slots_proportionally() -> None:
+    scheduler = FairScheduler(max_concurrency=1, weights={"a": 2.0})
+    order = await _run_jobs(
+        scheduler, [("a", Priority.INTERACTIVE)] * 8 + [("b", Priority.INTERACTIVE)] * 8
+    )
+    assert order[:6].count("a") == 4
+
+
+@pytest.mark.asyncio
+async def test_interactive_runs_before_queued_batch() -> None:
+    scheduler = FairScheduler(max_concurrency=1, weights={})
+    order = await _run_jobs(scheduler, [("a", Priority.BATCH)] * 5 + [("b", Priority.INTERACTIVE)])
+    assert order[0] == "b"
+
+
+@pytest.mark.asyncio
+async def test_batch_cannot_take_reserved_slots() -> None:
+    scheduler = FairScheduler(max_concurrency=2, weights={}, interactive_reserved=1)
+    gate = asyncio.Event()
+
+    async def batch_job() -> None:
+        async with scheduler.slot("a", Priority.BATCH):
+            await gate.wait()
+
+    tasks = [asyncio.create_task(batch_job()) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert scheduler.active == 1 and scheduler.queue_depth == 2
+
+    async with scheduler.slot("b", Priority.INTERACTIVE):
+        assert scheduler.active == 2
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue() -> None:
+    scheduler = FairScheduler(max_concurrency=1, weights={})
+    async with scheduler.slot("a"):
+        waiter = asyncio.create_task(scheduler.slot("b").__aenter__())
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queue_depth == 0
+    assert scheduler.active == 0
@@ -0,0 +1,89 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import TokenUsageRecord
+from app.services import usage
+from app.services.usage import QuotaExceededError, UsageMeter
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'usage.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(TokenUsageRecord.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_flush_aggregates_usage_into_one_row_per_window(session_factory) -> None:
+    meter = UsageMeter()
+    meter.record("c1", "u1", "qwen", prompt_tokens=10, completion_tokens=5)
+    meter.record("c1", "u1", "qwen", prompt_tokens=20, completion_tokens=5)
+    meter.record("c1", "u2", "qwen", prompt_tokens=1, completion_tokens=1)
+    assert await meter.flush(session_factory) == 2
+
+    meter.record("c1", "u1", "qwen", prompt_tokens=1, completion_tokens=1)
+    await meter.flush(session_factory)
+
+    async with session_factory() as session:
+        rows = (await session.execute(
+            select(TokenUsageRecord).where(TokenUsageRecord.user_id == "u1")
+        )).scalars().all()
+    assert len(rows) == 1
+    assert (rows[0].requests, rows[0].prompt_tokens, rows[0].completion_tokens) == (3, 31, 11)
+
+
+def test_quota_rejects_once_window_is_used_up(monkeypatch) -> None:
+    monkeypatch.setattr(usage.settings, "usage_quota_tokens", 100)
+    meter = UsageMeter()
+    meter.check_quota("c1")
+    meter.record("c1", "u1", "qwen", prompt_tokens=60, completion_tokens=40)
+    with pytest.raises(QuotaExceededError) as exc:
+        meter.check_quota("c1")
+    assert 0 < exc.value.retry_after <= meter.quota_window
+    meter.check_quota("c2")
+
+
+@pytest.mark.asyncio
+async def test_flush_picks_up_usage_from_other_workers(session_factory, monkeypatch) -> None:
+    monkeypatch.setattr(usage.settings, "usage_quota_tokens", 100)
+    worker_a, worker_b = UsageMeter(), UsageMeter()
+    worker_a.record("c1", "u1", "qwen", prompt_tokens=90, completion_tokens=0)
+    await worker_a.flush(session_factory)
+
+    worker_b.record("c1", "u2", "qwen", prompt_tokens=10, completion_tokens=0)
+    worker_b.check_quota("c1")
+    await worker_b.flush(session_factory)
+    with pytest.raises(QuotaExceededError):
+        worker_b.check_quota("c1")
+
+
+@pytest.mark.asyncio
+async def test_failed_resync_does_not_count_committed_usage_twice(session_factory) -> None:
+    class _FailingReads:
+        """Sessions whose SELECTs fail after the upsert has been committed"""
+
+        def __call__(self):
+            session = session_factory()
+            execute = session.execute
+
+            async def failing_execute(statement, *args, **kwargs):
+                if statement.is_select:
+                    raise RuntimeError("connection lost")
+                return await execute(statement, *args, **kwargs)
+
+            session.execute = failing_execute
+            return session
+
+    meter = UsageMeter()
+    meter.record("c1", "u1", "qwen", prompt_tokens=10, completion_tokens=5)
+    assert await meter.flush(_FailingReads()) == 1
+    assert meter.used_in_window("c1") == 15
+    assert await meter.flush(session_factory) == 0
+
+    async with session_factory() as session:
+        row = (await session.execute(select(TokenUsageRecord))).scalar_one()
+    assert (row.requests, row.prompt_tokens, row.completion_tokens) == (1, 10, 5)
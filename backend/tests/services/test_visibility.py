@@ -0,0 +1,100 @@
+import itertools
+from datetime import date, datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import (
+    BrandMentionRecord, PromptRunRecord, RunDailyRecord, VisibilityDailyRecord, WatermarkRecord
+)
+from app.services.mentions import WATERMARK_NAME as MENTIONS_WATERMARK
+from app.services.visibility import VisibilityRollup, get_visibility
+
+DAY_1 = datetime(2026, 3, 1, 9, 30)
+DAY_2 = datetime(2026, 3, 2, 23, 59)
+prompt_ids = itertools.count(1)
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'visibility.db'}")
+    async with engine.begin() as conn:
+        for table in (PromptRunRecord, BrandMentionRecord, WatermarkRecord, VisibilityDailyRecord, RunDailyRecord):
+            await conn.run_sync(table.__table__.create)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _add_runs(session_factory, runs: list[tuple], extracted: bool = True) -> None:
+    """Add (company_id, created_at, status, [(brand, is_competitor, count, rank)]) runs and their mentions"""
+    async with session_factory() as session:
+        for company_id, created_at, status, mentions in runs:
+            run = PromptRunRecord(cycle_id="cycle-1", prompt_id=next(prompt_ids), company_id=company_id,
+                                  brand_id="b1", model="m", backend="b", status=status,
+                                  created_at=created_at)
+            session.add(run)
+            await session.flush()
+            for brand, is_competitor, count, rank in mentions:
+                session.add(BrandMentionRecord(run_id=run.id, company_id=company_id, brand_name=brand,
+                                               is_competitor=is_competitor, mention_count=count, rank=rank,
+                                               positions="[]", created_at=created_at))
+        if extracted:
+            watermark = await session.get(WatermarkRecord, MENTIONS_WATERMARK)
+            if watermark is None:
+                session.add(WatermarkRecord(name=MENTIONS_WATERMARK, position=run.id))
+            else:
+                watermark.position = run.id
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_rollup_is_incremental_and_scores_match_raw_runs(session_factory) -> None:
+    rollup = VisibilityRollup(session_factory, batch_size=2)
+    await _add_runs(session_factory, [
+        ("c1", DAY_1, "success", [("Globex", True, 1, 1), ("Acme", False, 2, 2)]),
+        ("c1", DAY_1, "success", []),
+        ("c1", DAY_1, "failed", []),
+        ("c2", DAY_1, "success", [("Acme", False, 5, 1)]),
+    ])
+    assert await rollup.process_pending() == 3
+
+    # Runs whose mentions are not extracted yet wait for the extractor
+    await _add_runs(session_factory, [("c1", DAY_2, "success", [("Acme", False, 1, 1)])], extracted=False)
+    assert await rollup.process_pending() == 0
+    await _add_runs(session_factory, [("c1", DAY_1, "success", [("Acme", False, 1, 1)])])
+    assert await rollup.process_pending() == 2
+    assert await rollup.process_pending() == 0
+
+    async with session_factory() as session:
+        result = await get_visibility(session, "c1", date(2026, 3, 1), date(2026, 3, 2))
+
+    daily = {(row["day"], row["brand_name"]): row for row in result["daily"]}
+    acme = daily[(date(2026, 3, 1), "Acme")]
+    assert (acme["runs"], acme["runs_mentioned"], acme["mentions"]) == (3, 2, 3)
+    assert acme["mention_rate"] == pytest.approx(2 / 3, abs=1e-4)
+    assert acme["average_rank"] == 1.5
+    assert acme["share_of_voice"] == 0.75
+    assert daily[(date(2026, 3, 2), "Acme")]["mention_rate"] == 1.0
+
+    summary = {row["brand_name"]: row for row in result["summary"]}
+    assert [row["brand_name"] for row in result["summary"]] == ["Acme", "Globex"]
+    assert summary["Acme"]["day"] is None
+    assert (summary["Acme"]["runs"], summary["Acme"]["runs_mentioned"], summary["Acme"]["mentions"]) == (4, 3, 4)
+    assert summary["Globex"]["is_competitor"] is True
+    assert summary["Globex"]["share_of_voice"] == 0.2
+
+
+@pytest.mark.asyncio
+async def test_visibility_filters_by_brand_and_range(session_factory) -> None:
+    await _add_runs(session_factory, [
+        ("c1", DAY_1, "success", [("Acme", False, 1, 1)]),
+        ("c1", DAY_2, "success", [("Globex", True, 1, 1)]),
+    ])
+    await VisibilityRollup(session_factory).process_pending()
+
+    async with session_factory() as session:
+        result = await get_visibility(session, "c1", date(2026, 3, 2), date(2026, 3, 2), brand_name="Acme")
+        other = await get_visibility(session, "c2", date(2026, 3, 1), date(2026, 3, 2))
+    assert result["daily"] == [] and result["summary"] == []
+    assert other["daily"] == []
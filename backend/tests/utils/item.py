@@ -1,4 +1,4 @@
-from sqlmodel import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud
 from app.models import Item, ItemCreate
@@ -6,11 +6,11 @@ from tests.utils.user import create_random_user
 from tests.utils.utils import random_lower_string
 
 
-def create_random_item(db: Session) -> Item:
-    user = create_random_user(db)
+async def create_random_item(db: AsyncSession) -> Item:
+    user = await create_random_user(db)
     owner_id = user.id
     assert owner_id is not None
     title = random_lower_string()
     description = random_lower_string()
     item_in = ItemCreate(title=title, description=description)
-    return crud.create_item(session=db, item_in=item_in, owner_id=owner_id)
+    return await crud.create_item(session=db, item_in=item_in, owner_id=owner_id)